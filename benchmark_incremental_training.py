@@ -0,0 +1,96 @@
+import pandas as pd
+import time
+import argparse
+from sklearn.metrics import accuracy_score, log_loss, brier_score_loss
+from model_registry import (FEATURE_COLUMNS, TARGET_COLUMN, train_model, update_model,
+                            needs_full_retrain, recent_window)
+
+# ==========================================
+# 設定區
+# ==========================================
+DATA_FILE = "FINAL_MASTER_DATASET_v109_FIXED.csv"
+TEST_SEASON = 2026
+OUTPUT_FILE = "benchmark_incremental_training.csv"
+
+def run_benchmark(df, test_season=TEST_SEASON, step=1):
+    """
+    模擬 2026 賽季每個比賽日開賽前更新模型：
+    full = 每次都完整重訓；incremental = warm_start 加樹 + 定期完整重訓
+    (排程與近期視窗直接呼叫 model_registry 的 needs_full_retrain / recent_window，與 get_or_train 共用)
+    """
+    df = df.fillna(0)
+    df['date_dt'] = pd.to_datetime(df['date'])
+    test_days = sorted(df.loc[df['Season_Year'] == test_season, 'date_dt'].unique())[::step]
+
+    inc_scaler = inc_model = None
+    full_cutoff = last_cutoff = None
+    rows, timings = [], []
+
+    for day in test_days:
+        train_df = df[df['date_dt'] < day]
+        test_df = df[df['date_dt'] == day]
+        if step > 1:
+            # 抽樣比賽日時，測試區間延伸到下一個抽樣日前
+            nxt = [d for d in test_days if d > day]
+            test_df = df[(df['date_dt'] >= day) & (df['date_dt'] < (nxt[0] if nxt else day + pd.Timedelta(days=1)))]
+        cutoff = train_df['date_dt'].max()
+
+        t0 = time.perf_counter()
+        scaler, model = train_model(train_df)
+        full_time = time.perf_counter() - t0
+        full_prob = model.predict_proba(scaler.transform(test_df[FEATURE_COLUMNS]))[:, 1]
+
+        t0 = time.perf_counter()
+        delta = 0 if last_cutoff is None else int((train_df['date_dt'] > last_cutoff).sum())
+        due_full = inc_model is None or needs_full_retrain(delta, len(inc_model.estimators_), (cutoff - full_cutoff).days)
+        if due_full:
+            inc_scaler, inc_model = train_model(train_df)
+            full_cutoff = cutoff
+            mode = 'full'
+        elif delta > 0:
+            update_model(inc_scaler, inc_model, recent_window(train_df))
+            mode = 'incremental'
+        else:
+            mode = 'reuse'
+        inc_time = time.perf_counter() - t0
+        last_cutoff = cutoff
+        inc_prob = inc_model.predict_proba(inc_scaler.transform(test_df[FEATURE_COLUMNS]))[:, 1]
+
+        for (_, r), fp, ip in zip(test_df.iterrows(), full_prob, inc_prob):
+            rows.append({'date': r['date'], 'Team_Abbr': r['Team_Abbr'], 'Opp_Abbr': r['Opp_Abbr'],
+                         'Win': r[TARGET_COLUMN], 'Full_Prob': fp, 'Inc_Prob': ip,
+                         'Inc_Mode': mode, 'Inc_Trees': len(inc_model.estimators_)})
+        timings.append({'Full_Time': full_time, 'Inc_Time': inc_time, 'Inc_Mode': mode})
+        print(f"{pd.Timestamp(day).strftime('%Y-%m-%d')} | 完整 {full_time:6.2f}s | 增量({mode:<11}) {inc_time:6.2f}s | {len(test_df)} 場")
+
+    return pd.DataFrame(rows), pd.DataFrame(timings)
+
+def summarize(results, timings):
+    y = results['Win']
+    print("\n" + "=" * 60)
+    print(f"{'模式':<12} | {'訓練總時間':>10} | {'Accuracy':>8} | {'LogLoss':>8} | {'Brier':>8}")
+    print("-" * 60)
+    summary = {}
+    for label, col_p, col_t in [('完整重訓', 'Full_Prob', 'Full_Time'), ('增量更新', 'Inc_Prob', 'Inc_Time')]:
+        p = results[col_p]
+        total = timings[col_t].sum()
+        acc = accuracy_score(y, (p >= 0.5).astype(int))
+        ll = log_loss(y, p, labels=[0, 1])
+        brier = brier_score_loss(y, p)
+        summary[label] = (total, acc, ll, brier)
+        print(f"{label:<12} | {total:>9.1f}s | {acc:>8.4f} | {ll:>8.4f} | {brier:>8.4f}")
+    (ft, fa, fl, fb), (it, ia, il, ib) = summary['完整重訓'], summary['增量更新']
+    print("-" * 60)
+    print(f"增量 - 完整: 時間 {it - ft:+.1f}s ({it / ft:.1%}), Accuracy {ia - fa:+.4f}, LogLoss {il - fl:+.4f}, Brier {ib - fb:+.4f}")
+    print(f"增量模式次數: {timings['Inc_Mode'].value_counts().to_dict()}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="warm_start 增量訓練 vs 完整重訓 基準測試")
+    parser.add_argument('--step', type=int, default=1, help="每隔幾個比賽日更新一次模型 (預設每天)")
+    args = parser.parse_args()
+
+    print(f"--- 增量訓練基準測試 ({TEST_SEASON} 賽季) ---")
+    results, timings = run_benchmark(pd.read_csv(DATA_FILE), step=args.step)
+    results.to_csv(OUTPUT_FILE, index=False, encoding='utf-8-sig')
+    summarize(results, timings)
+    print(f"\n逐場結果已儲存至: {OUTPUT_FILE}")
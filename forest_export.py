@@ -0,0 +1,175 @@
+import pandas as pd
+import numpy as np
+import os
+import time
+import argparse
+import joblib
+from model_registry import MODEL_DIR, FEATURE_COLUMNS, get_or_train
+
+# ==========================================
+# 設定區
+# ==========================================
+DATA_FILE = "FINAL_MASTER_DATASET_v109_FIXED.csv"
+DEFAULT_MODEL = "v500_full"
+BENCH_SIZES = [1, 10, 10000]
+BENCH_REPEATS = 20
+
+# ==========================================
+# 1. 匯出：把整座森林攤平成連續陣列
+# ==========================================
+def _float32_floor(threshold):
+    """
+    float64 閾值 -> 不大於它的最大 float32
+    對 float32 特徵 x：x <= t (float64) 等價於 x <= floor32(t)，比較可全程用 float32
+    """
+    t32 = threshold.astype(np.float32)
+    too_big = t32.astype(np.float64) > threshold
+    return np.where(too_big, np.nextafter(t32, np.float32(-np.inf)), t32).astype(np.float32)
+
+def export_forest(model, scaler=None):
+    """
+    將 RandomForestClassifier 攤平成陣列 (所有樹的節點串接在一起，索引為全域節點編號)
+    feature / threshold: 節點切分特徵與 float32 閾值 (葉節點為 0 / +inf)
+    children: 長度 2N，children[2i] 為左子、children[2i+1] 為右子；葉節點指向自己
+    leaf_prob: 節點的主勝機率 (與 DecisionTreeClassifier.predict_proba 相同的正規化)
+    scaler 一併存下 (mean / scale)，推論時與 sklearn 相同的方式標準化
+    """
+    features, thresholds, children, leaf_probs, roots = [], [], [], [], []
+    offset = 0
+    max_depth = 0
+    class_idx = list(model.classes_).index(1)
+    for est in model.estimators_:
+        tree = est.tree_
+        n = tree.node_count
+        value = tree.value[:, 0, :]
+        proba = value / value.sum(axis=1, keepdims=True)
+
+        is_leaf = tree.children_left < 0
+        own = np.arange(n) + offset
+        pair = np.empty(2 * n, dtype=np.int64)
+        pair[0::2] = np.where(is_leaf, own, tree.children_left + offset)
+        pair[1::2] = np.where(is_leaf, own, tree.children_right + offset)
+
+        features.append(np.where(is_leaf, 0, tree.feature))
+        thresholds.append(np.where(is_leaf, np.float32(np.inf), _float32_floor(tree.threshold)))
+        children.append(pair)
+        leaf_probs.append(proba[:, class_idx])
+        roots.append(offset)
+        offset += n
+        max_depth = max(max_depth, tree.max_depth)
+
+    forest = {
+        'feature': np.concatenate(features).astype(np.int32),
+        'threshold': np.concatenate(thresholds).astype(np.float32),
+        'children': np.concatenate(children).astype(np.int32),
+        'leaf_prob': np.concatenate(leaf_probs).astype(np.float64),
+        'roots': np.array(roots, dtype=np.int32),
+        'max_depth': np.int64(max_depth),
+    }
+    if scaler is not None:
+        forest['scaler_mean'] = scaler.mean_.astype(np.float64)
+        forest['scaler_scale'] = scaler.scale_.astype(np.float64)
+    return forest
+
+def save_forest(forest, path):
+    np.savez(path, **forest)
+
+def load_forest(path):
+    data = np.load(path)
+    return {k: data[k] for k in data.files}
+
+def _forest_path(name, model_dir=MODEL_DIR):
+    return os.path.join(model_dir, f"{name}_forest.npz")
+
+def export_registry_model(name=DEFAULT_MODEL, model_dir=MODEL_DIR):
+    """讀取 model_registry 存好的模型並匯出成 models/{name}_forest.npz"""
+    bundle = joblib.load(os.path.join(model_dir, f"{name}.joblib"))
+    forest = export_forest(bundle['model'], bundle['scaler'])
+    path = _forest_path(name, model_dir)
+    save_forest(forest, path)
+    return forest, path
+
+# ==========================================
+# 2. 推論：所有列 x 所有樹同時往下走
+# ==========================================
+def forest_predict_proba(forest, X, scaled=False):
+    """
+    回傳主勝機率 (等同 model.predict_proba(X)[:, 1])
+    X 可為 DataFrame 或 2D 陣列 (原始特徵；scaled=True 表示已標準化)
+    """
+    X = np.asarray(X, dtype=np.float64)
+    if X.ndim == 1: X = X[None, :]
+    if not scaled and 'scaler_mean' in forest:
+        X = (X - forest['scaler_mean']) / forest['scaler_scale']
+    # sklearn 的樹以 float32 比較特徵
+    X = np.ascontiguousarray(X, dtype=np.float32)
+
+    feature, threshold, children = forest['feature'], forest['threshold'], forest['children']
+    n_rows, n_features = X.shape
+    n_trees = len(forest['roots'])
+
+    # 每個 (列, 樹) 配對一個目前節點；每輪只推進尚未停在葉節點 (指向自己) 的配對
+    flat_x = X.ravel()
+    row_base = np.repeat(np.arange(n_rows, dtype=np.int32) * n_features, n_trees)
+    node = np.tile(forest['roots'], n_rows)
+    active = np.arange(n_rows * n_trees, dtype=np.int32)
+    while active.size:
+        nd = node[active]
+        go_right = flat_x[row_base[active] + feature[nd]] > threshold[nd]
+        nxt = children[2 * nd + go_right]
+        node[active] = nxt
+        active = active[nxt != nd]
+    node = node.reshape(n_rows, n_trees)
+
+    # 依樹的順序逐棵累加 (與 sklearn 相同的加總順序，結果逐位元一致)
+    total = np.cumsum(forest['leaf_prob'][node], axis=1)[:, -1]
+    return total / n_trees
+
+# ==========================================
+# 3. 基準測試
+# ==========================================
+def _time_call(fn, repeats):
+    best = float('inf')
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+def run_benchmark(scaler, model, forest, df, sizes=BENCH_SIZES, repeats=BENCH_REPEATS):
+    """比較 sklearn (scaler + predict_proba) 與攤平森林在不同列數下的延遲，並檢查結果一致"""
+    X_all = df[FEATURE_COLUMNS]
+    print(f"{'列數':>6} | {'sklearn (ms)':>12} | {'攤平森林 (ms)':>13} | {'加速':>6} | {'最大誤差':>10}")
+    print("-" * 62)
+    rows = []
+    for size in sizes:
+        X = X_all.sample(n=size, replace=size > len(X_all), random_state=0)
+        ref = model.predict_proba(scaler.transform(X))[:, 1]
+        out = forest_predict_proba(forest, X)
+        if not np.allclose(ref, out, rtol=0, atol=1e-12):
+            raise ValueError(f"攤平森林結果與 sklearn 不一致 (列數 {size})")
+
+        n_rep = repeats if size <= 10 else max(3, repeats // 5)
+        t_sk = _time_call(lambda: model.predict_proba(scaler.transform(X)), n_rep) * 1000
+        t_fx = _time_call(lambda: forest_predict_proba(forest, X), n_rep) * 1000
+        max_err = float(np.abs(ref - out).max())
+        print(f"{size:>6} | {t_sk:>12.3f} | {t_fx:>13.3f} | {t_sk / t_fx:>5.1f}x | {max_err:>10.2e}")
+        rows.append({'Rows': size, 'Sklearn_Ms': t_sk, 'Forest_Ms': t_fx, 'Max_Abs_Err': max_err})
+    return pd.DataFrame(rows)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="將已存的隨機森林匯出為陣列格式 (低延遲推論)")
+    parser.add_argument('--name', default=DEFAULT_MODEL, help="model_registry 的模型名稱")
+    parser.add_argument('--bench', action='store_true', help="匯出後執行 1 / 10 / 10k 列延遲基準測試")
+    args = parser.parse_args()
+
+    df = pd.read_csv(DATA_FILE).fillna(0)
+    if not os.path.exists(os.path.join(MODEL_DIR, f"{args.name}.joblib")):
+        get_or_train(df, args.name)
+
+    forest, path = export_registry_model(args.name)
+    print(f"已匯出攤平森林: {path} ({len(forest['roots'])} 棵樹, {len(forest['feature'])} 個節點, 最大深度 {int(forest['max_depth'])})")
+
+    if args.bench:
+        bundle = joblib.load(os.path.join(MODEL_DIR, f"{args.name}.joblib"))
+        run_benchmark(bundle['scaler'], bundle['model'], forest, df)
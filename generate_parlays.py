@@ -1,9 +1,98 @@
 import pandas as pd
 import numpy as np
 import os
-from itertools import combinations
+import argparse
+from parlay_search import search_parlays, game_keys
 
-def generate_parlays():
+# ==========================================
+# 設定區
+# ==========================================
+PARLAY_LEGS = 2        # 幾串 1
+TOP_PER_DAY = 5        # 每日保留前幾名
+
+def candidate_mask(df):
+    """條件：EV > 0 (正期望值) 或 勝率 > 65% (高勝率)；缺少欄位時視為 0"""
+    ev = df['EV'].astype(float) if 'EV' in df.columns else pd.Series(0.0, index=df.index)
+    prob = df['Prob'].astype(float) if 'Prob' in df.columns else pd.Series(0.0, index=df.index)
+    return ((ev > 0) | (prob > 0.65)).to_numpy()
+
+def daily_pairs(day_rows, games):
+    """
+    每日所有兩兩組合 (等同逐日 combinations(rows, 2))，排除同一場比賽的主客兩邊
+    day_rows: [當日列位置陣列]，回傳 (日序號, i, j)
+    """
+    day, idx_i, idx_j = [], [], []
+    for n, rows in enumerate(day_rows):
+        if len(rows) < 2: continue
+        a, b = np.triu_indices(len(rows), k=1)
+        day.append(np.full(len(a), n)); idx_i.append(rows[a]); idx_j.append(rows[b])
+    if not day: return (np.array([], dtype=int),) * 3
+    day, i, j = np.concatenate(day), np.concatenate(idx_i), np.concatenate(idx_j)
+    keep = games[i] != games[j]
+    return day[keep], i[keep], j[keep]
+
+def top_pairs(prob, odds, games, day_rows, top_k=TOP_PER_DAY):
+    """
+    兩串一：一次算出所有日期的組合分數，每日依分數取前 top_k 名
+    同分時依組合順序 (與 search_parlays 相同)；回傳 (日序號, 腿索引 (組合數 x 2), 分數)
+    """
+    day, i, j = daily_pairs(day_rows, games)
+    comb_prob = prob[i] * prob[j]
+    comb_ev = (comb_prob * (odds[i] * odds[j])) - 1
+    # 用 Python round 計算分數，結果與逐組計算相同
+    score = np.array([round(x, 4) for x in ((comb_ev * 0.7) + (comb_prob * 0.3)).tolist()])
+    
+    order = np.lexsort((np.arange(len(day)), -score, day))
+    day, score, legs = day[order], score[order], np.column_stack([i, j])[order]
+    _, first = np.unique(day, return_index=True)
+    rank = np.arange(len(day)) - np.repeat(first, np.diff(np.append(first, len(day))))
+    keep = rank < top_k
+    return day[keep], legs[keep], score[keep]
+
+def search_top(prob, odds, games, day_rows, n_legs, top_k=TOP_PER_DAY):
+    """N 串 1 (N > 2)：逐日交給 search_parlays 做分支界限搜尋"""
+    day, legs, scores = [], [], []
+    for n, rows in enumerate(day_rows):
+        if len(rows) < n_legs: continue
+        best = search_parlays(prob[rows], odds[rows], [games[r] for r in rows], n_legs=n_legs,
+                              top_k=top_k, ev_weight=0.7, prob_weight=0.3, decimals=4)
+        for score, combo in best:
+            day.append(n); legs.append(rows[list(combo)]); scores.append(score)
+    if not day: return np.array([], dtype=int), np.zeros((0, n_legs), dtype=int), np.array([])
+    return np.array(day), np.array(legs), np.array(scores)
+
+def build_parlay_frame(candidates, dates, day, legs, score):
+    """把組合 (腿索引) 轉成輸出表格：賠率、勝率、EV、類型一次以欄位運算完成"""
+    n_legs = legs.shape[1]
+    prob = candidates['Prob'].to_numpy(dtype=float)
+    odds = candidates['Odds_Team'].to_numpy(dtype=float)
+    teams = candidates['Team_Abbr'].to_numpy(dtype=object)
+    king = candidates['Signal'].astype(str).str.contains("ROI King", regex=False).to_numpy(dtype=bool)
+    
+    # 依腿的順序逐一相乘 (與 math.prod 相同)
+    comb_odd, comb_prob = np.ones(len(legs)), np.ones(len(legs))
+    for k in range(n_legs):
+        comb_odd, comb_prob = comb_odd * odds[legs[:, k]], comb_prob * prob[legs[:, k]]
+    comb_ev = (comb_prob * comb_odd) - 1
+    
+    # 定義類型 (依序判斷，先符合者優先)
+    p_type = np.select([(prob[legs] > 0.7).all(axis=1), comb_ev > 0.3, king[legs].all(axis=1), king[legs].any(axis=1)],
+                       ["🛡️ 雙穩膽", "💰 高價值", "💎 黃金串", "✨ 強力串"], default="普通串關")
+    
+    out = {'Date': [dates[d] for d in day], 'Type': p_type, 'Score': score.tolist()}
+    odds_list = odds.tolist()
+    for k in range(n_legs):
+        out[f'Team_{k + 1}'] = [f"{teams[r]} ({odds_list[r]})" for r in legs[:, k]]
+    for k in range(n_legs):
+        out[f'P{k + 1}'] = teams[legs[:, k]]
+    out.update({
+        'Combined_Odds': [round(x, 2) for x in comb_odd.tolist()],
+        'Combined_Prob': [round(x * 100, 1) for x in comb_prob.tolist()],
+        'Combined_EV': [round(x, 2) for x in comb_ev.tolist()],
+    })
+    return pd.DataFrame(out)
+
+def generate_parlays(n_legs=PARLAY_LEGS):
     print("--- 🔗 串關生成器 (v4.0 - 嚴格同日修正版) ---")
     
     input_file = "Final_Betting_Signals.csv"
@@ -18,80 +107,29 @@ def generate_parlays():
     df[col_date] = pd.to_datetime(df[col_date]).dt.date
     
     # 1. 篩選候選名單
-    # 條件：EV > 0 (正期望值) 或 勝率 > 65% (高勝率)
-    def is_candidate(row):
-        ev = float(row.get('EV', 0))
-        prob = float(row.get('Prob', 0))
-        if ev > 0: return True
-        if prob > 0.65: return True
-        return False
-
-    df['Is_Candidate'] = df.apply(is_candidate, axis=1)
-    candidates = df[df['Is_Candidate']].copy()
+    candidates = df[candidate_mask(df)].reset_index(drop=True)
     
-    # 取得所有唯一的日期，並由新到舊排序
-    unique_dates = sorted(candidates[col_date].unique(), reverse=True)
-    all_parlays = []
+    # 取得所有唯一的日期，並由新到舊排序；每一天獨立配對 (嚴格同日)
+    day_groups = candidates.groupby(col_date, sort=True).indices
+    dates = sorted(day_groups, reverse=True)
+    day_rows = [day_groups[d] for d in dates]
 
-    print(f"正在分析 {len(unique_dates)} 個比賽日的最佳組合...")
+    print(f"正在分析 {len(dates)} 個比賽日的最佳組合...")
 
-    # --- 關鍵修正：針對「每一天」獨立進行配對 ---
-    for d in unique_dates:
-        # 鎖定這一天的比賽
-        daily_games = candidates[candidates[col_date] == d].copy()
-        
-        # 至少要 2 場才能串
-        if len(daily_games) < 2: 
-            # print(f"  日期 {d}: 符合條件場次不足 ({len(daily_games)} 場)，跳過。")
-            continue
-            
-        # 產生所有 2 串 1 組合 (C取2)
-        combs = list(combinations(daily_games.iterrows(), 2))
-        
-        # 暫存當日的組合，稍後排序
-        daily_parlays = []
-        
-        for (idx1, row1), (idx2, row2) in combs:
-            # 防呆：同一場比賽的主客隊不能串 (Team_Abbr vs Opp_Abbr)
-            if row1['Team_Abbr'] == row2['Opp_Abbr']: continue
-
-            # 計算串關數據
-            comb_odd = row1['Odds_Team'] * row2['Odds_Team']
-            comb_prob = row1['Prob'] * row2['Prob']
-            comb_ev = (comb_prob * comb_odd) - 1
-            
-            # 評分機制 (Score)
-            score = (comb_ev * 0.7) + (comb_prob * 0.3)
-            
-            # 定義類型
-            p_type = "普通串關"
-            if row1['Prob'] > 0.7 and row2['Prob'] > 0.7: p_type = "🛡️ 雙穩膽"
-            elif comb_ev > 0.3: p_type = "💰 高價值"
-            elif "ROI King" in str(row1['Signal']) and "ROI King" in str(row2['Signal']): p_type = "💎 黃金串"
-            elif "ROI King" in str(row1['Signal']) or "ROI King" in str(row2['Signal']): p_type = "✨ 強力串"
-            
-            daily_parlays.append({
-                'Date': d,
-                'Type': p_type,
-                'Score': round(score, 4),
-                'Team_1': f"{row1['Team_Abbr']} ({row1['Odds_Team']})",
-                'Team_2': f"{row2['Team_Abbr']} ({row2['Odds_Team']})",
-                'P1': row1['Team_Abbr'], 
-                'P2': row2['Team_Abbr'],
-                'Combined_Odds': round(comb_odd, 2),
-                'Combined_Prob': round(comb_prob * 100, 1),
-                'Combined_EV': round(comb_ev, 2)
-            })
-            
-        # 對當日的組合進行排序 (分數高 -> 低)
-        daily_parlays.sort(key=lambda x: x['Score'], reverse=True)
-        
-        # 只取當日前 5 名加入總表
-        all_parlays.extend(daily_parlays[:5])
+    # 2. N 串 1 (同一場比賽的主客隊不能串)，每日取分數最高的前幾名
+    # 評分機制 (Score) = EV * 0.7 + 勝率 * 0.3
+    prob = candidates['Prob'].to_numpy(dtype=float)
+    odds = candidates['Odds_Team'].to_numpy(dtype=float)
+    games = np.array([f"{a}|{b}" for a, b in game_keys(candidates['Team_Abbr'], candidates['Opp_Abbr'])], dtype=object)
+    if n_legs == 2:
+        day, legs, score = top_pairs(prob, odds, games, day_rows)
+    else:
+        day, legs, score = search_top(prob, odds, games, day_rows, n_legs)
+    all_parlays = build_parlay_frame(candidates, dates, day, legs, score) if len(day) else pd.DataFrame()
 
     # 4. 輸出結果
-    if all_parlays:
-        df_out = pd.DataFrame(all_parlays)
+    if not all_parlays.empty:
+        df_out = all_parlays
         output_file = "Daily_Parlay_Recommendations.csv"
         df_out.to_csv(output_file, index=False, encoding='utf-8-sig')
         
@@ -102,13 +140,16 @@ def generate_parlays():
         if not df_out.empty:
             latest = df_out.iloc[0]
             print(f"\n📢 [{latest['Date']}] 最佳推薦:")
-            print(f"   {latest['P1']} + {latest['P2']} (賠率 {latest['Combined_Odds']})")
+            print(f"   {' + '.join(latest[f'P{k}'] for k in range(1, n_legs + 1))} (賠率 {latest['Combined_Odds']})")
             
     else:
-        print("⚠️ 無法生成串關建議 (可能因為每天符合條件的比賽都不足 2 場)。")
+        print(f"⚠️ 無法生成串關建議 (可能因為每天符合條件的比賽都不足 {n_legs} 場)。")
         # 產生空檔防止報錯
-        cols = ['Date','Type','Team_1','Team_2','P1','P2','Combined_Odds','Combined_Prob','Combined_EV']
+        cols = ['Date','Type'] + [f'Team_{k}' for k in range(1, n_legs + 1)] + [f'P{k}' for k in range(1, n_legs + 1)] + ['Combined_Odds','Combined_Prob','Combined_EV']
         pd.DataFrame(columns=cols).to_csv("Daily_Parlay_Recommendations.csv", index=False)
 
 if __name__ == "__main__":
-    generate_parlays()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="每日串關生成器")
+    parser.add_argument('--legs', type=int, default=PARLAY_LEGS, help="幾串 1 (預設 2)")
+    args = parser.parse_args()
+    generate_parlays(n_legs=args.legs)
\ No newline at end of file
@@ -0,0 +1,184 @@
+import pandas as pd
+import numpy as np
+import os
+import json
+import hashlib
+import joblib
+import sklearn
+from datetime import datetime
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+
+# ==========================================
+# 設定區
+# ==========================================
+MODEL_DIR = "models"
+
+# 模型特徵 (順序即為模型輸入順序，需與 team_snapshot.build_matchup_features 一致)
+FEATURE_COLUMNS = [
+    'Diff_Days_Since_Last_Game', 'Diff_Before_Game_Streak',
+    'Diff_Before_Game_Win_Pct_Last_5', 'Diff_Before_Game_Avg_Margin_Last_5',
+    'Diff_Before_Game_Win_Pct_Last_10', 'Diff_CS_Win_Pct_L5', 'Diff_CS_Avg_Margin_L5',
+    'Diff_Before_Game_H2H_Win_Pct_L5', 'Diff_Before_Game_H2H_Avg_Margin_L5',
+    'Diff_Total_Injury_Impact', 'Diff_Before_Game_Avg_NetRtg',
+    'Diff_Before_Game_Avg_TOV_Rate', 'Diff_Before_Game_Avg_ORB_Pct'
+]
+TARGET_COLUMN = 'Win'
+
+RF_PARAMS = {'n_estimators': 100, 'random_state': 42}
+
+# 增量更新 (warm_start)：新資料不多時在既有森林上加樹，定期完整重訓
+INCREMENTAL_TREES = 10          # 每次增量更新新增的樹
+INCREMENTAL_MAX_ROWS = 300      # 新增場次超過此數改為完整重訓
+INCREMENTAL_MAX_TREES = 200     # 森林超過此樹數改為完整重訓
+RECENT_WINDOW_DAYS = 365        # 新樹只用最近一年的比賽訓練
+RECENT_HALF_LIFE_DAYS = 60      # 視窗內樣本權重半衰期 (越近的比賽權重越高)
+FULL_RETRAIN_DAYS = 7           # 距上次完整重訓超過此天數就完整重訓
+
+def data_fingerprint(df_train, feature_columns=FEATURE_COLUMNS):
+    """
+    訓練資料指紋：特徵名稱 + 特徵值 + 標籤，任何一筆改變都會不同
+    逐列雜湊後排序，與列順序無關 (可用來檢查「截止日前的資料」是否被改動)
+    """
+    data = df_train[feature_columns + [TARGET_COLUMN]].reset_index(drop=True)
+    h = hashlib.sha256()
+    h.update(json.dumps(feature_columns).encode('utf-8'))
+    h.update(json.dumps(RF_PARAMS, sort_keys=True).encode('utf-8'))
+    h.update(np.sort(pd.util.hash_pandas_object(data, index=False).values).tobytes())
+    return h.hexdigest()
+
+def train_model(df_train, feature_columns=FEATURE_COLUMNS):
+    """標準化 + 隨機森林 (與原本各腳本內的訓練流程相同)"""
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(df_train[feature_columns])
+    model = RandomForestClassifier(**RF_PARAMS)
+    model.fit(X_scaled, df_train[TARGET_COLUMN])
+    return scaler, model
+
+def recent_sample_weight(dates, cutoff, half_life_days=RECENT_HALF_LIFE_DAYS):
+    """依距截止日天數做指數衰減的樣本權重"""
+    age = (pd.Timestamp(cutoff) - pd.to_datetime(dates)).dt.days.to_numpy()
+    return 0.5 ** (age / half_life_days)
+
+def update_model(scaler, model, df_window, n_new_trees=INCREMENTAL_TREES, date_col='date', feature_columns=FEATURE_COLUMNS):
+    """
+    warm_start 增量更新：保留既有的樹與 scaler，只在近期視窗上新增 n_new_trees 棵樹
+    scaler 不重新 fit (舊樹的切分點依賴原本的標準化)；feature_columns 必須與原本訓練時相同
+    """
+    X_scaled = scaler.transform(df_window[feature_columns])
+    cutoff = pd.to_datetime(df_window[date_col]).max()
+    model.set_params(warm_start=True, n_estimators=len(model.estimators_) + n_new_trees)
+    model.fit(X_scaled, df_window[TARGET_COLUMN], sample_weight=recent_sample_weight(df_window[date_col], cutoff))
+    model.set_params(warm_start=False)
+    return model
+
+def _incremental_delta(df_train, meta, feature_columns, date_col):
+    """
+    判斷能否增量更新：截止日前的資料必須與上次訓練完全相同
+    可以時回傳截止日之後的新資料，否則回傳 None
+    """
+    if meta is None or meta.get('feature_columns') != list(feature_columns): return None
+    if meta.get('sklearn_version') != sklearn.__version__: return None
+    dates = pd.to_datetime(df_train[date_col])
+    cutoff = pd.Timestamp(meta['cutoff_date'])
+    if data_fingerprint(df_train[dates <= cutoff], feature_columns) != meta['fingerprint']: return None
+    delta = df_train[dates > cutoff]
+    last_full = pd.Timestamp(meta.get('full_cutoff_date', meta['cutoff_date']))
+    if needs_full_retrain(len(delta), meta.get('n_estimators', RF_PARAMS['n_estimators']), (dates.max() - last_full).days):
+        return None
+    return delta
+
+def needs_full_retrain(n_new_rows, n_trees, days_since_full):
+    """增量更新的排程規則 (get_or_train 與 predictions_2026_full_report 的 walk-forward 重播共用)"""
+    return (n_new_rows > INCREMENTAL_MAX_ROWS
+            or n_trees + INCREMENTAL_TREES > INCREMENTAL_MAX_TREES
+            or days_since_full > FULL_RETRAIN_DAYS)
+
+def recent_window(df_train, date_col='date'):
+    """增量更新用的近期視窗：最後一場之前 RECENT_WINDOW_DAYS 天內的比賽"""
+    dates = pd.to_datetime(df_train[date_col])
+    return df_train[dates > dates.max() - pd.Timedelta(days=RECENT_WINDOW_DAYS)]
+
+def _artifact_paths(name, model_dir):
+    return os.path.join(model_dir, f"{name}.joblib"), os.path.join(model_dir, f"{name}.json")
+
+def load_model_meta(name, model_dir=MODEL_DIR):
+    _, meta_path = _artifact_paths(name, model_dir)
+    if not os.path.exists(meta_path): return None
+    with open(meta_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def load_saved_model(name, model_dir=MODEL_DIR):
+    """只讀取已存模型 (不訓練)，找不到時回傳 None；回傳 (scaler, model, meta)"""
+    model_path, _ = _artifact_paths(name, model_dir)
+    meta = load_model_meta(name, model_dir)
+    if meta is None or not os.path.exists(model_path): return None
+    bundle = joblib.load(model_path)
+    return bundle['scaler'], bundle['model'], meta
+
+def save_model(name, scaler, model, meta, model_dir=MODEL_DIR):
+    os.makedirs(model_dir, exist_ok=True)
+    model_path, meta_path = _artifact_paths(name, model_dir)
+    # 先寫暫存檔再 os.replace (原子替換)，同時讀取的程式不會讀到寫一半的檔案
+    joblib.dump({'scaler': scaler, 'model': model}, model_path + ".tmp")
+    os.replace(model_path + ".tmp", model_path)
+    # 模型檔寫完才寫 meta，中斷時不會留下指向舊模型的 meta
+    with open(meta_path + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    os.replace(meta_path + ".tmp", meta_path)
+
+def get_or_train(df_train, name, feature_columns=FEATURE_COLUMNS, date_col='date', force=False, incremental=False):
+    """
+    訓練資料 (特徵、標籤、特徵清單、參數、sklearn 版本) 都沒變時直接載入已存模型
+    incremental=True 且只新增少量比賽時以 warm_start 加樹，否則完整重訓並覆寫 models/{name}.*
+    回傳 (scaler, model, meta)
+    """
+    fingerprint = data_fingerprint(df_train, feature_columns)
+    meta = load_model_meta(name)
+    model_path, _ = _artifact_paths(name, MODEL_DIR)
+    has_model = meta is not None and os.path.exists(model_path)
+
+    if (not force and has_model
+            and meta.get('fingerprint') == fingerprint
+            and meta.get('feature_columns') == list(feature_columns)
+            and meta.get('sklearn_version') == sklearn.__version__):
+        bundle = joblib.load(model_path)
+        print(f"載入已存模型: {model_path} (訓練截止 {meta['cutoff_date']}, {meta['n_rows']} 筆)")
+        return bundle['scaler'], bundle['model'], meta
+
+    cutoff = pd.to_datetime(df_train[date_col]).max()
+    delta = _incremental_delta(df_train, meta, feature_columns, date_col) if (incremental and has_model and not force) else None
+
+    if delta is not None and not delta.empty:
+        bundle = joblib.load(model_path)
+        scaler, model = bundle['scaler'], bundle['model']
+        window = recent_window(df_train, date_col)
+        print(f"增量更新模型 ({name}): 新增 {len(delta)} 筆, 以近 {len(window)} 筆加 {INCREMENTAL_TREES} 棵樹...")
+        update_model(scaler, model, window, date_col=date_col, feature_columns=feature_columns)
+        mode = 'incremental'
+        full_cutoff = meta.get('full_cutoff_date', meta['cutoff_date'])
+        updates = meta.get('incremental_updates', 0) + 1
+    else:
+        reason = "找不到已存模型" if meta is None else "訓練資料已變更"
+        print(f"{reason}，重新訓練模型 ({name}, {len(df_train)} 筆)...")
+        scaler, model = train_model(df_train, feature_columns)
+        mode = 'full'
+        full_cutoff = str(cutoff.date())
+        updates = 0
+
+    meta = {
+        'name': name,
+        'fingerprint': fingerprint,
+        'feature_columns': list(feature_columns),
+        'cutoff_date': str(cutoff.date()),
+        'n_rows': int(len(df_train)),
+        'params': RF_PARAMS,
+        'n_estimators': len(model.estimators_),
+        'mode': mode,
+        'full_cutoff_date': full_cutoff,
+        'incremental_updates': updates,
+        'sklearn_version': sklearn.__version__,
+        'trained_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+    }
+    save_model(name, scaler, model, meta)
+    return scaler, model, meta
@@ -0,0 +1,80 @@
+import numpy as np
+import heapq
+from functools import reduce
+
+# ==========================================
+# 設定區
+# ==========================================
+BOUND_SLACK = 1e-9     # 上界的浮點誤差容許值 (避免因連乘順序不同而誤剪)
+
+def game_keys(teams, opps):
+    """同一場比賽的兩邊 (A vs B 與 B vs A) 對應到同一個 key"""
+    return [tuple(sorted([t, o])) for t, o in zip(teams, opps)]
+
+def _best_products(x, max_r):
+    """
+    best[r][s]：位置 >= s 的元素中任取 r 個的最大乘積 (x 皆 > 0)
+    用來當作「剩下 r 注最多還能乘上多少」的上界；不足 r 個時為 0
+    """
+    n = len(x)
+    best = np.zeros((max_r + 1, n + 1))
+    best[0, :] = 1.0
+    for s in range(n - 1, -1, -1):
+        best[1:, s] = np.maximum(best[1:, s + 1], x[s] * best[:-1, s + 1])
+    return best
+
+def search_parlays(prob, odds, games, n_legs=2, top_k=5, ev_weight=1.0, prob_weight=0.0, decimals=None):
+    """
+    N 串 1 搜尋：從候選注單中找出分數最高的 top_k 組 (同一場比賽的兩邊不可同串)
+    分數 = 串關 EV * ev_weight + 串關勝率 * prob_weight (權重需 >= 0)
+    decimals: 以四捨五入後的分數排名；同分時依原始組合順序 (與 itertools.combinations 相同)
+
+    注單依 勝率 x 賠率 由高到低展開，部分組合的分數上界 (已選乘積 x 剩餘最大乘積)
+    追不上目前第 top_k 名時整枝剪掉
+    回傳 [(score, (i1, i2, ...))]，分數由高到低，索引為傳入順序
+    """
+    prob = np.asarray(prob, dtype=np.float64)
+    odds = np.asarray(odds, dtype=np.float64)
+    n = len(prob)
+    if n_legs < 1 or n < n_legs or top_k <= 0: return []
+
+    value = prob * odds
+    order = np.argsort(-value, kind='stable')
+    v, p = value[order], prob[order]
+    g = [games[i] for i in order]
+    best_v = _best_products(v, n_legs)
+    best_p = _best_products(p, n_legs)
+
+    def finish(score):
+        return round(score, decimals) if decimals is not None else score
+
+    def upper_bound(max_value, max_prob):
+        return finish(float(((max_value - 1) * ev_weight) + (max_prob * prob_weight) + BOUND_SLACK))
+
+    odds_list, prob_list = odds.tolist(), prob.tolist()   # 用 Python float 計算，round() 結果與原本相同
+    heap = []   # 目前的 top_k (最差的在堆頂)：(score, 反向組合順序, 組合)
+    def consider(combo):
+        comb_odds = reduce(lambda a, b: a * b, [odds_list[i] for i in combo])
+        comb_prob = reduce(lambda a, b: a * b, [prob_list[i] for i in combo])
+        comb_ev = (comb_prob * comb_odds) - 1
+        score = finish((comb_ev * ev_weight) + (comb_prob * prob_weight))
+        entry = (score, tuple(-i for i in combo), combo)
+        if len(heap) < top_k:
+            heapq.heappush(heap, entry)
+        elif entry[:2] > heap[0][:2]:
+            heapq.heapreplace(heap, entry)
+
+    def extend(start, chosen, used, qv, qp):
+        r = n_legs - len(chosen)
+        if r == 0:
+            consider(tuple(sorted(int(order[c]) for c in chosen)))
+            return
+        for s in range(start, n - r + 1):
+            # 上界隨 s 遞減 (v 已排序)，一旦追不上就不必再往後找
+            if len(heap) == top_k and upper_bound(qv * best_v[r, s], qp * best_p[r, s]) < heap[0][0]:
+                break
+            if g[s] in used: continue
+            extend(s + 1, chosen + [s], used | {g[s]}, qv * v[s], qp * p[s])
+
+    extend(0, [], frozenset(), 1.0, 1.0)
+    return [(score, combo) for score, _, combo in sorted(heap, reverse=True)]
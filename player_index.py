@@ -0,0 +1,201 @@
+import pandas as pd
+import os
+import re
+import difflib
+import unicodedata
+
+# ==========================================
+# 設定區
+# ==========================================
+PLAYER_GMSC_FILE = "nba_player_single_game_gmsc_v52.csv"
+PLAYER_INDEX_FILE = "player_rating_index.csv"
+NAME_ALIAS_FILE = "player_name_aliases.csv"
+
+# 近期狀態使用指數加權平均 (alpha=0.2 約等於近 10 場)，可逐場增量更新
+RECENT_FORM_ALPHA = 0.2
+
+# 名字模糊比對門檻 (difflib ratio)，只在同隊同季候選名單內比對
+FUZZY_CUTOFF = 0.85
+NAME_SUFFIXES = {'jr', 'sr', 'ii', 'iii', 'iv', 'v'}
+
+INDEX_COLUMNS = [
+    'Player_ID', 'Season_Year', 'Player_Name', 'Team_Abbr',
+    'Games', 'GmSc_Sum', 'Season_Avg_GmSc', 'Recent_Form_GmSc', 'Last_Date'
+]
+
+def _prepare_games(df_games):
+    df = df_games[['Player_ID', 'Player_Name', 'Season_Year', 'Date', 'Team_Abbr', 'Single_Game_GmSc']].copy()
+    df = df.dropna(subset=['Player_ID'])
+    df['Date'] = pd.to_datetime(df['Date'])
+    df['Single_Game_GmSc'] = pd.to_numeric(df['Single_Game_GmSc'], errors='coerce').fillna(0.0)
+    df = df.drop_duplicates(subset=['Player_ID', 'Date'], keep='last')
+    return df.sort_values(['Player_ID', 'Date'], kind='mergesort').reset_index(drop=True)
+
+def _split_stale(index, new):
+    """
+    把已整理的新比賽分成 (可併入, 不晚於該球員 Last_Date 的比賽)
+    後者可能是重複匯入，也可能是補抓 / 重新解析的舊比賽 (增量併入無法處理)
+    """
+    keys = ['Player_ID', 'Season_Year']
+    if index.empty:
+        return new, new.iloc[0:0]
+    merged = new.merge(index[keys + ['Last_Date']], on=keys, how='left')
+    stale = merged['Last_Date'].notna() & (merged['Date'] <= merged['Last_Date'])
+    return merged[~stale].drop(columns=['Last_Date']), merged[stale].drop(columns=['Last_Date'])
+
+def _log_stale(stale, action):
+    if stale.empty: return
+    print(f"警告: {len(stale)} 筆球員比賽 ({stale['Player_ID'].nunique()} 人, "
+          f"{stale['Date'].min():%Y-%m-%d} ~ {stale['Date'].max():%Y-%m-%d}) 不晚於索引中的 Last_Date，{action}")
+
+def _fold_games(index, df_games):
+    """
+    將新比賽併入索引 (每位球員每季一列)
+    已存在的球員只接受晚於 Last_Date 的比賽，其餘略過並記錄 (重複匯入不會重算)
+    """
+    keys = ['Player_ID', 'Season_Year']
+    new, stale = _split_stale(index, _prepare_games(df_games))
+    _log_stale(stale, "已略過")
+    if new.empty:
+        return index
+
+    # 近期狀態：以舊索引的 Recent_Form 作為種子，接續做 EWMA
+    seed = pd.DataFrame(columns=keys + ['Single_Game_GmSc'])
+    if not index.empty:
+        seed = index.loc[index.set_index(keys).index.isin(new.set_index(keys).index), keys + ['Recent_Form_GmSc']]
+        seed = seed.rename(columns={'Recent_Form_GmSc': 'Single_Game_GmSc'})
+    series = pd.concat([seed[keys + ['Single_Game_GmSc']], new[keys + ['Single_Game_GmSc']]], ignore_index=True)
+    series['Single_Game_GmSc'] = series['Single_Game_GmSc'].astype(float)
+    ewm = series.groupby(keys)['Single_Game_GmSc'].ewm(alpha=RECENT_FORM_ALPHA, adjust=False).mean()
+    recent = ewm.groupby(level=[0, 1]).last().rename('Recent_Form_GmSc')
+
+    delta = new.groupby(keys).agg(
+        Player_Name=('Player_Name', 'last'),
+        Team_Abbr=('Team_Abbr', 'last'),
+        Games=('Single_Game_GmSc', 'size'),
+        GmSc_Sum=('Single_Game_GmSc', 'sum'),
+        Last_Date=('Date', 'max'),
+    )
+    delta = delta.join(recent)
+
+    if not index.empty:
+        old = index.set_index(keys)
+        common = delta.index.intersection(old.index)
+        delta.loc[common, 'Games'] += old.loc[common, 'Games']
+        delta.loc[common, 'GmSc_Sum'] += old.loc[common, 'GmSc_Sum']
+        index = pd.concat([old.drop(common), delta]).reset_index()
+    else:
+        index = delta.reset_index()
+
+    index['Season_Avg_GmSc'] = index['GmSc_Sum'] / index['Games']
+    return index[INDEX_COLUMNS].sort_values(keys).reset_index(drop=True)
+
+def load_player_index(index_file=PLAYER_INDEX_FILE):
+    if not os.path.exists(index_file):
+        return pd.DataFrame(columns=INDEX_COLUMNS)
+    df = pd.read_csv(index_file)
+    df['Last_Date'] = pd.to_datetime(df['Last_Date'])
+    return df
+
+def save_player_index(index, index_file=PLAYER_INDEX_FILE):
+    out = index.copy()
+    out['Last_Date'] = pd.to_datetime(out['Last_Date']).dt.strftime('%Y-%m-%d')
+    out.to_csv(index_file, index=False)
+
+def update_player_index(df_new_games, index_file=PLAYER_INDEX_FILE, player_file=PLAYER_GMSC_FILE):
+    """
+    匯入新解析的球員單場資料 (v300 呼叫)；索引尚未建立時改由完整單場檔建立
+    出現不晚於 Last_Date 的比賽 (補抓或重新解析的舊比賽) 時，由完整單場檔重建，避免舊比賽永久遺失
+    """
+    if not os.path.exists(index_file) and os.path.exists(player_file):
+        return rebuild_player_index(player_file, index_file)
+    index = load_player_index(index_file)
+    if os.path.exists(player_file):
+        _, stale = _split_stale(index, _prepare_games(df_new_games))
+        if not stale.empty:
+            _log_stale(stale, "改為由完整單場檔重建索引")
+            return rebuild_player_index(player_file, index_file)
+    index = _fold_games(index, df_new_games)
+    save_player_index(index, index_file)
+    return index
+
+def rebuild_player_index(player_file=PLAYER_GMSC_FILE, index_file=PLAYER_INDEX_FILE):
+    """由完整單場檔重建索引 (首次使用或一致性檢查)"""
+    index = _fold_games(pd.DataFrame(columns=INDEX_COLUMNS), pd.read_csv(player_file))
+    save_player_index(index, index_file)
+    return index
+
+def get_player_index(player_file=PLAYER_GMSC_FILE, index_file=PLAYER_INDEX_FILE):
+    """讀取索引；尚未建立時由單場檔建立一次"""
+    if os.path.exists(index_file):
+        return load_player_index(index_file)
+    if not os.path.exists(player_file):
+        return pd.DataFrame(columns=INDEX_COLUMNS)
+    print(f"正在建立球員評分索引: {index_file} ...")
+    return rebuild_player_index(player_file, index_file)
+
+def latest_season_ratings(index, column='Season_Avg_GmSc'):
+    """Player_ID -> 最新賽季評分 (推論用)"""
+    if index.empty: return {}
+    latest = index[index['Season_Year'] == index['Season_Year'].max()]
+    return latest.set_index('Player_ID')[column].to_dict()
+
+# ==========================================
+# 球員名字 -> Player_ID 解析
+# ==========================================
+def normalize_player_name(name):
+    """去除重音、標點與 Jr./III 等後綴：'Kristaps Porziņģis' -> 'kristaps porzingis'"""
+    if not isinstance(name, str): return ""
+    text = unicodedata.normalize('NFKD', name)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    tokens = re.sub(r"[^a-z0-9 ]", " ", text.replace("'", "").replace(".", "")).split()
+    return " ".join(t for t in tokens if t not in NAME_SUFFIXES)
+
+def build_name_index(index):
+    """
+    由球員評分索引建立名字解析表
+    回傳 dict: team_season[(team, season, key)] / season[(season, key)] -> Player_ID
+    以及 candidates[(team, season)] -> 名字 key 清單 (模糊比對用)
+    """
+    df = index[['Player_ID', 'Season_Year', 'Team_Abbr', 'Player_Name']].dropna(subset=['Player_ID']).copy()
+    df['Name_Key'] = df['Player_Name'].map(normalize_player_name)
+    df_season = df.drop_duplicates(['Season_Year', 'Name_Key'], keep=False)
+
+    return {
+        'team_season': dict(zip(zip(df['Team_Abbr'], df['Season_Year'], df['Name_Key']), df['Player_ID'])),
+        'season': dict(zip(zip(df_season['Season_Year'], df_season['Name_Key']), df_season['Player_ID'])),
+        'candidates': df.groupby(['Team_Abbr', 'Season_Year'])['Name_Key'].apply(list).to_dict(),
+        'aliases': load_name_aliases(),
+        'dirty': False,
+    }
+
+def load_name_aliases(alias_file=NAME_ALIAS_FILE):
+    """模糊比對結果快取 (含比對失敗)，同一名字只算一次"""
+    if not os.path.exists(alias_file): return {}
+    df = pd.read_csv(alias_file, dtype={'Player_ID': str}).fillna({'Player_ID': ''})
+    return dict(zip(zip(df['Team_Abbr'], df['Season_Year'], df['Player_Name']), df['Player_ID']))
+
+def save_name_aliases(name_index, alias_file=NAME_ALIAS_FILE):
+    if not name_index['dirty']: return
+    rows = [{'Team_Abbr': t, 'Season_Year': s, 'Player_Name': n, 'Player_ID': pid}
+            for (t, s, n), pid in name_index['aliases'].items()]
+    pd.DataFrame(rows, columns=['Team_Abbr', 'Season_Year', 'Player_Name', 'Player_ID']).to_csv(alias_file, index=False)
+    name_index['dirty'] = False
+
+def resolve_player_id(name_index, player_name, team, season):
+    """名字 -> Player_ID：同隊同季精確 -> 同季唯一 -> 快取的模糊比對；找不到回傳 None"""
+    key = normalize_player_name(player_name)
+    if not key: return None
+    pid = name_index['team_season'].get((team, season, key)) or name_index['season'].get((season, key))
+    if pid: return pid
+
+    alias_key = (team, season, player_name)
+    if alias_key not in name_index['aliases']:
+        match = difflib.get_close_matches(key, name_index['candidates'].get((team, season), []), n=1, cutoff=FUZZY_CUTOFF)
+        name_index['aliases'][alias_key] = name_index['team_season'][(team, season, match[0])] if match else ''
+        name_index['dirty'] = True
+    return name_index['aliases'][alias_key] or None
+
+if __name__ == "__main__":
+    idx = rebuild_player_index()
+    print(f"成功重建球員評分索引: {PLAYER_INDEX_FILE} (共 {len(idx)} 筆)")
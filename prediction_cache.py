@@ -0,0 +1,61 @@
+import pandas as pd
+import numpy as np
+import os
+import hashlib
+from datetime import datetime
+from model_registry import MODEL_DIR
+
+# ==========================================
+# 設定區
+# ==========================================
+PREDICTION_CACHE_FILE = os.path.join(MODEL_DIR, "prediction_cache.csv")
+CACHE_KEEP_DAYS = 14    # 只保留最近 N 個比賽日的快取
+CACHE_COLUMNS = ['Date', 'Home', 'Away', 'Model_Version', 'Feature_Hash', 'Home_Win_Prob', 'Cached_At']
+
+def model_version(meta):
+    """模型版本：訓練資料指紋 + 訓練時間 (增量加樹或重訓都會改變)"""
+    raw = f"{meta['fingerprint']}|{meta.get('trained_at', '')}|{meta.get('n_estimators', '')}"
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:16]
+
+def feature_hash(features):
+    """單場特徵向量的雜湊 (float64 逐位元)，任何輸入改變 (例如新傷兵) 都會不同"""
+    return hashlib.sha256(np.asarray(features, dtype=np.float64).tobytes()).hexdigest()[:16]
+
+def load_prediction_cache(cache_file=PREDICTION_CACHE_FILE):
+    if not os.path.exists(cache_file):
+        return pd.DataFrame(columns=CACHE_COLUMNS)
+    return pd.read_csv(cache_file, dtype={'Model_Version': str, 'Feature_Hash': str})
+
+def save_prediction_cache(cache, cache_file=PREDICTION_CACHE_FILE):
+    if cache.empty: return
+    dates = pd.to_datetime(cache['Date'])
+    cache = cache[dates >= dates.max() - pd.Timedelta(days=CACHE_KEEP_DAYS)]
+    os.makedirs(os.path.dirname(cache_file) or ".", exist_ok=True)
+    cache.to_csv(cache_file, index=False)
+
+def cached_predict(keys, features, version, predict_fn, cache_file=PREDICTION_CACHE_FILE):
+    """
+    keys: [(date_str, home, away)]，features: 對應的特徵列
+    (date, home, away, 模型版本, 特徵雜湊) 都相同時直接回傳快取機率
+    其餘場次交給 predict_fn(features) 一次計算並寫回快取
+    """
+    if not keys: return np.array([])
+    cache = load_prediction_cache(cache_file)
+    lookup = dict(zip(zip(cache['Date'], cache['Home'], cache['Away'], cache['Model_Version'], cache['Feature_Hash']),
+                      cache['Home_Win_Prob']))
+
+    full_keys = [(d, h, a, version, feature_hash(f)) for (d, h, a), f in zip(keys, features)]
+    probs = np.array([lookup.get(k, np.nan) for k in full_keys], dtype=np.float64)
+    miss = np.flatnonzero(np.isnan(probs))
+
+    if len(miss):
+        probs[miss] = predict_fn([features[i] for i in miss])
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        new_rows = pd.DataFrame([full_keys[i] + (probs[i], now) for i in miss], columns=CACHE_COLUMNS)
+        # 相同 key 只保留最新一筆
+        cache = pd.concat([cache, new_rows], ignore_index=True)
+        cache = cache.drop_duplicates(subset=['Date', 'Home', 'Away', 'Model_Version', 'Feature_Hash'], keep='last')
+        save_prediction_cache(cache, cache_file)
+
+    print(f"預測快取: 命中 {len(keys) - len(miss)} 場, 重新計算 {len(miss)} 場")
+    return probs
@@ -1,12 +1,192 @@
 import pandas as pd
 import numpy as np
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.preprocessing import StandardScaler
+import os
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 from sklearn.metrics import accuracy_score, classification_report
+import model_registry
+from model_registry import (MODEL_DIR, FEATURE_COLUMNS, data_fingerprint, train_model, get_or_train,
+                            update_model, needs_full_retrain, recent_window)
 
-def predict_2026_season_full(input_file):
+# ==========================================
+# 設定區
+# ==========================================
+TEST_SEASON = 2026
+OUTPUT_FILE = "predictions_2026_full_report.csv"
+
+# Walk-forward 回測：每個重訓點只用「之前」的比賽訓練，預測到下一個重訓點為止
+# production = 重播 v500 的 get_or_train(incremental=True)：每日 warm_start 加樹，依排程完整重訓 (與正式環境相同)
+# daily = 每個比賽日完整重訓；weekly = 每 7 天完整重訓一次 (與正式環境的訓練方式不同)
+CADENCE_DAYS = {'daily': 1, 'weekly': 7}
+CADENCES = ['production'] + list(CADENCE_DAYS)
+# 增量排程參數 (任何一項改變，production 重播的快取就失效)
+SCHEDULE_PARAMS = ['INCREMENTAL_TREES', 'INCREMENTAL_MAX_ROWS', 'INCREMENTAL_MAX_TREES',
+                   'RECENT_WINDOW_DAYS', 'RECENT_HALF_LIFE_DAYS', 'FULL_RETRAIN_DAYS']
+N_JOBS = os.cpu_count() or 1
+
+# 每個重訓點的預測結果快取 (以訓練資料指紋為 key；只存機率，不存 40MB 的森林)
+WALK_FORWARD_CACHE = os.path.join(MODEL_DIR, "walk_forward_cache.csv")
+
+_WORKER_DF = None
+
+def _init_worker(df):
+    global _WORKER_DF
+    _WORKER_DF = df
+
+def _fit_and_score(task):
+    """單一重訓點：以 cutoff 之前的資料訓練，預測 [cutoff, block_end) 的比賽"""
+    cutoff, block_end = task
+    df = _WORKER_DF
+    train_df = df[df['date_dt'] < cutoff]
+    block = df[(df['date_dt'] >= cutoff) & (df['date_dt'] < block_end) & (df['Season_Year'] == TEST_SEASON)]
+    scaler, model = train_model(train_df)
+    probs = model.predict_proba(scaler.transform(block[FEATURE_COLUMNS]))[:, 1]
+    return pd.DataFrame({'Row': block.index, 'Win_Prob': probs})
+
+def walk_forward_schedule(df, cadence='daily'):
+    """回傳 [(cutoff, block_end)]：cutoff 為區塊第一個比賽日"""
+    days = sorted(df.loc[df['Season_Year'] == TEST_SEASON, 'date_dt'].unique())
+    if not days: return []
+    step = CADENCE_DAYS[cadence]
+    first = days[0]
+    blocks = {}
+    for day in days:
+        blocks.setdefault((day - first).days // step, []).append(day)
+    starts = [b[0] for b in blocks.values()]
+    ends = starts[1:] + [days[-1] + pd.Timedelta(days=1)]
+    return list(zip(starts, ends))
+
+def _load_cache():
+    if not os.path.exists(WALK_FORWARD_CACHE):
+        return pd.DataFrame(columns=['Key', 'date', 'Team_Abbr', 'Opp_Abbr', 'Win_Prob', 'Train_Mode'])
+    cache = pd.read_csv(WALK_FORWARD_CACHE)
+    if 'Train_Mode' not in cache.columns:
+        cache['Train_Mode'] = 'full'
+    return cache
+
+def _block_key(df, cutoff, block_end):
+    return f"{pd.Timestamp(cutoff).date()}_{pd.Timestamp(block_end).date()}_{data_fingerprint(df[df['date_dt'] < cutoff])[:16]}"
+
+def _current_keys(df):
+    """目前資料下仍有效的快取 key：production 重播 + 每種 cadence 的所有重訓點"""
+    keys = {_production_key(df)}
+    for cadence in CADENCE_DAYS:
+        keys |= {_block_key(df, cutoff, block_end) for cutoff, block_end in walk_forward_schedule(df, cadence)}
+    return keys
+
+def _save_cache(cache, new_rows, df):
+    """寫入新結果，並丟掉目前資料下不會再用到的舊 key (資料更新後的整季 production 結果、過期的最後區塊)"""
+    out = pd.concat([cache] + new_rows, ignore_index=True)
+    keep = out['Key'].isin(_current_keys(df))
+    if not keep.all():
+        print(f"清除過期的 walk-forward 快取: {out.loc[~keep, 'Key'].nunique()} 個 key, {int((~keep).sum())} 筆")
+    os.makedirs(MODEL_DIR, exist_ok=True)
+    out[keep].to_csv(WALK_FORWARD_CACHE, index=False)
+
+def production_replay(df):
+    """
+    重播 v500 每日的 get_or_train(incremental=True)：第一個比賽日完整訓練，之後每個比賽日
+    依 needs_full_retrain (與正式環境同一套規則) 決定完整重訓或在近期視窗上 warm_start 加樹
+    增量模型依賴前一天的狀態，只能依序執行；回傳 [(列索引, 機率, 訓練方式)]
+    """
+    days = sorted(df.loc[df['Season_Year'] == TEST_SEASON, 'date_dt'].unique())
+    scaler = model = None
+    outputs = []
+    for day in days:
+        train_df = df[df['date_dt'] < day]
+        cutoff = train_df['date_dt'].max()
+        if model is None:
+            mode = 'full'
+        else:
+            n_new = int((train_df['date_dt'] > last_cutoff).sum())
+            if n_new == 0:
+                mode = outputs[-1][2]       # 沒有新比賽：沿用同一個模型
+            elif needs_full_retrain(n_new, len(model.estimators_), (cutoff - last_full).days):
+                mode = 'full'
+            else:
+                update_model(scaler, model, recent_window(train_df))
+                mode = 'incremental'
+        if mode == 'full' and (model is None or cutoff != last_cutoff):
+            scaler, model = train_model(train_df)
+            last_full = cutoff
+        last_cutoff = cutoff
+
+        block = df[(df['date_dt'] == day) & (df['Season_Year'] == TEST_SEASON)]
+        probs = model.predict_proba(scaler.transform(block[FEATURE_COLUMNS]))[:, 1]
+        outputs.append((block.index, probs, mode))
+    return outputs
+
+def _production_key(df):
+    params = "_".join(str(getattr(model_registry, p)) for p in SCHEDULE_PARAMS)
+    return f"production_{params}_{data_fingerprint(df)[:16]}"
+
+def walk_forward_predict(df, cadence='production', n_jobs=N_JOBS):
+    """
+    依 cadence 重訓並預測，回傳與 df 同索引的 (Win_Prob, Train_Mode) (只有測試賽季有值)
+    daily / weekly 各重訓點彼此獨立，以多進程平行處理；已算過的重訓點直接讀快取
+    production 依序重播整季 (整季一個快取 key)
+    """
+    cache = _load_cache()
+    cached_keys = set(cache['Key'])
+    probs = pd.Series(np.nan, index=df.index)
+    modes = pd.Series('', index=df.index, dtype=object)
+    row_keys = df[['date', 'Team_Abbr', 'Opp_Abbr']]
+
+    if cadence == 'production':
+        key = _production_key(df)
+        if key in cached_keys:
+            hit = row_keys.reset_index().merge(cache[cache['Key'] == key], on=['date', 'Team_Abbr', 'Opp_Abbr'])
+            probs.loc[hit['index'].values] = hit['Win_Prob'].values
+            modes.loc[hit['index'].values] = hit['Train_Mode'].values
+            print("Walk-forward (production): 快取命中")
+            return probs, modes
+        outputs = production_replay(df)
+        n_full = sum(1 for _, _, m in outputs if m == 'full')
+        print(f"Walk-forward (production): {len(outputs)} 個比賽日, 完整訓練 {n_full} 天, 增量加樹 {len(outputs) - n_full} 天")
+        for rows, p, m in outputs:
+            probs.loc[rows] = p
+            modes.loc[rows] = m
+        test = modes != ''
+        new_rows = row_keys[test].assign(Key=key, Win_Prob=probs[test].values, Train_Mode=modes[test].values)
+        _save_cache(cache, [new_rows], df)
+        return probs, modes
+
+    schedule = walk_forward_schedule(df, cadence)
+
+    todo, keys = [], {}
+    for cutoff, block_end in schedule:
+        key = _block_key(df, cutoff, block_end)
+        keys[cutoff] = key
+        if key in cached_keys:
+            hit = row_keys.reset_index().merge(cache[cache['Key'] == key], on=['date', 'Team_Abbr', 'Opp_Abbr'])
+            probs.loc[hit['index'].values] = hit['Win_Prob'].values
+        else:
+            todo.append((cutoff, block_end))
+
+    print(f"Walk-forward ({cadence}): {len(schedule)} 個重訓點, 快取命中 {len(schedule) - len(todo)}, 需訓練 {len(todo)} (workers={n_jobs})")
+
+    new_rows = []
+    if todo:
+        if n_jobs > 1 and len(todo) > 1:
+            with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker, initargs=(df,)) as pool:
+                outputs = list(pool.map(_fit_and_score, todo))
+        else:
+            _init_worker(df)
+            outputs = [_fit_and_score(task) for task in todo]
+
+        for (cutoff, _), out in zip(todo, outputs):
+            probs.loc[out['Row'].values] = out['Win_Prob'].values
+            rows = row_keys.loc[out['Row'].values].assign(Key=keys[cutoff], Win_Prob=out['Win_Prob'].values, Train_Mode='full')
+            new_rows.append(rows)
+
+        _save_cache(cache, new_rows, df)
+
+    modes[probs.notna()] = 'full'
+    return probs, modes
+
+def predict_2026_season_full(input_file, mode='walk_forward', cadence='production', n_jobs=N_JOBS):
     print(f"--- 執行 2026 賽季完整預測與準確率分析 ---")
-    
+
     try:
         df = pd.read_csv(input_file)
         print(f"成功讀取數據: {len(df)} 筆")
@@ -15,15 +195,8 @@ def predict_2026_season_full(input_file):
         return
 
     # 2. 定義特徵
-    feature_columns = [
-        'Diff_Days_Since_Last_Game', 'Diff_Before_Game_Streak',
-        'Diff_Before_Game_Win_Pct_Last_5', 'Diff_Before_Game_Avg_Margin_Last_5',
-        'Diff_Before_Game_Win_Pct_Last_10', 'Diff_CS_Win_Pct_L5', 'Diff_CS_Avg_Margin_L5',
-        'Diff_Before_Game_H2H_Win_Pct_L5', 'Diff_Before_Game_H2H_Avg_Margin_L5',
-        'Diff_Total_Injury_Impact', 'Diff_Before_Game_Avg_NetRtg',
-        'Diff_Before_Game_Avg_TOV_Rate', 'Diff_Before_Game_Avg_ORB_Pct'
-    ]
-    
+    feature_columns = FEATURE_COLUMNS
+
     # 檢查欄位
     missing = [c for c in feature_columns if c not in df.columns]
     if missing:
@@ -31,63 +204,79 @@ def predict_2026_season_full(input_file):
         return
 
     df = df.fillna(0)
+    df['date_dt'] = pd.to_datetime(df['date'])
 
     # 3. 切分訓練 (2016-2025) 與 測試 (2026)
-    train_df = df[df['Season_Year'] < 2026].copy()
-    test_df = df[df['Season_Year'] == 2026].copy()
-    
+    train_df = df[df['Season_Year'] < TEST_SEASON].copy()
+    test_df = df[df['Season_Year'] == TEST_SEASON].copy()
+
     if test_df.empty:
         print("錯誤: 找不到 2026 賽季數據")
         return
-        
+
     print(f"訓練集: {len(train_df)} 筆")
     print(f"測試集 (2026): {len(test_df)} 筆")
-    
-    X_train = train_df[feature_columns]
-    y_train = train_df['Win']
+
     X_test = test_df[feature_columns]
     y_test = test_df['Win']
-    
-    # 4. 訓練
-    scaler = StandardScaler()
-    X_train_scaled = scaler.fit_transform(X_train)
-    X_test_scaled = scaler.transform(X_test)
-    
-    model = RandomForestClassifier(n_estimators=100, random_state=42)
-    model.fit(X_train_scaled, y_train)
-    print("模型訓練完成")
-    
-    # 5. 預測
-    y_probs = model.predict_proba(X_test_scaled)[:, 1]
-    y_pred = model.predict(X_test_scaled)
-    
+
+    # 4. 訓練 + 5. 預測
+    if mode == 'static':
+        # 單一模型 (2016-2025 資料沒變時直接載入已存模型)
+        scaler, model, _ = get_or_train(train_df, "report_pre2026")
+        X_test_scaled = scaler.transform(X_test)
+        print("模型準備完成")
+        y_probs = model.predict_proba(X_test_scaled)[:, 1]
+        y_pred = model.predict(X_test_scaled)
+        train_modes = 'static'
+        print("⚠️ 注意: static 模式只訓練一次，與正式環境 (v500 每日增量更新) 的訓練方式不同")
+    else:
+        # Walk-forward：每個比賽日只用之前的所有比賽訓練
+        wf_probs, wf_modes = walk_forward_predict(df, cadence, n_jobs)
+        y_probs = wf_probs.loc[test_df.index].values
+        y_pred = (y_probs > 0.5).astype(int)
+        train_modes = wf_modes.loc[test_df.index].values
+        print("Walk-forward 預測完成")
+        if cadence != 'production':
+            print(f"⚠️ 注意: {cadence} 每次都完整重訓，與正式環境 (v500 每日增量更新) 的訓練方式不同")
+
     # 6. 整理結果
     results = test_df[['date', 'Team_Abbr', 'Opp_Abbr', 'Win']].copy()
     results['Predicted_Win'] = y_pred
     results['Win_Prob'] = y_probs
     results['Is_Correct'] = (results['Win'] == results['Predicted_Win']).astype(int)
-    
+    # 每場預測所用模型的訓練方式：full / incremental (production 重播)、static；與正式環境不同時可由此看出
+    results['Train_Mode'] = train_modes
+
     # 信心等級
     def get_confidence(prob):
         if prob >= 0.65: return "High (Home)"
         if prob <= 0.35: return "High (Away)"
         return "Normal"
-        
+
     results['Confidence'] = results['Win_Prob'].apply(get_confidence)
-    
+
     # 7. 輸出統計
     acc = accuracy_score(y_test, y_pred)
     print(f"\n2026 賽季總準確率: {acc:.4f} ({results['Is_Correct'].sum()}/{len(results)})")
-    
+
     high_conf = results[results['Confidence'] != "Normal"]
     if not high_conf.empty:
         hc_acc = high_conf['Is_Correct'].mean()
         print(f"高信心場次準確率: {hc_acc:.4f} ({high_conf['Is_Correct'].sum()}/{len(high_conf)})")
-        
+
     # 8. 存檔
-    output_file = "predictions_2026_full_report.csv"
-    results.to_csv(output_file, index=False, encoding='utf-8-sig')
-    print(f"\n詳細報告已儲存至: {output_file}")
+    results.to_csv(OUTPUT_FILE, index=False, encoding='utf-8-sig')
+    print(f"\n詳細報告已儲存至: {OUTPUT_FILE}")
 
 if __name__ == "__main__":
-    predict_2026_season_full("FINAL_MASTER_DATASET_v109_FIXED.csv")
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="2026 賽季完整預測報告")
+    parser.add_argument('--static', action='store_true', help="舊模式：只用 2026 之前的資料訓練一次")
+    parser.add_argument('--cadence', choices=CADENCES, default='production',
+                        help="walk-forward 訓練方式：production = 重播正式環境的增量 / 完整重訓排程；daily / weekly = 每次完整重訓")
+    parser.add_argument('--jobs', type=int, default=N_JOBS, help="平行訓練的進程數")
+    args = parser.parse_args()
+
+    predict_2026_season_full("FINAL_MASTER_DATASET_v109_FIXED.csv",
+                             mode='static' if args.static else 'walk_forward',
+                             cadence=args.cadence, n_jobs=args.jobs)
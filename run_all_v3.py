@@ -86,17 +86,14 @@ def main():
         "v300_get_links.py",
         "v300_parse_data_incremental.py",
         "v400_get_current_injuries.py", 
-        "v200_gmsc_cumulative.py",
-        "v1_update_v53.py", 
-        "v200data_process9.py",
-        "v200_merge_final.py",
-        "fix_columns.py",
+        "v200_feature_build.py",            # 特徵建構 (取代 v200_gmsc_cumulative -> fix_columns 五步驟)
         "PlaySport歷史賠率批次爬蟲 (增量更新版).py",
         "predictions_2026_full_report.py",
         # "v300_update_master_dataset.py",  # (可選) 更新數據       
         "v500_export_predictions.py",       # 1. 預測
         "v900_daily_strategy_output.py",    # 2. 爬賠率 + 單場策略 + 存賠率檔
         "v960_parlay_ranking_master.py",   # 3. 生成最優串關 (讀取 v900 的賠率)
+        "v990_portfolio_sizing.py",         #    單場 + 串關下注金額配置 (分數凱利)
         "v980_strategy_visualizer.py",
         "generate_dashboard.py"             # 4. 生成網頁
     ]
@@ -0,0 +1,151 @@
+import pandas as pd
+import numpy as np
+import os
+import hashlib
+
+# ==========================================
+# 設定區
+# ==========================================
+SNAPSHOT_FILE = "team_latest_state.csv"
+# 建立快照時 master dataset 的指紋 (與快照放在同一目錄)，不一致代表資料有變動 (含過去比賽的修正)
+SNAPSHOT_FINGERPRINT_SUFFIX = ".fingerprint"
+
+# 快照欄位 -> (主隊視角欄位, 客隊視角欄位)
+# 數值取自每隊最後一場比賽的「賽前」特徵 (與 v500 原本的 get_stats 相同)
+SNAPSHOT_SOURCE_COLS = {
+    'Win_Pct_Last_5': ('Before_Game_Win_Pct_Last_5', 'Opp_Before_Game_Win_Pct_Last_5'),
+    'Win_Pct_Last_10': ('Before_Game_Win_Pct_Last_10', 'Opp_Before_Game_Win_Pct_Last_10'),
+    'Margin_L5': ('Before_Game_Avg_Margin_Last_5', 'Opp_Before_Game_Avg_Margin_Last_5'),
+    'Streak': ('Before_Game_Streak', 'Opp_Before_Game_Streak'),
+    'CS_Win_L5': ('CS_Win_Pct_L5', 'Opp_CS_Win_Pct_L5'),
+    'CS_Margin_L5': ('CS_Avg_Margin_L5', 'Opp_CS_Avg_Margin_L5'),
+    'H2H_Win': ('Before_Game_H2H_Win_Pct_L5', 'Opp_Before_Game_H2H_Win_Pct_L5'),
+    'H2H_Margin': ('Before_Game_H2H_Avg_Margin_L5', 'Opp_Before_Game_H2H_Avg_Margin_L5'),
+    'NetRtg': ('Before_Game_Avg_NetRtg', 'Opp_Before_Game_Avg_NetRtg'),
+    'TOV': ('Before_Game_Avg_TOV_Rate', 'Opp_Before_Game_Avg_TOV_Rate'),
+    'ORB': ('Before_Game_Avg_ORB_Pct', 'Opp_Before_Game_Avg_ORB_Pct'),
+}
+SNAPSHOT_DEFAULTS = {'H2H_Win': 0.5}
+SNAPSHOT_COLUMNS = ['Team'] + list(SNAPSHOT_SOURCE_COLS.keys()) + ['Last_Date']
+
+def snapshot_fingerprint(df_master):
+    """
+    快照來源欄位 (日期、對戰、勝負、賽前特徵) 的指紋，任何一場比賽改變都會不同
+    數值統一轉成 float64 並四捨五入，避免 CSV 寫出 / 讀回的型別與尾數差異
+    """
+    cols = ['date', 'Team_Abbr', 'Opp_Abbr', 'Win'] + [c for pair in SNAPSHOT_SOURCE_COLS.values() for c in pair if c in df_master.columns]
+    data = df_master[cols].reset_index(drop=True).copy()
+    data['date'] = pd.to_datetime(data['date']).dt.strftime('%Y-%m-%d')
+    data[['Team_Abbr', 'Opp_Abbr']] = data[['Team_Abbr', 'Opp_Abbr']].astype(str)
+    num_cols = cols[3:]
+    data[num_cols] = data[num_cols].astype(np.float64).round(9)
+    h = hashlib.sha256()
+    h.update("|".join(cols).encode('utf-8'))
+    h.update(np.sort(pd.util.hash_pandas_object(data, index=False).values).tobytes())
+    return h.hexdigest()
+
+def _fingerprint_path(snapshot_file):
+    return snapshot_file + SNAPSHOT_FINGERPRINT_SUFFIX
+
+def load_snapshot_fingerprint(snapshot_file=SNAPSHOT_FILE):
+    path = _fingerprint_path(snapshot_file)
+    if not os.path.exists(path): return None
+    with open(path, encoding='utf-8') as f:
+        return f.read().strip()
+
+def _team_views(df_master):
+    """將每場對戰拆成兩隊各自的視角 (Team, 賽前特徵, 該場是否獲勝, 日期)"""
+    dates = pd.to_datetime(df_master['date'])
+    views = []
+    for team_col, idx, won in [('Team_Abbr', 0, df_master['Win'] == 1), ('Opp_Abbr', 1, df_master['Win'] == 0)]:
+        view = pd.DataFrame({'Team': df_master[team_col].values, 'Last_Date': dates.values, 'Won': won.values})
+        for name, cols in SNAPSHOT_SOURCE_COLS.items():
+            src = cols[idx]
+            if src in df_master.columns:
+                view[name] = df_master[src].values
+            else:
+                view[name] = SNAPSHOT_DEFAULTS.get(name, 0)
+        views.append(view)
+    return pd.concat(views, ignore_index=True)
+
+def _latest_per_team(views):
+    """取每隊最後一場，並把連勝/連敗推進到賽後狀態"""
+    latest = views.sort_values('Last_Date', kind='mergesort').groupby('Team', sort=True).tail(1).copy()
+    streak = latest['Streak']
+    latest['Streak'] = np.where(
+        latest['Won'],
+        np.where(streak > 0, streak + 1, 1),
+        np.where(streak < 0, streak - 1, -1)
+    )
+    return latest[SNAPSHOT_COLUMNS].sort_values('Team').reset_index(drop=True)
+
+def build_team_snapshot(df_master):
+    """由完整 master dataset 建立每隊一列的最新狀態表"""
+    return _latest_per_team(_team_views(df_master))
+
+def update_team_snapshot(df_master, snapshot_file=SNAPSHOT_FILE, rebuild=False):
+    """
+    增量更新快照：只處理比快照中該隊最後日期更新的比賽 (只適用於單純新增比賽)
+    過去比賽被修正時增量更新不會反映，需 rebuild=True 完整重建 (get_team_state 依指紋自動判斷)
+    找不到快照檔 (或 rebuild=True) 時改為完整重建
+    """
+    if rebuild or not os.path.exists(snapshot_file):
+        snapshot = build_team_snapshot(df_master)
+    else:
+        old = load_team_snapshot_df(snapshot_file)
+        dates = pd.to_datetime(df_master['date'])
+        recent = df_master[dates > old['Last_Date'].min()]
+        views = _team_views(recent)
+        views = views.merge(old[['Team', 'Last_Date']].rename(columns={'Last_Date': 'Prev_Date'}), on='Team', how='left')
+        views = views[views['Prev_Date'].isna() | (views['Last_Date'] > views['Prev_Date'])]
+        if views.empty:
+            snapshot = old
+        else:
+            fresh = _latest_per_team(views.drop(columns=['Prev_Date']))
+            snapshot = pd.concat([old[~old['Team'].isin(fresh['Team'])], fresh], ignore_index=True)
+            snapshot = snapshot.sort_values('Team').reset_index(drop=True)
+
+    out = snapshot.copy()
+    out['Last_Date'] = pd.to_datetime(out['Last_Date']).dt.strftime('%Y-%m-%d')
+    out.to_csv(snapshot_file, index=False)
+    with open(_fingerprint_path(snapshot_file), 'w', encoding='utf-8') as f:
+        f.write(snapshot_fingerprint(df_master))
+    return snapshot
+
+def load_team_snapshot_df(snapshot_file=SNAPSHOT_FILE):
+    df = pd.read_csv(snapshot_file)
+    df['Last_Date'] = pd.to_datetime(df['Last_Date'])
+    return df
+
+def get_team_state(df_master, snapshot_file=SNAPSHOT_FILE):
+    """
+    快照的資料指紋與 master dataset 相同時直接讀取，否則完整重建 (只需一次 groupby-tail)
+    只比對最新日期會漏掉過去比賽的修正；回傳 Team -> stats dict
+    """
+    if os.path.exists(snapshot_file) and load_snapshot_fingerprint(snapshot_file) == snapshot_fingerprint(df_master):
+        return snapshot_to_dict(load_team_snapshot_df(snapshot_file))
+    print("正在重建球隊狀態快照 (資料已變動)...")
+    return snapshot_to_dict(update_team_snapshot(df_master, snapshot_file, rebuild=True))
+
+def snapshot_to_dict(snapshot):
+    """Team -> stats dict，供每場比賽兩次 O(1) 查表"""
+    return snapshot.set_index('Team').to_dict('index')
+
+def build_matchup_features(h_stats, a_stats, target_date, diff_inj):
+    """依 v500 特徵順序組出單場 (主 - 客) 差值向量"""
+    diff_rest = (target_date - h_stats['Last_Date']).days - (target_date - a_stats['Last_Date']).days
+    return [
+        diff_rest,
+        h_stats['Streak'] - a_stats['Streak'],
+        h_stats['Win_Pct_Last_5'] - a_stats['Win_Pct_Last_5'],
+        h_stats['Margin_L5'] - a_stats['Margin_L5'],
+        h_stats['Win_Pct_Last_10'] - a_stats['Win_Pct_Last_10'],
+        h_stats['CS_Win_L5'] - a_stats['CS_Win_L5'],
+        h_stats['CS_Margin_L5'] - a_stats['CS_Margin_L5'],
+        h_stats['H2H_Win'] - a_stats['H2H_Win'],
+        h_stats['H2H_Margin'] - a_stats['H2H_Margin'],
+        diff_inj,
+        h_stats['NetRtg'] - a_stats['NetRtg'],
+        h_stats['TOV'] - a_stats['TOV'],
+        h_stats['ORB'] - a_stats['ORB']
+    ]
@@ -0,0 +1,352 @@
+import pandas as pd
+import numpy as np
+import os
+import argparse
+from team_snapshot import SNAPSHOT_FILE, update_team_snapshot
+from player_index import PLAYER_GMSC_FILE, get_player_index, build_name_index, resolve_player_id, save_name_aliases
+
+# ==========================================
+# 設定區
+# ==========================================
+RAW_GAMES_FILE = "nba_game_data_raw_v52_PATCHED.csv"
+OUTPUT_FILE = "FINAL_MASTER_DATASET_v109_FIXED.csv"
+
+# 除錯用中間檔 (只有加上 --debug 才會輸出)
+DEBUG_TEAM_GAMES_FILE = "v200_team_games_debug.csv"
+
+# 進階數據: 單場欄位 -> 標準欄位名稱 (取代 fix_columns.py 的改名)
+ADV_STATS = {
+    'pace': 'Pace',
+    'off_rtg': 'OffRtg',
+    'def_rtg': 'DefRtg',
+    'net_rtg': 'NetRtg',
+    'tov_rate': 'TOV_Rate',
+    'orb_pct': 'ORB_Pct',
+}
+
+# 滾動窗口特徵：統計欄位 -> 窗口 (場數)，全部由同一次前綴和計算
+# 想實驗更多窗口直接加入即可，例如 {'win': [3, 5, 10, 20], 'margin': [3, 5, 10, 20]}
+TEAM_ROLLING_WINDOWS = {'win': [5, 10], 'margin': [5]}
+H2H_ROLLING_WINDOWS = {'win': [5], 'margin': [5]}
+TEAM_ROLLING_PREFIX = {'win': 'Before_Game_Win_Pct', 'margin': 'Before_Game_Avg_Margin'}
+H2H_ROLLING_PREFIX = {'win': 'Before_Game_H2H_Win_Pct', 'margin': 'Before_Game_H2H_Avg_Margin'}
+# 沒有賽前資料時的預設值 (H2H 勝率視為五五波)
+H2H_FILL = {'win': 0.5, 'margin': 0.0}
+
+# 需要保留主客雙方原始值的特徵 (客隊加上 Opp_ 前綴)
+RAW_FEATURE_COLS = [
+    'Before_Game_Win_Pct', 'Before_Home_Win_Pct', 'Before_Away_Win_Pct',
+    'Before_Game_Avg_Margin', 'Before_Game_Streak',
+    'Before_Game_Win_Pct_Last_5', 'Before_Game_Win_Pct_Last_10',
+    'Before_Game_Avg_Margin_Last_5', 'CS_Win_Pct_L5', 'CS_Avg_Margin_L5',
+    'Before_Game_H2H_Win_Pct_L5', 'Before_Game_H2H_Avg_Margin_L5',
+    'Total_Injury_Impact', 'Days_Since_Last_Game', 'Before_Game_Total_Games'
+]
+
+# 需要計算 主隊 - 客隊 差值的特徵
+DIFF_FEATURE_COLS = [
+    'Before_Home_Win_Pct', 'Before_Away_Win_Pct', 'Days_Since_Last_Game',
+    'Before_Game_Streak', 'Before_Game_Win_Pct_Last_5', 'Before_Game_Avg_Margin_Last_5',
+    'Before_Game_Win_Pct_Last_10', 'CS_Win_Pct_L5', 'CS_Avg_Margin_L5',
+    'Before_Game_H2H_Win_Pct_L5', 'Before_Game_H2H_Avg_Margin_L5', 'Total_Injury_Impact'
+]
+
+def get_season_year(dates):
+    """10 月 (含) 以後的比賽算入下一個賽季"""
+    return np.where(dates.dt.month >= 10, dates.dt.year + 1, dates.dt.year)
+
+# ==========================================
+# 1. 讀取與重塑 (Melt 只做一次)
+# ==========================================
+def melt_team_games(df_games):
+    """
+    將「每場對戰」拆成「每隊每場」，同時帶出基礎與進階數據所需的單場欄位
+    """
+    df_games = df_games.copy()
+    df_games['date'] = df_games['date'].astype(str)
+    df_games['game_date'] = pd.to_datetime(df_games['date'], format='%Y%m%d')
+    df_games['Season_Year'] = get_season_year(df_games['game_date'])
+
+    df_games['home_win'] = (df_games['home_pts'] > df_games['away_pts']).astype(int)
+    df_games['home_margin'] = df_games['home_pts'] - df_games['away_pts']
+
+    # 單場進階數據 (Pace, Ratings, 四因子)
+    home_poss = df_games['home_fga'] + 0.44 * df_games['home_fta'] - df_games['home_orb'] + df_games['home_tov']
+    away_poss = df_games['away_fga'] + 0.44 * df_games['away_fta'] - df_games['away_orb'] + df_games['away_tov']
+    pace = (home_poss + away_poss) / 2
+    home_off_rtg = (df_games['home_pts'] / pace) * 100
+    away_off_rtg = (df_games['away_pts'] / pace) * 100
+
+    home = pd.DataFrame({
+        'game_id': df_games['game_id'],
+        'date': df_games['game_date'],
+        'Season_Year': df_games['Season_Year'],
+        'team': df_games['home_team'],
+        'opponent': df_games['away_team'],
+        'pts': df_games['home_pts'],
+        'opp_pts': df_games['away_pts'],
+        'win': df_games['home_win'],
+        'margin': df_games['home_margin'],
+        'dnp': df_games['home_dnp'],
+        'dnp_ids': df_games.get('home_dnp_ids'),
+        'location': 'Home',
+        'pace': pace,
+        'off_rtg': home_off_rtg,
+        'def_rtg': away_off_rtg,
+        'net_rtg': home_off_rtg - away_off_rtg,
+        'tov_rate': (df_games['home_tov'] / pace) * 100,
+        'orb_pct': (df_games['home_orb'] / (df_games['home_orb'] + df_games['away_drb'])).fillna(0),
+    })
+    away = pd.DataFrame({
+        'game_id': df_games['game_id'],
+        'date': df_games['game_date'],
+        'Season_Year': df_games['Season_Year'],
+        'team': df_games['away_team'],
+        'opponent': df_games['home_team'],
+        'pts': df_games['away_pts'],
+        'opp_pts': df_games['home_pts'],
+        'win': 1 - df_games['home_win'],
+        'margin': -df_games['home_margin'],
+        'dnp': df_games['away_dnp'],
+        'dnp_ids': df_games.get('away_dnp_ids'),
+        'location': 'Away',
+        'pace': pace,
+        'off_rtg': away_off_rtg,
+        'def_rtg': home_off_rtg,
+        'net_rtg': away_off_rtg - home_off_rtg,
+        'tov_rate': (df_games['away_tov'] / pace) * 100,
+        'orb_pct': (df_games['away_orb'] / (df_games['away_orb'] + df_games['home_drb'])).fillna(0),
+    })
+
+    df_team_games = pd.concat([home, away], ignore_index=True)
+    return df_team_games.sort_values(by=['team', 'date']).reset_index(drop=True)
+
+# ==========================================
+# 2. 特徵計算 (基礎 / 進階 / 傷病)
+# ==========================================
+def rolling_before_game_means(df, group_cols, stats, windows, season_to_date=False):
+    """
+    以前綴和 (prefix sum) 一次算出所有「賽前」滾動平均
+    df 必須已依 group_cols + 日期排序 (同組資料連續)
+    回傳 {(stat, window): ndarray}，window=None 代表分組至今；沒有賽前資料時為 NaN
+    """
+    keys = df[group_cols].to_numpy()
+    if len(df) > 1 and (keys[1:] != keys[:-1]).any(axis=1).sum() != df.groupby(group_cols).ngroups - 1:
+        raise ValueError(f"資料未依 {group_cols} 排序，無法使用前綴和")
+
+    pos = df.groupby(group_cols, sort=False).cumcount().to_numpy()
+    idx = np.arange(len(df))
+    all_windows = list(windows) + ([None] if season_to_date else [])
+    out = {}
+    for stat in stats:
+        values = df[stat].to_numpy(dtype=float)
+        valid = ~np.isnan(values)
+        sums = np.concatenate([[0.0], np.cumsum(np.where(valid, values, 0.0))])
+        cnts = np.concatenate([[0], np.cumsum(valid)])
+        for window in all_windows:
+            k = pos if window is None else np.minimum(pos, window)
+            total = sums[idx] - sums[idx - k]
+            count = cnts[idx] - cnts[idx - k]
+            out[(stat, window)] = np.where(count > 0, total / np.maximum(count, 1), np.nan)
+    return out
+
+def rolling_feature_columns():
+    """設定檔產生的所有滾動窗口欄位名稱"""
+    cols = [f"{TEAM_ROLLING_PREFIX[stat]}_Last_{n}" for stat, ns in TEAM_ROLLING_WINDOWS.items() for n in ns]
+    cols += [f"{H2H_ROLLING_PREFIX[stat]}_L{n}" for stat, ns in H2H_ROLLING_WINDOWS.items() for n in ns]
+    return cols
+
+def add_base_features(df):
+    """勝率、分差、連勝、休息天數等基礎特徵 (等同 v200data_process9.py)"""
+    g = df.groupby(['Season_Year', 'team'])
+
+    # 賽季至今 + 所有近 N 場窗口 (同一次前綴和)
+    windows = sorted({n for ns in TEAM_ROLLING_WINDOWS.values() for n in ns})
+    rolling = rolling_before_game_means(df, ['Season_Year', 'team'], list(TEAM_ROLLING_PREFIX), windows, season_to_date=True)
+
+    df['win_cumsum'] = g['win'].cumsum()
+    df['games_played'] = g.cumcount() + 1
+    df['Before_Game_Win_Pct'] = np.nan_to_num(rolling[('win', None)], nan=0.0)
+    df['Before_Game_Total_Games'] = g['games_played'].shift(1).fillna(0)
+
+    df['margin_cumsum'] = g['margin'].cumsum()
+    df['Before_Game_Avg_Margin'] = np.nan_to_num(rolling[('margin', None)], nan=0.0)
+
+    df['win_home'] = np.where(df['location'] == 'Home', df['win'], 0)
+    df['games_home'] = np.where(df['location'] == 'Home', 1, 0)
+    df['win_away'] = np.where(df['location'] == 'Away', df['win'], 0)
+    df['games_away'] = np.where(df['location'] == 'Away', 1, 0)
+
+    g = df.groupby(['Season_Year', 'team'])
+    df['Before_Home_Win_Pct'] = (g['win_home'].cumsum().shift(1) / g['games_home'].cumsum().shift(1)).fillna(0.0)
+    df['Before_Away_Win_Pct'] = (g['win_away'].cumsum().shift(1) / g['games_away'].cumsum().shift(1)).fillna(0.0)
+
+    for stat, ns in TEAM_ROLLING_WINDOWS.items():
+        for n in ns:
+            df[f"{TEAM_ROLLING_PREFIX[stat]}_Last_{n}"] = np.nan_to_num(rolling[(stat, n)], nan=0.0)
+
+    def calculate_streak(series):
+        streaks = []
+        current_streak = 0
+        for result in series:
+            streaks.append(current_streak)
+            if result == 1: current_streak = current_streak + 1 if current_streak > 0 else 1
+            else: current_streak = current_streak - 1 if current_streak < 0 else -1
+        return pd.Series(streaks, index=series.index)
+    df['Before_Game_Streak'] = g['win'].apply(calculate_streak).reset_index(level=[0, 1], drop=True)
+
+    df['prev_date'] = g['date'].shift(1)
+    df['Days_Since_Last_Game'] = (df['date'] - df['prev_date']).dt.days.fillna(7)
+
+    df['CS_Win_Pct_L5'] = df['Before_Game_Win_Pct_Last_5']
+    df['CS_Avg_Margin_L5'] = df['Before_Game_Avg_Margin_Last_5']
+    return df
+
+def add_advanced_features(df):
+    """
+    賽前累積進階數據平均 (等同 v1_update_v53.py 的 expanding mean)
+    與基礎特徵共用前綴和產生器 (賽季至今窗口)
+    """
+    rolling = rolling_before_game_means(df, ['Season_Year', 'team'], list(ADV_STATS.keys()), [], season_to_date=True)
+    for col, name in ADV_STATS.items():
+        df[f'Before_Game_Avg_{name}'] = np.nan_to_num(rolling[(col, None)], nan=0.0)
+    return df
+
+def add_h2h_features(df):
+    """對戰組合 (H2H) 近 N 場勝率與分差，會將資料改為依 team/opponent/date 排序"""
+    df = df.sort_values(by=['team', 'opponent', 'date'])
+    stats = list(H2H_ROLLING_WINDOWS.keys())
+    windows = sorted({n for ns in H2H_ROLLING_WINDOWS.values() for n in ns})
+    rolling = rolling_before_game_means(df, ['team', 'opponent'], stats, windows)
+    for stat, ns in H2H_ROLLING_WINDOWS.items():
+        for n in ns:
+            df[f"{H2H_ROLLING_PREFIX[stat]}_L{n}"] = np.nan_to_num(rolling[(stat, n)], nan=H2H_FILL[stat])
+    return df
+
+def _explode_names(series):
+    """'A, B' -> 每列一名 (保留原列索引與名單內順序)"""
+    valid = series.where(series.notna() & (series != ""))
+    long = valid.str.split(',').explode().dropna().str.strip().to_frame('value')
+    long['pos'] = long.groupby(level=0).cumcount()
+    return long
+
+def add_injury_features(df, player_index):
+    """
+    傷病指標：DNP 球員的賽季平均 GmSc 總和 / 80
+    以 (Season_Year, Player_ID) 查球員評分索引；舊資料沒有 dnp_ids 時才用名字解析
+    """
+    dnp_long = _explode_names(df['dnp']).rename(columns={'value': 'Player_Name'})
+    if df['dnp_ids'].notna().any():
+        ids = _explode_names(df['dnp_ids']).rename(columns={'value': 'Player_ID'})
+        dnp_long = dnp_long.reset_index().merge(ids.reset_index(), on=['index', 'pos'], how='left').set_index('index')
+    else:
+        dnp_long['Player_ID'] = None
+    dnp_long['Season_Year'] = df.loc[dnp_long.index, 'Season_Year'].values
+    dnp_long['team'] = df.loc[dnp_long.index, 'team'].values
+
+    # 名字解析只對不重複的 (隊, 季, 名字) 做一次
+    dnp_long['Player_ID'] = dnp_long['Player_ID'].astype(object)
+    missing = dnp_long['Player_ID'].isna() | (dnp_long['Player_ID'] == "")
+    if missing.any() and not player_index.empty:
+        name_index = build_name_index(player_index)
+        triples = dnp_long.loc[missing, ['team', 'Season_Year', 'Player_Name']].drop_duplicates()
+        resolved = {
+            (t, season, name): resolve_player_id(name_index, name, t, season)
+            for t, season, name in triples.itertuples(index=False)
+        }
+        save_name_aliases(name_index)
+        keys = list(zip(dnp_long.loc[missing, 'team'], dnp_long.loc[missing, 'Season_Year'], dnp_long.loc[missing, 'Player_Name']))
+        dnp_long.loc[missing, 'Player_ID'] = [resolved[k] for k in keys]
+        print(f"DNP 名字解析: {len(triples)} 組名字, 未解析 {sum(v is None for v in resolved.values())} 組")
+
+    ratings = player_index.set_index(['Season_Year', 'Player_ID'])['Season_Avg_GmSc']
+    lookup = pd.MultiIndex.from_arrays([dnp_long['Season_Year'], dnp_long['Player_ID']])
+    dnp_long['gmsc'] = ratings.reindex(lookup).fillna(0.0).values
+
+    missing_gmsc = dnp_long.groupby(level=0)['gmsc'].sum()
+    df['Total_Injury_Impact'] = missing_gmsc.reindex(df.index).fillna(0.0) / 80.0
+    return df.drop(columns=['dnp_ids'])
+
+# ==========================================
+# 3. 主客合併 (只做一次)
+# ==========================================
+def merge_home_away(df_team_games):
+    adv_cols = [f'Before_Game_Avg_{name}' for name in ADV_STATS.values()]
+    per_game_adv = list(ADV_STATS.keys())
+
+    df_home = df_team_games[df_team_games['location'] == 'Home'].drop(columns=per_game_adv + adv_cols)
+    df_home_adv = df_team_games.loc[df_team_games['location'] == 'Home', ['game_id'] + adv_cols]
+    df_away = df_team_games[df_team_games['location'] == 'Away']
+
+    extra_cols = [c for c in rolling_feature_columns() if c not in RAW_FEATURE_COLS]
+    raw_cols = RAW_FEATURE_COLS + extra_cols
+    diff_cols = DIFF_FEATURE_COLS + extra_cols
+
+    opp_cols = {col: f"Opp_{col}" for col in raw_cols + adv_cols}
+    df_away = df_away[['game_id'] + list(opp_cols.keys())].rename(columns=opp_cols)
+
+    df_final = pd.merge(df_home, df_away.drop(columns=[f"Opp_{c}" for c in adv_cols]), on='game_id', how='inner')
+    df_final.rename(columns={'team': 'Team_Abbr', 'opponent': 'Opp_Abbr', 'win': 'Win'}, inplace=True)
+
+    for col in diff_cols:
+        df_final[f'Diff_{col}'] = df_final[col] - df_final[f'Opp_{col}']
+
+    # 進階數據 (主隊 / 客隊 / 差值)
+    df_final = pd.merge(df_final, df_home_adv, on='game_id', how='inner')
+    df_final = pd.merge(df_final, df_away[['game_id'] + [f"Opp_{c}" for c in adv_cols]], on='game_id', how='inner')
+    for col in adv_cols:
+        df_final[f'Diff_{col}'] = df_final[col] - df_final[f'Opp_{col}']
+
+    df_final['date'] = df_final['date'].dt.strftime('%Y-%m-%d')
+    return df_final
+
+# ==========================================
+# 主程式
+# ==========================================
+def build_master_dataset_v109(debug=False):
+    """
+    【v200 Fused - 單次特徵建構】
+    取代 v200_gmsc_cumulative -> v1_update_v53 -> v200data_process9 -> v200_merge_final -> fix_columns
+    輸入: nba_game_data_raw_v52_PATCHED.csv, player_rating_index.csv (由 nba_player_single_game_gmsc_v52.csv 維護)
+    輸出: FINAL_MASTER_DATASET_v109_FIXED.csv (標準欄位名稱)
+    """
+    print("--- 開始執行 v200 Fused：單次建構訓練特徵 (v109) ---")
+
+    if not os.path.exists(RAW_GAMES_FILE):
+        print("錯誤: 找不到輸入檔案。")
+        return None
+
+    df_games = pd.read_csv(RAW_GAMES_FILE)
+    player_index = get_player_index(PLAYER_GMSC_FILE)
+    if player_index.empty:
+        print(f"警告: 找不到球員評分索引或 '{PLAYER_GMSC_FILE}'，傷病指標將為 0。")
+
+    print("正在重塑數據 (主客拆分)...")
+    df_team_games = melt_team_games(df_games)
+
+    print("正在計算基礎、進階與傷病特徵...")
+    df_team_games = add_base_features(df_team_games)
+    df_team_games = add_advanced_features(df_team_games)
+    df_team_games = add_h2h_features(df_team_games)
+    df_team_games = add_injury_features(df_team_games, player_index)
+
+    if debug:
+        df_team_games.to_csv(DEBUG_TEAM_GAMES_FILE, index=False)
+        print(f"[除錯] 已輸出每隊每場中間檔: {DEBUG_TEAM_GAMES_FILE}")
+
+    print("正在合併主客隊數據...")
+    df_final = merge_home_away(df_team_games)
+
+    df_final.to_csv(OUTPUT_FILE, index=False)
+    print(f"成功產生: {OUTPUT_FILE} (共 {len(df_final)} 筆, {len(df_final.columns)} 欄)")
+
+    # 推論用：每隊一列的最新狀態快照 (完整重建，過去比賽的修正也會反映)
+    snapshot = update_team_snapshot(df_final, SNAPSHOT_FILE, rebuild=True)
+    print(f"已更新球隊狀態快照: {SNAPSHOT_FILE} ({len(snapshot)} 隊)")
+    return df_final
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="v200 Fused：單次建構訓練特徵 (FINAL_MASTER_DATASET_v109_FIXED.csv)")
+    parser.add_argument('--debug', action='store_true', help=f"另外輸出每隊每場中間檔 ({DEBUG_TEAM_GAMES_FILE})")
+    args = parser.parse_args()
+    build_master_dataset_v109(debug=args.debug)
@@ -8,6 +8,7 @@ import numpy as np
 import traceback
 import re
 import os
+from player_index import PLAYER_INDEX_FILE, update_player_index
 
 # 禁用不安全請求的警告 (因為我們會使用 verify=False)
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
@@ -87,6 +88,12 @@ def parse_box_score_ultimate(url, session, retries=3, delay=15):
         # 1. 抓取 DNP
         home_dnp_names = []
         away_dnp_names = []
+        home_dnp_ids = []
+        away_dnp_ids = []
+
+        def player_id_from_href(link):
+            m = re.search(r'/players/\w/(\w+)\.html', link.get('href', ''))
+            return m.group(1) if m else ''
         
         # (A) 2025 新邏輯 (公開 HTML)
         inactive_div = soup.find('div', string=re.compile(r'Inactive:'))
@@ -95,12 +102,16 @@ def parse_box_score_ultimate(url, session, retries=3, delay=15):
             if home_span:
                 for sibling in home_span.find_next_siblings():
                     if sibling.name == 'span': break
-                    if sibling.name == 'a': home_dnp_names.append(sibling.text.strip())
+                    if sibling.name == 'a':
+                        home_dnp_names.append(sibling.text.strip())
+                        home_dnp_ids.append(player_id_from_href(sibling))
             away_span = inactive_div.find('span', string=re.compile(away_team_abbr))
             if away_span:
                 for sibling in away_span.find_next_siblings():
                     if sibling.name == 'span': break
-                    if sibling.name == 'a': away_dnp_names.append(sibling.text.strip())
+                    if sibling.name == 'a':
+                        away_dnp_names.append(sibling.text.strip())
+                        away_dnp_ids.append(player_id_from_href(sibling))
         
         # (B) 2024 舊邏輯 (註解) - 如果沒找到
         if not home_dnp_names and not away_dnp_names:
@@ -111,15 +122,22 @@ def parse_box_score_ultimate(url, session, retries=3, delay=15):
                 if home_dnp_table:
                     dnp_rows = home_dnp_table.find('tfoot').find_all('th', {'data-stat': 'player'})
                     for row in dnp_rows:
-                        if "Did Not Play" in row.get('csk', ''): home_dnp_names.append(row.text.strip())
+                        if "Did Not Play" in row.get('csk', ''):
+                            home_dnp_names.append(row.text.strip())
+                            home_dnp_ids.append(row.get('data-append-csv', ''))
                 away_dnp_table = comment_soup.find('table', {'id': f'box-{away_team_abbr}-game-basic'})
                 if away_dnp_table:
                     dnp_rows = away_dnp_table.find('tfoot').find_all('th', {'data-stat': 'player'})
                     for row in dnp_rows:
-                        if "Did Not Play" in row.get('csk', ''): away_dnp_names.append(row.text.strip())
+                        if "Did Not Play" in row.get('csk', ''):
+                            away_dnp_names.append(row.text.strip())
+                            away_dnp_ids.append(row.get('data-append-csv', ''))
 
         game_data['home_dnp'] = ', '.join(home_dnp_names)
         game_data['away_dnp'] = ', '.join(away_dnp_names)
+        # 入庫時就存 Player_ID (與名字同順序)，後續合併不必再比對名字
+        game_data['home_dnp_ids'] = ', '.join(home_dnp_ids)
+        game_data['away_dnp_ids'] = ', '.join(away_dnp_ids)
 
         # 2. 抓取球隊統計 (Tfoot)
         home_table = soup.find('table', {'id': f'box-{home_team_abbr}-game-basic'})
@@ -271,20 +289,21 @@ def run_v300_data_update():
             'home_pts', 'home_fg', 'home_fga', 'home_fg3', 'home_fg3a', 'home_ft', 'home_fta',
             'home_orb', 'home_drb', 'home_trb', 'home_ast', 'home_stl', 'home_blk', 'home_tov', 'home_pf',
             'away_pts', 'away_fg', 'away_fga', 'away_fg3', 'away_fg3a', 'away_ft', 'away_fta',
-            'away_orb', 'away_drb', 'away_trb', 'away_ast', 'away_stl', 'away_blk', 'away_tov', 'away_pf'
+            'away_orb', 'away_drb', 'away_trb', 'away_ast', 'away_stl', 'away_blk', 'away_tov', 'away_pf',
+            'home_dnp_ids', 'away_dnp_ids'
         ]
         # 只保留存在的欄位 (避免報錯)
         existing_cols = [c for c in cols if c in new_game_df.columns]
         new_game_df = new_game_df[existing_cols]
         
+        # 舊檔可能沒有 *_dnp_ids 欄位，因此以欄位名稱合併而非直接追加
         if os.path.exists(team_target_file):
             print(f"正在追加球隊數據到 '{team_target_file}'...")
-            new_game_df.to_csv(team_target_file, mode='a', header=False, index=False)
+            final_game_df = pd.concat([pd.read_csv(team_target_file), new_game_df], ignore_index=True)
         else:
-            new_game_df.to_csv(team_target_file, index=False)
+            final_game_df = new_game_df
             
         # 去重
-        final_game_df = pd.read_csv(team_target_file)
         final_game_df.drop_duplicates(subset=['game_id'], keep='last', inplace=True)
         final_game_df.to_csv(team_target_file, index=False)
         print(f"球隊數據更新完畢 (總計: {len(final_game_df)} 場)")
@@ -304,6 +323,10 @@ def run_v300_data_update():
         final_player_df.drop_duplicates(subset=['Player_ID', 'Date'], keep='last', inplace=True)
         final_player_df.to_csv(player_target_file, index=False)
         print(f"球員數據更新完畢 (總計: {len(final_player_df)} 筆)")
+
+        # 同步更新球員評分索引 (只併入新比賽)
+        update_player_index(new_player_df, PLAYER_INDEX_FILE, player_target_file)
+        print(f"球員評分索引更新完畢: {PLAYER_INDEX_FILE}")
         
     print("\n--- v300 Ultimate 完畢 ---")
 
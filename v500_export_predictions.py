@@ -5,104 +5,180 @@ import os
 import requests
 from bs4 import BeautifulSoup
 from datetime import datetime, timedelta
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.preprocessing import StandardScaler
 import re
 import warnings
 import time
+import argparse
+from team_snapshot import SNAPSHOT_FILE, get_team_state, build_matchup_features
+from player_index import (get_player_index, latest_season_ratings, build_name_index,
+                          resolve_player_id, save_name_aliases)
+from model_registry import FEATURE_COLUMNS, get_or_train
+from prediction_cache import model_version, cached_predict
 
 # 忽略警告
 warnings.filterwarnings("ignore")
 
+PREDICTION_STORE_DIR = "predictions_store"
+
 # --- 1. 賽程抓取模組 ---
-def get_schedule_for_date(target_date):
-    """從 BBR 抓取指定日期的賽程"""
-    year = target_date.year
-    month_name = target_date.strftime("%B").lower()
-    season = year + 1 if target_date.month >= 10 else year
-    
+# 同一次執行中每個月份頁面只抓一次 (season, month) -> [(date, home, away)]
+_MONTH_SCHEDULE_CACHE = {}
+
+def _team_abbr(cell):
+    if cell and cell.find('a'):
+        m = re.search(r'/teams/(\w{3})/', cell.find('a')['href'])
+        if m: return m.group(1)
+    return None
+
+def get_month_schedule(season, month_name):
+    """從 BBR 抓取整個月份的賽程 (快取)，回傳 [(date, home, away)]"""
+    key = (season, month_name)
+    if key in _MONTH_SCHEDULE_CACHE: return _MONTH_SCHEDULE_CACHE[key]
+
     url = f"https://www.basketball-reference.com/leagues/NBA_{season}_games-{month_name}.html"
-    # print(f"正在抓取 {target_date.strftime('%Y-%m-%d')} 的賽程...")
-    
     headers = { 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36' }
     
+    games = []
     try:
         response = requests.get(url, headers=headers, timeout=15)
         if response.status_code != 200: return []
         soup = BeautifulSoup(response.content, 'lxml')
         table = soup.find('table', {'id': 'schedule'})
         if not table: return []
-        games = []
-        
-        # Windows 相容日期格式
-        target_str_padded = target_date.strftime("%a, %b %d, %Y")
-        day = target_date.day
-        target_str_no_pad = target_date.strftime("%a, %b ") + str(day) + target_date.strftime(", %Y")
         
         for row in table.find('tbody').find_all('tr'):
             date_th = row.find('th', {'data-stat': 'date_game'})
             if not date_th: continue
-            game_date_str = date_th.text.strip()
+            try:
+                # 例: "Wed, Dec 17, 2025" (日期不補零也能解析)
+                game_date = datetime.strptime(date_th.text.strip(), "%a, %b %d, %Y")
+            except ValueError: continue
             
-            if game_date_str == target_str_padded or game_date_str == target_str_no_pad:
-                v_cell = row.find('td', {'data-stat': 'visitor_team_name'})
-                h_cell = row.find('td', {'data-stat': 'home_team_name'})
-                
-                if v_cell and h_cell:
-                    v_abbr = None; h_abbr = None
-                    if v_cell.find('a'):
-                        m = re.search(r'/teams/(\w{3})/', v_cell.find('a')['href'])
-                        if m: v_abbr = m.group(1)
-                    if h_cell.find('a'):
-                        m = re.search(r'/teams/(\w{3})/', h_cell.find('a')['href'])
-                        if m: h_abbr = m.group(1)
-                    if v_abbr and h_abbr:
-                        games.append((h_abbr, v_abbr))
-        return games
+            h_abbr = _team_abbr(row.find('td', {'data-stat': 'home_team_name'}))
+            v_abbr = _team_abbr(row.find('td', {'data-stat': 'visitor_team_name'}))
+            if v_abbr and h_abbr:
+                games.append((game_date, h_abbr, v_abbr))
     except: return []
+    
+    _MONTH_SCHEDULE_CACHE[key] = games
+    time.sleep(1)
+    return games
+
+def get_schedule_for_date(target_date):
+    """從 BBR 抓取指定日期的賽程"""
+    season = target_date.year + 1 if target_date.month >= 10 else target_date.year
+    month_name = target_date.strftime("%B").lower()
+    day = pd.Timestamp(target_date).normalize()
+    return [(h, v) for d, h, v in get_month_schedule(season, month_name) if pd.Timestamp(d) == day]
+
+def get_schedule_range(start_date, days):
+    """未來 N 天的完整賽程 (每個月份頁面只抓一次)，回傳 {date: [(home, away)]}"""
+    schedule = {}
+    for i in range(days):
+        day = pd.Timestamp(start_date).normalize() + timedelta(days=i)
+        games = get_schedule_for_date(day)
+        if games: schedule[day] = games
+    return schedule
+
+def project_team_state(team_state, schedule):
+    """
+    依已知賽程推估每個比賽日各隊的「上一場日期」 (休息天數用)
+    賽果未知，其餘特徵維持最新快照；回傳 {date: team_state}
+    """
+    last_played = {team: stats['Last_Date'] for team, stats in team_state.items()}
+    projected = {}
+    for day in sorted(schedule):
+        projected[day] = {team: dict(stats, Last_Date=last_played[team]) for team, stats in team_state.items()}
+        for home, away in schedule[day]:
+            for team in (home, away):
+                if team in last_played: last_played[team] = day
+    return projected
 
 # --- 2. 傷病計算模組 ---
-def get_player_gmsc_dict(gmsc_file):
-    if not os.path.exists(gmsc_file): return {}
+def get_player_gmsc_dict(player_index):
+    """Player_ID -> 最新賽季平均 GmSc (查球員評分索引，不再重讀單場檔)"""
     try:
-        df = pd.read_csv(gmsc_file)
-        # 嘗試讀取單場數據來計算更準確的平均值
-        if os.path.exists("nba_player_single_game_gmsc_v52.csv"):
-            df_raw = pd.read_csv("nba_player_single_game_gmsc_v52.csv")
-            df_2026 = df_raw[df_raw['Season_Year'] == 2026]
-            if df_2026.empty: df_2026 = df_raw[df_raw['Season_Year'] == 2025]
-            avg_map = df_2026.groupby('Player_ID')['Single_Game_GmSc'].mean().to_dict()
-            return avg_map
-        return {}
+        return latest_season_ratings(player_index)
     except: return {}
 
+def fill_missing_player_ids(injuries_df, player_index):
+    """傷病名單缺 Player_ID (沒有球員連結) 時，以名字解析補上"""
+    missing = injuries_df['Player_ID'].isna()
+    if not missing.any() or player_index.empty: return injuries_df
+    name_index = build_name_index(player_index)
+    season = player_index['Season_Year'].max()
+    injuries_df['Player_ID'] = injuries_df['Player_ID'].astype(object)
+    injuries_df.loc[missing, 'Player_ID'] = [
+        resolve_player_id(name_index, name, team, season)
+        for name, team in zip(injuries_df.loc[missing, 'Player_Name'], injuries_df.loc[missing, 'Team_Abbr'])
+    ]
+    save_name_aliases(name_index)
+    return injuries_df
+
+def player_gmsc_values(injuries_df, player_gmsc_map):
+    """每位傷兵的 GmSc (查不到或為 0 時用預設值 5.0)，向量化查表"""
+    gmsc = injuries_df['Player_ID'].map(player_gmsc_map).astype(float).fillna(0.0)
+    return gmsc.mask(gmsc == 0.0, 5.0) # 預設值
+
 def calculate_team_injury_impact(team_abbr, injuries_df, player_gmsc_map):
     if injuries_df is None or injuries_df.empty: return 0.0, []
     team_injuries = injuries_df[injuries_df['Team_Abbr'] == team_abbr]
     if team_injuries.empty: return 0.0, []
     
-    missing_gmsc_sum = 0.0
-    injured_names = []
-    
-    for _, row in team_injuries.iterrows():
-        p_id = row['Player_ID']
-        p_name = row['Player_Name']
-        
-        gmsc = 0.0
-        if pd.notna(p_id) and p_id in player_gmsc_map:
-            gmsc = player_gmsc_map[p_id]
-        
-        if gmsc == 0.0: gmsc = 5.0 # 預設值
-            
-        if gmsc > 0:
-            missing_gmsc_sum += gmsc
-            injured_names.append(f"{p_name}({gmsc:.1f})")
+    gmsc = player_gmsc_values(team_injuries, player_gmsc_map)
+    counted = gmsc > 0
+    values = gmsc[counted].tolist()
+    injured_names = [f"{name}({g:.1f})" for name, g in zip(team_injuries.loc[counted, 'Player_Name'], values)]
              
-    total_impact = missing_gmsc_sum / 80.0
+    total_impact = sum(values) / 80.0
     return total_impact, injured_names
 
-# --- 3. 主程式 ---
-def main():
+# --- 3. 批量預測模組 ---
+def build_slate(games, team_state, injuries_df, player_gmsc_map, target_date):
+    """
+    組出整個賽程的特徵矩陣
+    回傳 (slate, features)：slate 為每場的輸出資訊，features 為對應的特徵列
+    """
+    slate, features = [], []
+    for home, away in games:
+        # 獲取數據 (每隊最新狀態快照，O(1) 查表)
+        h_stats = team_state.get(home)
+        a_stats = team_state.get(away)
+        
+        if not h_stats or not a_stats:
+            print(f"跳過 {home} vs {away} (數據不足)")
+            continue
+
+        h_impact, h_inj_names = calculate_team_injury_impact(home, injuries_df, player_gmsc_map)
+        a_impact, a_inj_names = calculate_team_injury_impact(away, injuries_df, player_gmsc_map)
+        diff_inj = h_impact - a_impact
+
+        features.append(build_matchup_features(h_stats, a_stats, target_date, diff_inj))
+        slate.append({
+            'Home': home,
+            'Away': away,
+            'Diff_NetRtg': round(h_stats['NetRtg'] - a_stats['NetRtg'], 2),
+            'Diff_Injury': round(diff_inj, 2),
+            'Diff_Streak': h_stats['Streak'] - a_stats['Streak'],
+            'Home_Injuries': "; ".join(h_inj_names),
+            'Away_Injuries': "; ".join(a_inj_names)
+        })
+    return slate, features
+
+def predict_slate(scaler, model, features, feature_columns):
+    """整個賽程一次 transform + predict_proba，回傳主隊勝率陣列"""
+    if not features: return np.array([])
+    X_new = scaler.transform(pd.DataFrame(features, columns=feature_columns))
+    return model.predict_proba(X_new)[:, 1]
+
+# --- 4. 主程式 ---
+def confidence_label(prob):
+    """信心等級 (v500 匯出與 v520 服務共用)"""
+    if prob >= 0.65: return "🟢 High (Home)"
+    if prob <= 0.35: return "🔴 High (Away)"
+    return "Toss-up"
+
+def main(horizon=None):
     print("\n" + "="*60)
     print(" 🏀 NBA 每日賽事預測匯出工具 (v500 - 修正版)")
     print("="*60)
@@ -110,177 +186,124 @@ def main():
     # 1. 檔案路徑
     data_file = "FINAL_MASTER_DATASET_v109_FIXED.csv"
     injury_file = "current_injuries.csv"
-    gmsc_file = "nba_player_cumulative_gmsc_v108.csv"
 
     if not os.path.exists(data_file):
         print(f"錯誤: 找不到 '{data_file}'")
         return
 
-    # 2. 訓練模型
-    print("正在訓練模型 (v114)...")
+    # 2. 載入模型 (訓練資料沒變時直接讀取已存模型)
+    print("正在準備模型 (v114)...")
     df = pd.read_csv(data_file)
     df['date_dt'] = pd.to_datetime(df['date'])
     
-    feature_columns = [
-        'Diff_Days_Since_Last_Game', 'Diff_Before_Game_Streak',
-        'Diff_Before_Game_Win_Pct_Last_5', 'Diff_Before_Game_Avg_Margin_Last_5',
-        'Diff_Before_Game_Win_Pct_Last_10', 'Diff_CS_Win_Pct_L5', 'Diff_CS_Avg_Margin_L5',
-        'Diff_Before_Game_H2H_Win_Pct_L5', 'Diff_Before_Game_H2H_Avg_Margin_L5',
-        'Diff_Total_Injury_Impact', 'Diff_Before_Game_Avg_NetRtg',
-        'Diff_Before_Game_Avg_TOV_Rate', 'Diff_Before_Game_Avg_ORB_Pct'
-    ]
-    
-    df_train = df.fillna(0)
-    X = df_train[feature_columns]
-    y = df_train['Win']
-    
-    scaler = StandardScaler()
-    X_scaled = scaler.fit_transform(X)
-    
-    model = RandomForestClassifier(n_estimators=100, random_state=42)
-    model.fit(X_scaled, y)
+    feature_columns = FEATURE_COLUMNS
+    # 每日新增少量比賽時以 warm_start 增量加樹，每週完整重訓一次
+    scaler, model, model_meta = get_or_train(df.fillna(0), "v500_full", incremental=True)
+
+    # 各隊最新狀態快照 (由特徵建構產生，過期時增量更新)
+    team_state = get_team_state(df, SNAPSHOT_FILE)
 
     # 3. 準備傷病數據
-    player_gmsc_map = get_player_gmsc_dict(gmsc_file)
+    player_index = get_player_index()
+    player_gmsc_map = get_player_gmsc_dict(player_index)
     df_injuries = pd.DataFrame()
     if os.path.exists(injury_file):
-        df_injuries = pd.read_csv(injury_file)
+        df_injuries = fill_missing_player_ids(pd.read_csv(injury_file), player_index)
         print(f"已載入傷病名單 ({len(df_injuries)} 人)。")
 
-    # 4. 智慧搜尋下一個比賽日
+    # 4. 智慧搜尋下一個比賽日 (horizon 模式：未來 N 天全部賽程)
     last_data_date = df['date_dt'].max()
     start_search_date = last_data_date + timedelta(days=1)
     
     print(f"\n數據庫最後日期: {last_data_date.strftime('%Y-%m-%d')}")
-    print("正在搜尋最近的比賽日 (最多往後 7 天)...")
-    
-    target_date = None
-    todays_games = []
-    
-    for i in range(7):
-        check_date = start_search_date + timedelta(days=i)
-        check_date_str = check_date.strftime('%Y-%m-%d')
-        
-        print(f"  檢查 {check_date_str} ...", end=" ", flush=True)
-        games = get_schedule_for_date(check_date)
-        
-        if games:
-            print(f"✅ 發現 {len(games)} 場比賽！")
-            target_date = check_date
-            todays_games = games
-            break
-        else:
-            print("❌ 無比賽")
-            time.sleep(1)
-
-    if not target_date:
-        print("\n[警告] 未來 7 天內找不到任何比賽。")
+    schedule = {}
+    if horizon:
+        print(f"正在讀取未來 {horizon} 天賽程...")
+        schedule = get_schedule_range(start_search_date, horizon)
+        for day, games in schedule.items():
+            print(f"  {day.strftime('%Y-%m-%d')}: {len(games)} 場")
+    else:
+        print("正在搜尋最近的比賽日 (最多往後 7 天)...")
+        for i in range(7):
+            check_date = start_search_date + timedelta(days=i)
+            check_date_str = check_date.strftime('%Y-%m-%d')
+            
+            print(f"  檢查 {check_date_str} ...", end=" ", flush=True)
+            games = get_schedule_for_date(check_date)
+            
+            if games:
+                print(f"✅ 發現 {len(games)} 場比賽！")
+                schedule[pd.Timestamp(check_date).normalize()] = games
+                break
+            else:
+                print("❌ 無比賽")
+
+    if not schedule:
+        print(f"\n[警告] 未來 {horizon or 7} 天內找不到任何比賽。")
         return
 
+    target_date = min(schedule)
     target_date_str = target_date.strftime('%Y-%m-%d')
-    print(f"\n鎖定預測日期: {target_date_str}")
+    print(f"\n鎖定預測日期: {target_date_str}" + (f" ~ {max(schedule).strftime('%Y-%m-%d')}" if len(schedule) > 1 else ""))
     print("-" * 55)
 
-    # 5. 批量預測與儲存
-    export_data = []
+    # 5. 批量預測與儲存 (先組出所有比賽日的特徵矩陣，一次 transform + predict_proba)
+    # 休息天數依賽程推估：之後比賽日的「上一場」為 horizon 內該隊前一場比賽
+    projected_state = project_team_state(team_state, schedule)
+    slate, slate_features = [], []
+    for day in sorted(schedule):
+        day_slate, day_features = build_slate(schedule[day], projected_state[day], df_injuries, player_gmsc_map, day)
+        slate += [dict(game, Date=day.strftime('%Y-%m-%d')) for game in day_slate]
+        slate_features += day_features
+    # 同一天重跑時，輸入沒變的比賽直接用快取機率，只重算有變動的場次
+    probs = cached_predict(
+        [(game['Date'], game['Home'], game['Away']) for game in slate], slate_features,
+        model_version(model_meta), lambda features: predict_slate(scaler, model, features, feature_columns)
+    )
     
-    print(f"{'主隊':<5} vs {'客隊':<5} | {'主勝率':<8} | {'信心等級'}")
+    export_data = []
+    print(f"{'日期':<10} | {'主隊':<5} vs {'客隊':<5} | {'主勝率':<8} | {'信心等級'}")
     print("-" * 55)
 
-    for home, away in todays_games:
-        # 獲取數據
-        def get_stats(team_abbr):
-            team_games = df[((df['Team_Abbr'] == team_abbr) | (df['Opp_Abbr'] == team_abbr)) & 
-                            (df['date_dt'] < target_date)].sort_values('date_dt')
-            if team_games.empty: return None
-            last_game = team_games.iloc[-1]
-            
-            stats = {}
-            prefix = "Before_Game_" if last_game['Team_Abbr'] == team_abbr else "Opp_Before_Game_"
-            
-            stats['Win_Pct_Last_5'] = last_game.get(f'{prefix}Win_Pct_Last_5', 0)
-            stats['Win_Pct_Last_10'] = last_game.get(f'{prefix}Win_Pct_Last_10', 0)
-            # 【修正】統一使用 Margin_L5
-            stats['Margin_L5'] = last_game.get(f'{prefix}Avg_Margin_Last_5', 0)
-            stats['Streak'] = last_game.get(f'{prefix}Streak', 0)
-            
-            if prefix == "Before_Game_":
-                stats['CS_Win_L5'] = last_game.get('CS_Win_Pct_L5', 0)
-                stats['CS_Margin_L5'] = last_game.get('CS_Avg_Margin_L5', 0)
-            else:
-                stats['CS_Win_L5'] = last_game.get('Opp_CS_Win_Pct_L5', 0)
-                stats['CS_Margin_L5'] = last_game.get('Opp_CS_Avg_Margin_L5', 0)
-            
-            stats['H2H_Win'] = last_game.get(f'{prefix}H2H_Win_Pct_L5', 0.5)
-            stats['H2H_Margin'] = last_game.get(f'{prefix}H2H_Avg_Margin_L5', 0)
-            stats['NetRtg'] = last_game.get(f'{prefix}Avg_NetRtg', 0)
-            stats['TOV'] = last_game.get(f'{prefix}Avg_TOV_Rate', 0)
-            stats['ORB'] = last_game.get(f'{prefix}Avg_ORB_Pct', 0)
-            
-            is_win = (last_game['Win'] == 1) if prefix == "Before_Game_" else (last_game['Win'] == 0)
-            if is_win: stats['Streak'] = stats['Streak'] + 1 if stats['Streak'] > 0 else 1
-            else: stats['Streak'] = stats['Streak'] - 1 if stats['Streak'] < 0 else -1
-            
-            stats['Last_Date'] = last_game['date_dt']
-            return stats
-
-        h_stats = get_stats(home)
-        a_stats = get_stats(away)
-        
-        if not h_stats or not a_stats:
-            print(f"跳過 {home} vs {away} (數據不足)")
-            continue
-
-        diff_rest = (target_date - h_stats['Last_Date']).days - (target_date - a_stats['Last_Date']).days
+    for game, prob in zip(slate, probs):
+        home, away = game['Home'], game['Away']
         
-        h_impact, h_inj_names = calculate_team_injury_impact(home, df_injuries, player_gmsc_map)
-        a_impact, a_inj_names = calculate_team_injury_impact(away, df_injuries, player_gmsc_map)
-        diff_inj = h_impact - a_impact
-        
-        features = [
-            diff_rest,
-            h_stats['Streak'] - a_stats['Streak'],
-            h_stats['Win_Pct_Last_5'] - a_stats['Win_Pct_Last_5'],
-            # 【使用修正後的 Margin_L5】
-            h_stats['Margin_L5'] - a_stats['Margin_L5'],
-            h_stats['Win_Pct_Last_10'] - a_stats['Win_Pct_Last_10'],
-            h_stats['CS_Win_L5'] - a_stats['CS_Win_L5'],
-            h_stats['CS_Margin_L5'] - a_stats['CS_Margin_L5'],
-            h_stats['H2H_Win'] - a_stats['H2H_Win'],
-            h_stats['H2H_Margin'] - a_stats['H2H_Margin'],
-            diff_inj,
-            h_stats['NetRtg'] - a_stats['NetRtg'],
-            h_stats['TOV'] - a_stats['TOV'],
-            h_stats['ORB'] - a_stats['ORB']
-        ]
-        
-        X_new = scaler.transform(pd.DataFrame([features], columns=feature_columns))
-        prob = model.predict_proba(X_new)[0][1]
-        
-        confidence = "⚪"
-        if prob >= 0.65: confidence = "🟢 High (Home)"
-        elif prob <= 0.35: confidence = "🔴 High (Away)"
-        else: confidence = "Toss-up"
+        confidence = confidence_label(prob)
 
         export_data.append({
-            'Date': target_date_str,
+            'Date': game['Date'],
             'Home': home,
             'Away': away,
             'Home_Win_Prob': round(prob, 3),
             'Confidence': confidence,
-            'Diff_NetRtg': round(h_stats['NetRtg'] - a_stats['NetRtg'], 2),
-            'Diff_Injury': round(diff_inj, 2),
-            'Diff_Streak': h_stats['Streak'] - a_stats['Streak'],
-            'Home_Injuries': "; ".join(h_inj_names),
-            'Away_Injuries': "; ".join(a_inj_names)
+            'Diff_NetRtg': game['Diff_NetRtg'],
+            'Diff_Injury': game['Diff_Injury'],
+            'Diff_Streak': game['Diff_Streak'],
+            'Home_Injuries': game['Home_Injuries'],
+            'Away_Injuries': game['Away_Injuries']
         })
         
-        print(f"{home:<5} vs {away:<5} | {prob:.1%}    | {confidence}")
+        print(f"{game['Date']:<10} | {home:<5} vs {away:<5} | {prob:.1%}    | {confidence}")
 
     if export_data:
+        df_export = pd.DataFrame(export_data)
+        # 第一個比賽日照舊寫入 predictions/ (v501 / v900 等下游使用)
         output_csv = f"predictions/predictions_{target_date_str}.csv"
-        pd.DataFrame(export_data).to_csv(output_csv, index=False, encoding='utf-8-sig')
+        df_export[df_export['Date'] == target_date_str].to_csv(output_csv, index=False, encoding='utf-8-sig')
         print(f"\n成功匯出預測結果至: {output_csv}")
+        if horizon:
+            write_prediction_store(df_export)
+
+def write_prediction_store(df_export, store_dir=PREDICTION_STORE_DIR):
+    """依日期分區寫入 predictions_store/date=YYYY-MM-DD/predictions.csv (同日期重跑會覆寫)"""
+    for date_str, part in df_export.groupby('Date'):
+        part_dir = os.path.join(store_dir, f"date={date_str}")
+        os.makedirs(part_dir, exist_ok=True)
+        part.to_csv(os.path.join(part_dir, "predictions.csv"), index=False, encoding='utf-8-sig')
+    print(f"已寫入預測分區: {store_dir}/ ({df_export['Date'].nunique()} 天, {len(df_export)} 場)")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="NBA 每日賽事預測匯出")
+    parser.add_argument('--horizon', type=int, help="一次預測未來 N 天的所有比賽 (寫入 predictions_store/)")
+    args = parser.parse_args()
+    main(horizon=args.horizon)
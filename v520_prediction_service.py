@@ -0,0 +1,257 @@
+import pandas as pd
+import numpy as np
+import os
+import json
+import time
+import threading
+import argparse
+from collections import deque
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from team_snapshot import SNAPSHOT_FILE, get_team_state, build_matchup_features
+from player_index import get_player_index
+import sklearn
+from model_registry import FEATURE_COLUMNS, data_fingerprint, load_saved_model
+from forest_export import export_forest, forest_predict_proba
+from v500_export_predictions import get_player_gmsc_dict, fill_missing_player_ids, calculate_team_injury_impact, confidence_label
+
+# ==========================================
+# 設定區
+# ==========================================
+HOST = "127.0.0.1"
+PORT = 8520
+DATA_FILE = "FINAL_MASTER_DATASET_v109_FIXED.csv"
+INJURY_FILE = "current_injuries.csv"
+MODEL_NAME = "v500_full"
+METRICS_WINDOW = 1000      # 每個端點保留最近幾次請求的延遲
+MAX_BATCH_GAMES = 5000
+
+# 服務狀態 (啟動時載入一次，/reload 建好完整的新狀態後整個替換參照，不修改既有的 dict)
+STATE = None
+STATE_LOCK = threading.Lock()     # 只用來避免同時進行兩次 /reload
+LATENCIES = {}
+LATENCY_LOCK = threading.Lock()
+
+# ==========================================
+# 1. 載入模型與特徵狀態
+# ==========================================
+def load_latest_model(df):
+    """
+    只讀取 v500 最後存下的模型 (服務不訓練、不覆寫 models/)
+    找不到或特徵 / sklearn 版本不符時拒絕載入；資料已更新但模型未重訓時標記為過期
+    回傳 (scaler, model, meta, 是否過期)
+    """
+    saved = load_saved_model(MODEL_NAME)
+    if saved is None:
+        raise RuntimeError(f"找不到已存模型 {MODEL_NAME}，請先執行 v500_export_predictions.py")
+    scaler, model, meta = saved
+    if meta.get('feature_columns') != FEATURE_COLUMNS or meta.get('sklearn_version') != sklearn.__version__:
+        raise RuntimeError(f"已存模型 {MODEL_NAME} 的特徵或 sklearn 版本不符，請重新執行 v500_export_predictions.py")
+    stale = meta['fingerprint'] != data_fingerprint(df.fillna(0), FEATURE_COLUMNS)
+    if stale:
+        print(f"⚠️ 模型 {MODEL_NAME} (截止 {meta['cutoff_date']}) 與目前資料不符，請執行 v500_export_predictions.py 更新")
+    return scaler, model, meta, stale
+
+def load_service_state():
+    """讀取 v500 最新存下的模型、各隊狀態快照、球員評分與目前傷病名單"""
+    t0 = time.perf_counter()
+    df = pd.read_csv(DATA_FILE)
+    scaler, model, meta, stale = load_latest_model(df)
+    team_state = get_team_state(df, SNAPSHOT_FILE)
+
+    player_index = get_player_index()
+    injuries = pd.DataFrame(columns=['Player_ID', 'Player_Name', 'Team_Abbr'])
+    if os.path.exists(INJURY_FILE):
+        injuries = fill_missing_player_ids(pd.read_csv(INJURY_FILE), player_index)
+
+    state = {
+        'forest': export_forest(model, scaler),
+        'team_state': team_state,
+        'player_index': player_index,
+        'player_gmsc_map': get_player_gmsc_dict(player_index),
+        'injuries': injuries,
+        'model_meta': meta,
+        'model_stale': stale,
+        'loaded_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+    }
+    print(f"服務狀態載入完成 ({time.perf_counter() - t0:.1f}s): {len(team_state)} 隊, 傷病 {len(injuries)} 人, "
+          f"模型截止 {meta['cutoff_date']}")
+    return state
+
+def current_state():
+    """每個請求開始時取一次目前狀態的參照，整個請求都用同一份 (不會混用新舊模型與快照)"""
+    return STATE
+
+def reload_state():
+    """完整載入新狀態後再一次替換全域參照 (指定變數為原子操作，讀取端不需加鎖)"""
+    global STATE
+    with STATE_LOCK:
+        state = load_service_state()
+        STATE = state
+    return state
+
+def _injuries_frame(state, injuries):
+    """請求自帶傷病名單 ([{Player_Name, Team_Abbr, Player_ID?}]) 時使用它，否則用目前名單"""
+    if injuries is None: return state['injuries']
+    df = pd.DataFrame(injuries, columns=['Player_ID', 'Player_Name', 'Team_Abbr'])
+    if df.empty: return df
+    return fill_missing_player_ids(df, state['player_index'])
+
+# ==========================================
+# 2. 預測
+# ==========================================
+def _matchup_features(state, home, away, target_date, injuries_df):
+    h_stats = state['team_state'].get(home)
+    a_stats = state['team_state'].get(away)
+    if not h_stats or not a_stats:
+        missing = [t for t, s in [(home, h_stats), (away, a_stats)] if not s]
+        raise ValueError(f"找不到球隊狀態: {', '.join(missing)}")
+
+    h_impact, h_inj_names = calculate_team_injury_impact(home, injuries_df, state['player_gmsc_map'])
+    a_impact, a_inj_names = calculate_team_injury_impact(away, injuries_df, state['player_gmsc_map'])
+    diff_inj = h_impact - a_impact
+    info = {
+        'Date': target_date.strftime('%Y-%m-%d'),
+        'Home': home,
+        'Away': away,
+        'Diff_NetRtg': round(h_stats['NetRtg'] - a_stats['NetRtg'], 2),
+        'Diff_Injury': round(diff_inj, 2),
+        'Diff_Streak': int(h_stats['Streak'] - a_stats['Streak']),
+        'Home_Injuries': "; ".join(h_inj_names),
+        'Away_Injuries': "; ".join(a_inj_names),
+    }
+    return build_matchup_features(h_stats, a_stats, target_date, diff_inj), info
+
+def predict_games(state, games, injuries=None):
+    """
+    games: [{'home', 'away', 'date'?, 'injuries'?}]，整批一次推論
+    回傳與 v500 輸出相同欄位的 dict 清單
+    """
+    shared_injuries = _injuries_frame(state, injuries)
+    features, infos = [], []
+    for game in games:
+        target_date = pd.Timestamp(game.get('date') or datetime.now().strftime('%Y-%m-%d'))
+        game_injuries = _injuries_frame(state, game['injuries']) if 'injuries' in game else shared_injuries
+        f, info = _matchup_features(state, game['home'].upper(), game['away'].upper(), target_date, game_injuries)
+        features.append(f)
+        infos.append(info)
+    if not features: return []
+
+    probs = forest_predict_proba(state['forest'], np.array(features, dtype=np.float64))
+    for info, prob in zip(infos, probs):
+        info['Home_Win_Prob'] = round(float(prob), 3)
+        info['Confidence'] = confidence_label(prob)
+    return infos
+
+# ==========================================
+# 3. 延遲統計
+# ==========================================
+def record_latency(endpoint, seconds):
+    with LATENCY_LOCK:
+        LATENCIES.setdefault(endpoint, deque(maxlen=METRICS_WINDOW)).append(seconds * 1000)
+
+def latency_metrics():
+    with LATENCY_LOCK:
+        snapshot = {k: np.array(v) for k, v in LATENCIES.items()}
+    out = {}
+    for endpoint, ms in snapshot.items():
+        if not len(ms): continue
+        p50, p90, p99 = np.percentile(ms, [50, 90, 99])
+        out[endpoint] = {'count': int(len(ms)), 'mean_ms': round(float(ms.mean()), 3),
+                         'p50_ms': round(float(p50), 3), 'p90_ms': round(float(p90), 3),
+                         'p99_ms': round(float(p99), 3), 'max_ms': round(float(ms.max()), 3)}
+    return out
+
+# ==========================================
+# 4. HTTP 服務
+# ==========================================
+class PredictionHandler(BaseHTTPRequestHandler):
+    """
+    GET  /health                                   服務狀態
+    GET  /metrics                                  各端點延遲百分位數
+    GET  /predict?home=BOS&away=NYK&date=2025-12-20
+    POST /predict        {"home", "away", "date"?, "injuries"?}
+    POST /predict_batch  {"games": [...], "injuries"?}
+    POST /reload                                   重新讀取 v500 存下的模型與快照
+    """
+
+    def _send(self, code, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length', 0))
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def _handle(self, endpoint, fn):
+        t0 = time.perf_counter()
+        try:
+            code, payload = 200, fn()
+        except (ValueError, KeyError, json.JSONDecodeError) as e:
+            code, payload = 400, {'error': str(e)}
+        except Exception as e:
+            code, payload = 500, {'error': str(e)}
+        self._send(code, payload)
+        record_latency(endpoint, time.perf_counter() - t0)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        state = current_state()
+        if url.path == '/health':
+            meta = state['model_meta']
+            self._send(200, {'status': 'ok', 'loaded_at': state['loaded_at'], 'teams': len(state['team_state']),
+                             'model_cutoff': meta['cutoff_date'], 'model_trees': meta.get('n_estimators'),
+                             'model_stale': state['model_stale']})
+        elif url.path == '/metrics':
+            self._send(200, latency_metrics())
+        elif url.path == '/predict':
+            q = {k: v[0] for k, v in parse_qs(url.query).items()}
+            self._handle('/predict', lambda: predict_games(state, [q])[0])
+        else:
+            self._send(404, {'error': f"未知路徑: {url.path}"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        state = current_state()
+        if url.path == '/predict':
+            self._handle('/predict', lambda: predict_games(state, [self._read_json()])[0])
+        elif url.path == '/predict_batch':
+            def batch():
+                body = self._read_json()
+                games = body.get('games', [])
+                if len(games) > MAX_BATCH_GAMES:
+                    raise ValueError(f"單次最多 {MAX_BATCH_GAMES} 場")
+                return {'predictions': predict_games(state, games, body.get('injuries'))}
+            self._handle('/predict_batch', batch)
+        elif url.path == '/reload':
+            def reload():
+                return {'status': 'reloaded', 'loaded_at': reload_state()['loaded_at']}
+            self._handle('/reload', reload)
+        else:
+            self._send(404, {'error': f"未知路徑: {url.path}"})
+
+    def log_message(self, format, *args):
+        pass
+
+def serve(host=HOST, port=PORT):
+    reload_state()
+    server = ThreadingHTTPServer((host, port), PredictionHandler)
+    print(f"預測服務啟動: http://{host}:{port}  (Ctrl+C 停止)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n預測服務已停止")
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="本機預測服務 (模型與球隊狀態常駐記憶體)")
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    args = parser.parse_args()
+    serve(args.host, args.port)
@@ -0,0 +1,147 @@
+import pandas as pd
+import numpy as np
+import os
+import glob
+import argparse
+from team_snapshot import SNAPSHOT_FILE, get_team_state, build_matchup_features
+from player_index import get_player_index
+from model_registry import FEATURE_COLUMNS, get_or_train
+from v500_export_predictions import get_player_gmsc_dict, fill_missing_player_ids, player_gmsc_values
+
+# ==========================================
+# 設定區
+# ==========================================
+DATA_FILE = "FINAL_MASTER_DATASET_v109_FIXED.csv"
+INJURY_FILE = "current_injuries.csv"
+PREDICTION_DIR = "predictions"
+MODEL_NAME = "v500_full"
+
+# Note 欄位開頭符合這些狀態的球員視為「可能上場」，兩種結果都要模擬
+QUESTIONABLE_PATTERN = r'^\s*(Day To Day|Questionable|Doubtful|Probable|Game Time Decision)'
+# 每場最多列舉幾位不確定球員 (2^N 種情境)；超過時只列舉影響最大的 N 位，其餘維持缺陣
+MAX_QUESTIONABLE_PER_GAME = 8
+
+INJURY_COL = FEATURE_COLUMNS.index('Diff_Total_Injury_Impact')
+
+def load_injuries(player_index, injury_file=INJURY_FILE):
+    """傷病名單 + GmSc + 是否為不確定 (Questionable) 球員"""
+    if not os.path.exists(injury_file):
+        return pd.DataFrame(columns=['Player_ID', 'Player_Name', 'Team_Abbr', 'Note', 'GmSc', 'Questionable'])
+    injuries = fill_missing_player_ids(pd.read_csv(injury_file), player_index)
+    injuries['GmSc'] = player_gmsc_values(injuries, get_player_gmsc_dict(player_index))
+    injuries['Questionable'] = injuries['Note'].fillna('').str.contains(QUESTIONABLE_PATTERN, case=False, regex=True)
+    return injuries
+
+def scenario_matrix(n):
+    """2^n x n 的 0/1 矩陣，1 = 該球員缺陣；第 0 列全部上場，最後一列全部缺陣"""
+    return ((np.arange(2 ** n)[:, None] >> np.arange(n)) & 1).astype(np.float64)
+
+def build_game_scenarios(home, away, injuries):
+    """
+    單場情境：確定缺陣的影響固定，不確定球員逐一列舉上場 / 缺陣
+    回傳 (base_diff, players, signed_impact)：diff_inj = base_diff + M @ signed_impact
+    """
+    game_inj = injuries[injuries['Team_Abbr'].isin([home, away]) & (injuries['GmSc'] > 0)]
+    sign = np.where(game_inj['Team_Abbr'] == home, 1.0, -1.0)
+    impact = sign * game_inj['GmSc'].to_numpy() / 80.0
+
+    questionable = game_inj['Questionable'].to_numpy()
+    # 不確定球員太多時，只列舉影響最大的幾位，其餘照名單視為缺陣
+    q_idx = np.flatnonzero(questionable)
+    q_idx = q_idx[np.argsort(-np.abs(impact[q_idx]), kind='stable')][:MAX_QUESTIONABLE_PER_GAME]
+    fixed = np.ones(len(game_inj), dtype=bool)
+    fixed[q_idx] = False
+
+    players = game_inj.iloc[q_idx]
+    return float(sum(impact[fixed].tolist())), players, impact[q_idx]
+
+def _describe(players, row):
+    if players.empty: return ""
+    parts = [f"{name}({team}) {'缺陣' if sits else '上場'}"
+             for name, team, sits in zip(players['Player_Name'], players['Team_Abbr'], row)]
+    return "; ".join(parts)
+
+def evaluate_slate(games, target_date, team_state, injuries, scaler, model):
+    """
+    整個賽程的所有情境組成一個特徵矩陣，一次 transform + predict_proba
+    回傳每場的機率區間
+    """
+    blocks, meta = [], []
+    for home, away in games:
+        h_stats, a_stats = team_state.get(home), team_state.get(away)
+        if not h_stats or not a_stats:
+            print(f"跳過 {home} vs {away} (數據不足)")
+            continue
+        base_diff, players, signed = build_game_scenarios(home, away, injuries)
+        M = scenario_matrix(len(players))
+        diffs = base_diff + M @ signed
+
+        features = np.tile(np.array(build_matchup_features(h_stats, a_stats, target_date, 0.0), dtype=np.float64), (len(M), 1))
+        features[:, INJURY_COL] = diffs
+        blocks.append(features)
+        meta.append((home, away, players, M, diffs))
+
+    if not blocks: return pd.DataFrame()
+    X = pd.DataFrame(np.vstack(blocks), columns=FEATURE_COLUMNS)
+    probs = model.predict_proba(scaler.transform(X))[:, 1]
+
+    rows, start = [], 0
+    for (home, away, players, M, diffs), block in zip(meta, blocks):
+        p = probs[start:start + len(block)]
+        start += len(block)
+        lo, hi = int(np.argmin(p)), int(np.argmax(p))
+        rows.append({
+            'Date': target_date.strftime('%Y-%m-%d'),
+            'Home': home,
+            'Away': away,
+            'Home_Win_Prob': round(p[-1], 3),        # 名單上所有人缺陣 (= v500 預測)
+            'Prob_All_Play': round(p[0], 3),         # 不確定球員全部上場
+            'Prob_Min': round(p[lo], 3),
+            'Prob_Max': round(p[hi], 3),
+            'Prob_Range': round(p[hi] - p[lo], 3),
+            'N_Questionable': len(players),
+            'N_Scenarios': len(p),
+            'Questionable_Players': "; ".join(f"{n}({t}, {g:.1f})" for n, t, g in
+                                              zip(players['Player_Name'], players['Team_Abbr'], players['GmSc'])),
+            'Min_Scenario': _describe(players, M[lo]),
+            'Max_Scenario': _describe(players, M[hi]),
+        })
+    return pd.DataFrame(rows)
+
+def latest_slate(prediction_dir=PREDICTION_DIR, date=None):
+    """讀取 v500 已輸出的賽程 (預設最新一天)，避免重新抓賽程"""
+    if date:
+        path = os.path.join(prediction_dir, f"predictions_{date}.csv")
+    else:
+        files = sorted(glob.glob(os.path.join(prediction_dir, "predictions_*.csv")))
+        if not files: return None, []
+        path = files[-1]
+    if not os.path.exists(path): return None, []
+    df = pd.read_csv(path)
+    return pd.Timestamp(df['Date'].iloc[0]), list(zip(df['Home'], df['Away']))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="傷病情境分析：列舉不確定球員上場 / 缺陣的勝率區間")
+    parser.add_argument('--date', help="預測日期 (YYYY-MM-DD)，預設為 predictions/ 中最新的一天")
+    args = parser.parse_args()
+
+    target_date, games = latest_slate(date=args.date)
+    if not games:
+        print("錯誤: 找不到 v500 的預測賽程，請先執行 v500_export_predictions.py")
+        raise SystemExit(1)
+
+    df = pd.read_csv(DATA_FILE)
+    scaler, model, _ = get_or_train(df.fillna(0), MODEL_NAME, incremental=True)
+    team_state = get_team_state(df, SNAPSHOT_FILE)
+    injuries = load_injuries(get_player_index())
+    print(f"傷病名單 {len(injuries)} 人，其中不確定 {int(injuries['Questionable'].sum())} 人")
+
+    result = evaluate_slate(games, target_date, team_state, injuries, scaler, model)
+    print(f"\n{'主隊':<5} vs {'客隊':<5} | {'名單':>6} | {'區間':>15} | 情境數")
+    print("-" * 55)
+    for _, r in result.iterrows():
+        print(f"{r['Home']:<5} vs {r['Away']:<5} | {r['Home_Win_Prob']:>6.1%} | {r['Prob_Min']:>6.1%} ~ {r['Prob_Max']:>6.1%} | {r['N_Scenarios']}")
+
+    output_csv = os.path.join(PREDICTION_DIR, f"injury_scenarios_{target_date.strftime('%Y-%m-%d')}.csv")
+    result.to_csv(output_csv, index=False, encoding='utf-8-sig')
+    print(f"\n成功匯出情境分析至: {output_csv}")
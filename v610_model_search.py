@@ -0,0 +1,192 @@
+import pandas as pd
+import numpy as np
+import os
+import json
+import time
+import hashlib
+import argparse
+import joblib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from sklearn.ensemble import RandomForestClassifier, HistGradientBoostingClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.preprocessing import StandardScaler
+from sklearn.metrics import accuracy_score, log_loss, brier_score_loss
+from model_registry import MODEL_DIR, FEATURE_COLUMNS, TARGET_COLUMN, data_fingerprint
+
+# ==========================================
+# 設定區
+# ==========================================
+DATA_FILE = "FINAL_MASTER_DATASET_v109_FIXED.csv"
+SEARCH_DIR = os.path.join(MODEL_DIR, "search")
+RESULTS_FILE = os.path.join(SEARCH_DIR, "results.csv")
+REPORT_FILE = "v610_model_search_report.csv"
+
+# 時間序列 CV：每個測試賽季只用之前的賽季訓練
+TEST_SEASONS = [2022, 2023, 2024, 2025, 2026]
+N_JOBS = os.cpu_count() or 1
+
+# 候選模型：名稱 -> (模型類別, 參數)；rf_100 即目前線上模型
+MODEL_FAMILIES = {
+    'rf': RandomForestClassifier,
+    'hgb': HistGradientBoostingClassifier,
+    'logreg': LogisticRegression,
+}
+CANDIDATES = {
+    'rf_100': ('rf', {'n_estimators': 100, 'random_state': 42}),
+    'rf_300': ('rf', {'n_estimators': 300, 'random_state': 42, 'n_jobs': 1}),
+    'rf_100_d6': ('rf', {'n_estimators': 100, 'max_depth': 6, 'random_state': 42}),
+    'rf_100_d10': ('rf', {'n_estimators': 100, 'max_depth': 10, 'random_state': 42}),
+    'rf_100_leaf20': ('rf', {'n_estimators': 100, 'min_samples_leaf': 20, 'random_state': 42}),
+    'hgb_default': ('hgb', {'random_state': 42}),
+    'hgb_slow': ('hgb', {'learning_rate': 0.03, 'max_iter': 300, 'max_depth': 4, 'random_state': 42}),
+    'logreg_c1': ('logreg', {'C': 1.0, 'max_iter': 1000}),
+    'logreg_c01': ('logreg', {'C': 0.1, 'max_iter': 1000}),
+}
+
+RESULT_COLUMNS = ['Key', 'Candidate', 'Test_Season', 'Train_Rows', 'Test_Rows',
+                  'Accuracy', 'LogLoss', 'Brier', 'Fit_Sec', 'Predict_Sec', 'Predict_Ms_Per_Row']
+
+def _candidate_key(name, fold_id):
+    family, params = CANDIDATES[name]
+    spec = json.dumps([family, params], sort_keys=True)
+    return f"{name}_{fold_id}_{hashlib.sha256(spec.encode('utf-8')).hexdigest()[:8]}"
+
+# ==========================================
+# 1. Fold 特徵矩陣 (存檔快取)
+# ==========================================
+def build_folds(df, test_seasons=TEST_SEASONS):
+    """
+    建立 (或讀取) 每個測試賽季的標準化特徵矩陣
+    檔名含訓練 + 測試資料指紋，資料變動時自動重建
+    回傳 [(test_season, fold_id, path)]
+    """
+    os.makedirs(os.path.join(SEARCH_DIR, "folds"), exist_ok=True)
+    folds = []
+    for season in test_seasons:
+        train_df = df[df['Season_Year'] < season]
+        test_df = df[df['Season_Year'] == season]
+        if train_df.empty or test_df.empty: continue
+
+        fold_id = f"{season}_{data_fingerprint(pd.concat([train_df, test_df]))[:12]}"
+        path = os.path.join(SEARCH_DIR, "folds", f"fold_{fold_id}.npz")
+        if not os.path.exists(path):
+            scaler = StandardScaler()
+            X_train = scaler.fit_transform(train_df[FEATURE_COLUMNS])
+            X_test = scaler.transform(test_df[FEATURE_COLUMNS])
+            np.savez(path, X_train=X_train, y_train=train_df[TARGET_COLUMN].to_numpy(),
+                     X_test=X_test, y_test=test_df[TARGET_COLUMN].to_numpy())
+            print(f"  建立 fold {season}: 訓練 {len(train_df)} 筆 / 測試 {len(test_df)} 筆")
+        folds.append((season, fold_id, path))
+    return folds
+
+# ==========================================
+# 2. 單一 (候選, fold) 任務
+# ==========================================
+def run_task(task):
+    """訓練 + 評估一個候選模型在一個 fold 上的表現 (在子進程執行)"""
+    name, season, fold_id, path, save_models = task
+    family, params = CANDIDATES[name]
+    data = np.load(path)
+    X_train, y_train, X_test, y_test = data['X_train'], data['y_train'], data['X_test'], data['y_test']
+
+    model = MODEL_FAMILIES[family](**params)
+    t0 = time.perf_counter()
+    model.fit(X_train, y_train)
+    fit_sec = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    probs = model.predict_proba(X_test)[:, 1]
+    predict_sec = time.perf_counter() - t0
+
+    key = _candidate_key(name, fold_id)
+    if save_models:
+        joblib.dump(model, os.path.join(SEARCH_DIR, "models", f"{key}.joblib"), compress=3)
+
+    return {
+        'Key': key,
+        'Candidate': name,
+        'Test_Season': season,
+        'Train_Rows': len(y_train),
+        'Test_Rows': len(y_test),
+        'Accuracy': accuracy_score(y_test, (probs > 0.5).astype(int)),
+        'LogLoss': log_loss(y_test, probs, labels=[0, 1]),
+        'Brier': brier_score_loss(y_test, probs),
+        'Fit_Sec': fit_sec,
+        'Predict_Sec': predict_sec,
+        'Predict_Ms_Per_Row': predict_sec * 1000 / max(len(y_test), 1),
+    }
+
+def load_results():
+    if not os.path.exists(RESULTS_FILE):
+        return pd.DataFrame(columns=RESULT_COLUMNS)
+    return pd.read_csv(RESULTS_FILE)
+
+def _append_result(result):
+    """每完成一個任務就寫入，中斷後可從快取繼續"""
+    header = not os.path.exists(RESULTS_FILE)
+    pd.DataFrame([result], columns=RESULT_COLUMNS).to_csv(RESULTS_FILE, mode='a', header=header, index=False)
+
+# ==========================================
+# 3. 搜尋主流程
+# ==========================================
+def run_search(df, candidates, n_jobs=N_JOBS, save_models=True):
+    folds = build_folds(df)
+    done = set(load_results()['Key'])
+    if save_models:
+        os.makedirs(os.path.join(SEARCH_DIR, "models"), exist_ok=True)
+
+    tasks = [(name, season, fold_id, path, save_models)
+             for name in candidates for season, fold_id, path in folds
+             if _candidate_key(name, fold_id) not in done]
+    print(f"候選 {len(candidates)} 個 x fold {len(folds)} 個: 快取命中 {len(candidates) * len(folds) - len(tasks)}, 需執行 {len(tasks)} (workers={n_jobs})")
+
+    if n_jobs > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            futures = {pool.submit(run_task, t): t for t in tasks}
+            for fut in as_completed(futures):
+                result = fut.result()
+                _append_result(result)
+                print(f"  完成 {result['Candidate']:<14} {result['Test_Season']} | LogLoss {result['LogLoss']:.4f} | fit {result['Fit_Sec']:.2f}s")
+    else:
+        for t in tasks:
+            result = run_task(t)
+            _append_result(result)
+            print(f"  完成 {result['Candidate']:<14} {result['Test_Season']} | LogLoss {result['LogLoss']:.4f} | fit {result['Fit_Sec']:.2f}s")
+
+    # 只彙整目前 fold 與候選參數對應的結果
+    valid_keys = {_candidate_key(name, fold_id) for name in candidates for _, fold_id, _ in folds}
+    results = load_results()
+    return results[results['Key'].isin(valid_keys)]
+
+def summarize(results):
+    """以各 fold 平均排名 (LogLoss 越低越好)"""
+    report = results.groupby('Candidate').agg(
+        Folds=('Test_Season', 'count'),
+        Accuracy=('Accuracy', 'mean'),
+        LogLoss=('LogLoss', 'mean'),
+        Brier=('Brier', 'mean'),
+        Fit_Sec=('Fit_Sec', 'mean'),
+        Predict_Ms_Per_Row=('Predict_Ms_Per_Row', 'mean'),
+    ).sort_values('LogLoss').reset_index()
+
+    print("\n" + "=" * 90)
+    print(f"{'候選':<16} | {'Folds':>5} | {'Accuracy':>8} | {'LogLoss':>8} | {'Brier':>8} | {'Fit(s)':>7} | {'Pred(ms/列)':>11}")
+    print("-" * 90)
+    for _, r in report.iterrows():
+        print(f"{r['Candidate']:<16} | {r['Folds']:>5} | {r['Accuracy']:>8.4f} | {r['LogLoss']:>8.4f} | "
+              f"{r['Brier']:>8.4f} | {r['Fit_Sec']:>7.2f} | {r['Predict_Ms_Per_Row']:>11.4f}")
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="模型 / 超參數搜尋 (時間序列 CV，可中斷續跑)")
+    parser.add_argument('--candidates', nargs='+', choices=list(CANDIDATES), default=list(CANDIDATES), help="要評估的候選 (預設全部)")
+    parser.add_argument('--jobs', type=int, default=N_JOBS, help="平行進程數")
+    parser.add_argument('--no-save-models', action='store_true', help="不保存各 fold 訓練好的模型")
+    args = parser.parse_args()
+
+    print(f"--- 模型搜尋 (測試賽季 {TEST_SEASONS}) ---")
+    df = pd.read_csv(DATA_FILE).fillna(0)
+    results = run_search(df, args.candidates, n_jobs=args.jobs, save_models=not args.no_save_models)
+    report = summarize(results)
+    report.to_csv(REPORT_FILE, index=False, encoding='utf-8-sig')
+    print(f"\n搜尋報告已儲存至: {REPORT_FILE}")
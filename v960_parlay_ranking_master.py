@@ -4,11 +4,14 @@ import os
 import glob
 from itertools import combinations
 import re
+import hashlib
+import argparse
 import matplotlib.pyplot as plt
 import seaborn as sns
 import matplotlib.cm as cm
 import matplotlib.dates as mdates
 from pandas.plotting import register_matplotlib_converters
+from model_registry import MODEL_DIR
 
 # 註冊 Matplotlib 日期轉換器
 register_matplotlib_converters()
@@ -19,6 +22,19 @@ register_matplotlib_converters()
 HIST_PRED_FILE = "predictions_2026_full_report.csv"
 HIST_ODDS_FILE = "odds_2026_full_season.csv"
 
+# 每日策略組合統計 (每次只重算新增或有變動的比賽日)
+COMBO_STORE_FILE = os.path.join(MODEL_DIR, "v960_combo_store.csv")
+COMBO_STORE_DTYPES = {'Date': str, 'Day_Hash': str, 'Key': 'int64', 'Count': 'int64',
+                      'Wins': 'int64', 'Profit': 'float64', 'First_Pos': 'int64'}
+COMBO_STORE_COLUMNS = list(COMBO_STORE_DTYPES)
+
+# 以「比賽日」為單位重抽 (多項分配權重) 的 bootstrap 信賴區間
+N_BOOTSTRAP = 2000
+CI_LEVEL = 0.90
+BOOTSTRAP_SEED = 42
+CI_REPORT_FILE = "Strategy_Bootstrap_CI.csv"
+RANK_BY = 'roi'         # 'roi': 依歷史 ROI 排名；'lower': 依 ROI 信賴區間下界排名 (小樣本組合會被壓低)
+
 # 設定 Matplotlib 不使用視窗介面
 plt.switch_backend('Agg')
 plt.style.use('ggplot')
@@ -45,48 +61,70 @@ def normalize_team(name):
 # ==========================================
 # 核心邏輯：策略定義
 # ==========================================
-def get_active_strategies(row):
+# 策略註冊表：第 i 個策略對應 bitmask 的第 i 位 (1 << i)
+STRATEGY_NAMES = ['精準打擊', '平衡型', '穩健過濾', '客場殺手', '極高價值',
+                  '狙擊冷門', '基礎', '穩健保本', '主場優勢', '鐵桶防禦']
+N_STRATEGIES = len(STRATEGY_NAMES)
+STRATEGY_BITS = 1 << np.arange(N_STRATEGIES, dtype=np.int64)
+# 組合 key 的 A / B 依名稱排序 (與原本 tuple(sorted(...)) 相同)，事先換成名次
+STRATEGY_RANK = np.argsort(np.argsort(STRATEGY_NAMES, kind='stable'), kind='stable')
+
+def strategy_matrix(df):
     """
-    判斷單一注單符合哪些策略
+    判斷每筆注單符合哪些策略 (一次處理整個 DataFrame)
+    回傳 (注單數 x 策略數) 布林矩陣，欄位順序為 STRATEGY_NAMES
     """
-    prob = row['Prob']
-    odds = row['Odds']
-    ev = row['EV']
-    is_home = row['Is_Home']
-    
-    strategies = []
-    
-    # 1. 🎯 精準打擊
-    if prob > 0.65 and ev > 0.05: strategies.append('精準打擊')
-    
-    # 2. ⚖️ 平衡型
-    if prob > 0.55 and odds > 1.6: strategies.append('平衡型')
-    
-    # 3. 🛡️ 穩健過濾
-    if prob > 0.60 and odds > 1.3: strategies.append('穩健過濾')
-    
-    # 4. 🛣️ 客場殺手
-    if not is_home and ev > 0.05: strategies.append('客場殺手')
-    
-    # 5. 💎 極高價值
-    if ev > 0.15: strategies.append('極高價值')
-    
-    # 6. 🏹 狙擊冷門
-    if odds > 1.75 and ev > 0.05: strategies.append('狙擊冷門')
-    
-    # 7. 🟢 基礎
-    if ev > 0: strategies.append('基礎')
-    
-    # 8. 🛡️ 穩健保本
-    if prob > 0.65: strategies.append('穩健保本')
-    
-    # 9. 🏠 主場優勢
-    if is_home and prob > 0.60: strategies.append('主場優勢')
-    
-    # 10. 🏰 鐵桶防禦
-    if prob > 0.75: strategies.append('鐵桶防禦')
-    
-    return strategies
+    prob = df['Prob'].to_numpy(dtype=float)
+    odds = df['Odds'].to_numpy(dtype=float)
+    ev = df['EV'].to_numpy(dtype=float)
+    is_home = df['Is_Home'].to_numpy(dtype=bool)
+    return np.column_stack([
+        (prob > 0.65) & (ev > 0.05),    # 1. 🎯 精準打擊
+        (prob > 0.55) & (odds > 1.6),   # 2. ⚖️ 平衡型
+        (prob > 0.60) & (odds > 1.3),   # 3. 🛡️ 穩健過濾
+        ~is_home & (ev > 0.05),         # 4. 🛣️ 客場殺手
+        ev > 0.15,                      # 5. 💎 極高價值
+        (odds > 1.75) & (ev > 0.05),    # 6. 🏹 狙擊冷門
+        ev > 0,                         # 7. 🟢 基礎
+        prob > 0.65,                    # 8. 🛡️ 穩健保本
+        is_home & (prob > 0.60),        # 9. 🏠 主場優勢
+        prob > 0.75,                    # 10. 🏰 鐵桶防禦
+    ])
+
+def strategy_masks(df):
+    """每筆注單的策略 bitmask (int64)，0 表示不符合任何策略"""
+    if df.empty: return np.zeros(0, dtype=np.int64)
+    return strategy_matrix(df).astype(np.int64) @ STRATEGY_BITS
+
+def mask_bits(mask):
+    """bitmask -> 策略編號清單 (依 STRATEGY_NAMES 順序)"""
+    return [i for i in range(N_STRATEGIES) if mask >> i & 1]
+
+def pair_key(a, b):
+    """兩個策略編號 -> 組合 key (整數，A+B 與 B+A 相同)"""
+    if STRATEGY_RANK[a] > STRATEGY_RANK[b]: a, b = b, a
+    return int(a) * N_STRATEGIES + int(b)
+
+def pair_names(key):
+    """組合 key -> (策略_A, 策略_B) 顯示名稱"""
+    a, b = divmod(key, N_STRATEGIES)
+    return STRATEGY_NAMES[a], STRATEGY_NAMES[b]
+
+def daily_bet_pairs(df):
+    """
+    每日所有兩兩注單組合 (等同逐日 combinations(bets, 2)，排除同場比賽)
+    回傳 (i, j) 兩個列索引陣列，順序與原本的巢狀迴圈相同
+    """
+    game_ids = df['Game_ID'].to_numpy()
+    idx_i, idx_j = [], []
+    for rows in df.groupby('date', sort=True).indices.values():
+        if len(rows) < 2: continue
+        a, b = np.triu_indices(len(rows), k=1)
+        idx_i.append(rows[a]); idx_j.append(rows[b])
+    if not idx_i: return np.array([], dtype=int), np.array([], dtype=int)
+    i, j = np.concatenate(idx_i), np.concatenate(idx_j)
+    keep = game_ids[i] != game_ids[j]
+    return i[keep], j[keep]
 
 # ==========================================
 # 新增功能：繪製儀表板
@@ -118,7 +156,7 @@ def plot_parlay_dashboard(combo_history, top_combos):
             df = df.sort_values('date')
             df['Cumulative_Profit'] = df['profit'].cumsum()
             df['Cumulative_Wins'] = df['win'].cumsum()
-            df['Bet_Count'] = np.arange(1, len(df) + 1)
+            df['Bet_Count'] = df['count'].cumsum()
             df['Running_WR'] = df['Cumulative_Wins'] / df['Bet_Count']
             plottable_data[combo_name] = df
 
@@ -226,92 +264,226 @@ def load_and_process_history():
         print(f"❌ 讀取歷史資料失敗: {e}")
         return pd.DataFrame()
 
-def train_and_export_model(df):
+def day_hashes(df):
+    """每個比賽日注單內容 (含順序) 的雜湊：賽果、賠率、機率任何改變都會不同"""
+    cols = ['Game_ID', 'Team', 'Is_Home', 'Prob', 'Odds', 'Win']
+    row_hash = pd.util.hash_pandas_object(df[cols], index=False).to_numpy()
+    dates = df['date'].dt.strftime('%Y-%m-%d').to_numpy()
+    return {d: hashlib.sha256(row_hash[rows].tobytes()).hexdigest()[:16]
+            for d, rows in pd.Series(np.arange(len(df))).groupby(dates, sort=True).indices.items()}
+
+def day_combo_stats(df, hashes):
     """
-    1. 計算歷史 ROI, 勝率, 場次
-    2. 匯出 Best_Strategy_Combos_Unique.csv
-    3. 回傳 roi_map 供今日預測使用
-    4. [新增] 繪製 Top 10 儀表板
+    計算傳入日期的每日策略組合統計 (各日獨立，可只算新的日期)
+    回傳 COMBO_STORE_COLUMNS 格式：每個 (日期, 組合 key) 一列；沒有任何組合的日期留一列 Key = -1 當作已處理標記
+    """
+    df = df.reset_index(drop=True)
+    S = strategy_matrix(df)
+    pi, pj = daily_bet_pairs(df)
+    
+    wins = df['Win'].to_numpy() == 1
+    odds = df['Odds'].to_numpy(dtype=float)
+    pair_win = wins[pi] & wins[pj]
+    pair_profit = np.where(pair_win, odds[pi] * odds[pj] - 1, -1.0)
+    
+    # 每一筆歸因事件 (組合, s1, s2)，np.nonzero 依 C 順序回傳 = 原本三層迴圈的順序
+    K = N_STRATEGIES
+    hit = S[pi][:, :, None] & S[pj][:, None, :]
+    ev_pair, ev_x, ev_y = np.nonzero(hit)
+    ev_key = np.array([pair_key(x, y) for x in range(K) for y in range(K)])[ev_x * K + ev_y]
+    ev_date = df['date'].dt.strftime('%Y-%m-%d').to_numpy()[pi[ev_pair]]
+    
+    # 事件在當日的序號 (決定同 ROI 時的排序)
+    _, day_first, day_of = np.unique(ev_date, return_index=True, return_inverse=True)
+    events = pd.DataFrame({'Date': ev_date, 'Key': ev_key, 'Pos': np.arange(len(ev_date)) - day_first[day_of]})
+    grouped = events.groupby(['Date', 'Key'], sort=False)
+    rows = grouped.agg(Count=('Pos', 'size'), First_Pos=('Pos', 'min')).reset_index()
+    group = grouped.ngroup().to_numpy()
+    
+    # 獲利在每個 (日期, 組合) 內依事件順序逐筆累加；整季總和再由各日小計相加，
+    # 加總順序與原本整季逐筆 += 不同，浮點數尾數可能差約 1e-15 (輸出的 ROI 一律四捨五入到 2 位)
+    profit = np.zeros(len(rows))
+    np.add.at(profit, group, pair_profit[ev_pair])
+    rows['Wins'] = np.bincount(group, weights=pair_win[ev_pair], minlength=len(rows)).astype(int)
+    rows['Profit'] = profit
+    
+    done = set(rows['Date'])
+    empty = pd.DataFrame({'Date': [d for d in hashes if d not in done], 'Key': -1, 'Count': 0, 'First_Pos': 0, 'Wins': 0, 'Profit': 0.0})
+    rows = pd.concat([rows, empty], ignore_index=True)
+    rows['Day_Hash'] = rows['Date'].map(hashes)
+    return rows[COMBO_STORE_COLUMNS].astype(COMBO_STORE_DTYPES)
+
+def bootstrap_day_weights(n_days, n_boot=N_BOOTSTRAP, seed=BOOTSTRAP_SEED):
+    """(n_boot x n_days) 多項分配權重：每列 = 有放回抽 n_days 天時每一天被抽到的次數"""
+    rng = np.random.default_rng(seed)
+    return rng.multinomial(n_days, np.full(n_days, 1.0 / n_days), size=n_boot).astype(np.float64)
+
+def bootstrap_ci(W, profit, count, wins, level=CI_LEVEL):
+    """
+    profit / count / wins: (天數 x 策略數) 每日彙總；一次矩陣乘法得到所有重抽樣本的總和
+    回傳 ROI 與勝率 (%) 的百分位信賴區間 (roi_lo, roi_hi, wr_lo, wr_hi)，各為長度 = 策略數的陣列
+    """
+    P, C, Wn = W @ profit, W @ count, W @ wins
+    with np.errstate(divide='ignore', invalid='ignore'):
+        roi = np.where(C > 0, P / C * 100, np.nan)
+        win_rate = np.where(C > 0, Wn / C * 100, np.nan)
+    q = [(1 - level) / 2, 1 - (1 - level) / 2]
+    roi_lo, roi_hi = np.nanquantile(roi, q, axis=0)
+    wr_lo, wr_hi = np.nanquantile(win_rate, q, axis=0)
+    return roi_lo, roi_hi, wr_lo, wr_hi
+
+def day_matrix(day_pos, col, values, n_days, n_cols):
+    """逐筆 (日期位置, 欄位, 數值) 累加成 (天數 x 欄位數) 矩陣"""
+    mat = np.zeros((n_days, n_cols))
+    np.add.at(mat, (day_pos, col), values)
+    return mat
+
+def single_strategy_ci(df, days, W):
+    """單場策略 (STRATEGY_NAMES) 的 ROI、勝率與 bootstrap 信賴區間"""
+    S = strategy_matrix(df)
+    bet, strat = np.nonzero(S)
+    win = (df['Win'].to_numpy() == 1)[bet]
+    profit = np.where(win, df['Odds'].to_numpy(dtype=float)[bet] - 1, -1.0)
+    day_pos = np.searchsorted(days, df['date'].dt.strftime('%Y-%m-%d').to_numpy()[bet])
+    mats = [day_matrix(day_pos, strat, v, len(days), N_STRATEGIES) for v in (profit, np.ones(len(bet)), win)]
+    roi_lo, roi_hi, wr_lo, wr_hi = bootstrap_ci(W, *mats)
+    count = mats[1].sum(axis=0)
+    rows = []
+    for k, name in enumerate(STRATEGY_NAMES):
+        if count[k] == 0: continue
+        rows.append({'類型': '單場', '策略_A': name, '策略_B': '',
+                     'ROI': round(mats[0][:, k].sum() / count[k] * 100, 2),
+                     'ROI_下界': round(roi_lo[k], 2), 'ROI_上界': round(roi_hi[k], 2),
+                     '勝率': round(mats[2][:, k].sum() / count[k] * 100, 2),
+                     '勝率_下界': round(wr_lo[k], 2), '勝率_上界': round(wr_hi[k], 2),
+                     '場次': int(count[k])})
+    return rows
+
+def load_combo_store(store_file=COMBO_STORE_FILE):
+    if not os.path.exists(store_file):
+        return pd.DataFrame(columns=COMBO_STORE_COLUMNS).astype(COMBO_STORE_DTYPES)
+    return pd.read_csv(store_file, dtype=COMBO_STORE_DTYPES, float_precision='round_trip')
+
+def save_combo_store(store, store_file=COMBO_STORE_FILE):
+    os.makedirs(os.path.dirname(store_file) or ".", exist_ok=True)
+    store.sort_values(['Date', 'First_Pos', 'Key']).to_csv(store_file, index=False)
+
+def update_combo_store(df, rebuild=False, store_file=COMBO_STORE_FILE):
+    """
+    只重算新增或內容有變的比賽日，並移除歷史中已不存在的日期
+    rebuild=True：全部重算，並與既有 store 比對 (一致性檢查) 後覆寫
+    """
+    hashes = day_hashes(df)
+    store = load_combo_store(store_file)
+    stored = dict(zip(store['Date'], store['Day_Hash']))
+    
+    if rebuild:
+        fresh = day_combo_stats(df, hashes)
+        if not store.empty:
+            cols = ['Date', 'Key', 'Count', 'Wins', 'Profit', 'First_Pos']
+            a = store[cols].sort_values(['Date', 'Key']).reset_index(drop=True)
+            b = fresh[cols].sort_values(['Date', 'Key']).reset_index(drop=True)
+            if a.equals(b):
+                print(f"🔍 一致性檢查通過：store 與完整重算結果相同 ({len(hashes)} 天)")
+            else:
+                merged = a.merge(b, on=['Date', 'Key'], how='outer', suffixes=('_old', '_new'), indicator=True)
+                bad = merged[(merged['_merge'] != 'both') | (merged['Count_old'] != merged['Count_new'])
+                             | (merged['Wins_old'] != merged['Wins_new']) | (merged['Profit_old'] != merged['Profit_new'])]
+                print(f"⚠️ 一致性檢查：{bad['Date'].nunique()} 天與完整重算不同，已以重算結果覆寫")
+        store = fresh
+    else:
+        stale = [d for d, h in hashes.items() if stored.get(d) != h]
+        keep = store[store['Date'].map(hashes) == store['Day_Hash']]
+        if stale:
+            dates = df['date'].dt.strftime('%Y-%m-%d')
+            fresh = day_combo_stats(df[dates.isin(stale)], {d: hashes[d] for d in stale})
+            store = pd.concat([keep, fresh], ignore_index=True)
+        else:
+            store = keep
+        print(f"🗂️ 策略組合 store：沿用 {len(hashes) - len(stale)} 天，重算 {len(stale)} 天")
+    
+    save_combo_store(store, store_file)
+    return store
+
+def train_and_export_model(df, rebuild=False, rank_by=RANK_BY):
+    """
+    1. 計算歷史 ROI, 勝率, 場次 (從 store 彙總，只重算新的比賽日)
+    2. 以比賽日 bootstrap 計算 ROI / 勝率信賴區間 (單場策略 + 所有組合)
+    3. 匯出 Best_Strategy_Combos_Unique.csv 與 Strategy_Bootstrap_CI.csv
+    4. 回傳 roi_map 供今日預測使用 (rank_by='lower' 時為 ROI 信賴區間下界)
+    5. [新增] 繪製 Top 10 儀表板
     """
     if df.empty: return {}
     
     print("🧠 正在訓練策略組合模型 (計算歷史數據)...")
+    store = update_combo_store(df, rebuild=rebuild)
     
-    # 標記策略
-    records = df.to_dict('records')
-    for r in records:
-        r['Strategies'] = get_active_strategies(r)
-        
-    df_tagged = pd.DataFrame(records)
-    daily_groups = df_tagged.groupby('date')
+    # 依日期 + 當日序號排序後彙總：key 順序 = 第一次出現的順序 (影響同 ROI 時的排序)
+    daily = store[store['Key'] >= 0].sort_values(['Date', 'First_Pos'], kind='stable')
+    key_order = list(dict.fromkeys(daily['Key']))
+    key_id = {key: n for n, key in enumerate(key_order)}
+    group = daily['Key'].map(key_id).to_numpy()
+    profit = np.zeros(len(key_order))
+    np.add.at(profit, group, daily['Profit'].to_numpy())
+    counts = np.bincount(group, weights=daily['Count'].to_numpy(), minlength=len(key_order))
+    wins = np.bincount(group, weights=daily['Wins'].to_numpy(), minlength=len(key_order))
+    combo_stats = {int(key): {'profit': profit[n], 'wins': int(wins[n]), 'count': int(counts[n])}
+                   for n, key in enumerate(key_order)}
     
-    # 統計 (S1, S2) -> {profit, wins, count}
-    combo_stats = {} 
-    # [新增] 紀錄歷史每日結果 (S1, S2) -> [{'date', 'profit', 'win'}]
-    combo_history = {}
+    # Bootstrap：所有組合共用同一組日期權重，一次矩陣乘法算完
+    days = np.sort(store['Date'].unique())
+    W = bootstrap_day_weights(len(days))
+    day_pos = np.searchsorted(days, daily['Date'].to_numpy())
+    combo_mats = [day_matrix(day_pos, group, daily[c].to_numpy(dtype=float), len(days), len(key_order))
+                  for c in ('Profit', 'Count', 'Wins')]
+    roi_lo, roi_hi, wr_lo, wr_hi = bootstrap_ci(W, *combo_mats)
+    for n, key in enumerate(key_order):
+        combo_stats[int(key)].update({'roi_lo': roi_lo[n], 'roi_hi': roi_hi[n], 'wr_lo': wr_lo[n], 'wr_hi': wr_hi[n]})
     
-    for date, group in daily_groups:
-        bets = group.to_dict('records')
-        if len(bets) < 2: continue
-        
-        # 該日所有兩兩組合
-        bet_pairs = list(combinations(bets, 2))
-        
-        for b1, b2 in bet_pairs:
-            if b1['Game_ID'] == b2['Game_ID']: continue
-            
-            is_win = (b1['Win'] == 1 and b2['Win'] == 1)
-            profit = (b1['Odds'] * b2['Odds'] - 1) if is_win else -1
-            
-            strats1 = b1['Strategies']
-            strats2 = b2['Strategies']
-            
-            # 將結果歸因於所有策略組合
-            for s1 in strats1:
-                for s2 in strats2:
-                    # 排序 key 確保 A+B = B+A
-                    key = tuple(sorted([s1, s2]))
-                    
-                    if key not in combo_stats:
-                        combo_stats[key] = {'profit': 0.0, 'wins': 0, 'count': 0}
-                        combo_history[key] = []
-                    
-                    combo_stats[key]['profit'] += profit
-                    combo_stats[key]['count'] += 1
-                    if is_win:
-                        combo_stats[key]['wins'] += 1
-                    
-                    # [新增] 記錄歷史
-                    combo_history[key].append({
-                        'date': date,
-                        'profit': profit,
-                        'win': 1 if is_win else 0
-                    })
+    # [新增] 歷史每日結果 (S1, S2) -> [{'date', 'profit', 'win', 'count'}] (繪圖時才針對 Top 10 展開)
+    def build_history(key):
+        rows = daily[daily['Key'] == key]
+        return [{'date': pd.Timestamp(d), 'profit': p, 'win': w, 'count': c}
+                for d, p, w, c in zip(rows['Date'], rows['Profit'], rows['Wins'], rows['Count'])]
                         
     # --- 整理數據並匯出 CSV ---
     export_data = []
-    roi_map = {} # 用於今日預測的快速查找表
+    ci_rows = single_strategy_ci(df, days, W)
+    roi_map = {} # 用於今日預測的快速查找表 (組合整數 key -> ROI 或 ROI 下界)
     
-    for (s1, s2), stats in combo_stats.items():
+    for key, stats in combo_stats.items():
+        roi = (stats['profit'] / stats['count']) * 100
+        win_rate = (stats['wins'] / stats['count']) * 100
+        s1, s2 = pair_names(key)
+        row = {
+            '策略_A': s1,
+            '策略_B': s2,
+            'ROI': round(roi, 2),
+            '勝率': round(win_rate, 2),
+            '場次': stats['count'],
+            'ROI_下界': round(stats['roi_lo'], 2),
+            'ROI_上界': round(stats['roi_hi'], 2),
+            '勝率_下界': round(stats['wr_lo'], 2),
+            '勝率_上界': round(stats['wr_hi'], 2),
+        }
+        ci_rows.append({'類型': '串關', **row})
+        
         if stats['count'] >= 10: # 門檻：至少 10 場
-            roi = (stats['profit'] / stats['count']) * 100
-            win_rate = (stats['wins'] / stats['count']) * 100
-            
-            roi_map[(s1, s2)] = roi
-            
-            export_data.append({
-                '策略_A': s1,
-                '策略_B': s2,
-                'ROI': round(roi, 2),
-                '勝率': round(win_rate, 2),
-                '場次': stats['count']
-            })
+            roi_map[key] = stats['roi_lo'] if rank_by == 'lower' else roi
+            export_data.append(row)
+    
+    # 信賴區間報告：單場策略 + 所有組合 (不設場次門檻，由 ROI_下界 排序)
+    df_ci = pd.DataFrame(ci_rows)
+    if not df_ci.empty:
+        df_ci = df_ci[['類型', '策略_A', '策略_B', 'ROI', 'ROI_下界', 'ROI_上界', '勝率', '勝率_下界', '勝率_上界', '場次']]
+        df_ci.sort_values('ROI_下界', ascending=False).to_csv(CI_REPORT_FILE, index=False, encoding='utf-8-sig')
+        print(f"✅ Bootstrap 信賴區間報告已匯出: {CI_REPORT_FILE} ({N_BOOTSTRAP} 次重抽, {CI_LEVEL:.0%} 區間)")
             
     df_export = pd.DataFrame(export_data)
     if not df_export.empty:
         # 去重邏輯：雖然 key 已經 sorted，但為了保險起見再次過濾
         df_export = df_export[df_export['策略_A'] <= df_export['策略_B']]
-        df_export = df_export.sort_values('ROI', ascending=False)
+        df_export = df_export.sort_values('ROI_下界' if rank_by == 'lower' else 'ROI', ascending=False)
         
         csv_name = "Best_Strategy_Combos_Unique.csv"
         df_export.to_csv(csv_name, index=False, encoding='utf-8-sig')
@@ -328,6 +500,8 @@ def train_and_export_model(df):
         
         # [新增] 繪製儀表板
         print("📊 正在繪製 Top 10 串關策略儀表板...")
+        combo_history = {pair_names(key): build_history(key) for key in combo_stats
+                         if " + ".join(pair_names(key)) in top_10_names}
         plot_parlay_dashboard(combo_history, top_10_names)
             
     return roi_map
@@ -354,7 +528,7 @@ def find_latest_prediction():
     return pairs[0]
 
 def get_todays_bets(pred_file, odds_file):
-    """讀取今日注單並標記策略"""
+    """讀取今日注單並標記策略 (Strategies 為 bitmask)"""
     df_p = pd.read_csv(pred_file)
     df_o = pd.read_csv(odds_file)
     
@@ -372,39 +546,40 @@ def get_todays_bets(pred_file, odds_file):
         odd_h = float(match.iloc[0]['Odds_Home'])
         odd_a = float(match.iloc[0]['Odds_Away'])
         
-        # 主隊
-        bet_h = {'Team': h, 'Opp': a, 'Is_Home': True, 'Prob': prob_h, 'Odds': odd_h, 'EV': (prob_h * odd_h) - 1}
-        bet_h['Strategies'] = get_active_strategies(bet_h)
-        if bet_h['Strategies']: candidates.append(bet_h)
-            
-        # 客隊
-        bet_a = {'Team': a, 'Opp': h, 'Is_Home': False, 'Prob': prob_a, 'Odds': odd_a, 'EV': (prob_a * odd_a) - 1}
-        bet_a['Strategies'] = get_active_strategies(bet_a)
-        if bet_a['Strategies']: candidates.append(bet_a)
-            
-    return candidates
+        # 主隊 / 客隊
+        candidates.append({'Team': h, 'Opp': a, 'Is_Home': True, 'Prob': prob_h, 'Odds': odd_h, 'EV': (prob_h * odd_h) - 1})
+        candidates.append({'Team': a, 'Opp': h, 'Is_Home': False, 'Prob': prob_a, 'Odds': odd_a, 'EV': (prob_a * odd_a) - 1})
+    
+    # 一次標記所有注單，只保留至少符合一個策略的
+    masks = strategy_masks(pd.DataFrame(candidates))
+    for bet, mask in zip(candidates, masks):
+        bet['Strategies'] = int(mask)
+    return [bet for bet in candidates if bet['Strategies']]
 
 def generate_parlay_ranking(bets, roi_map):
     """基於歷史 ROI 生成今日排名"""
     print(f"\n🚀 正在生成今日串關排名...")
     
-    combs = list(combinations(bets, 2))
+    bits = [mask_bits(b['Strategies']) for b in bets]
+    combs = combinations(range(len(bets)), 2)
     ranked_parlays = []
     
-    for b1, b2 in combs:
+    for i, j in combs:
+        b1, b2 = bets[i], bets[j]
         if b1['Team'] == b2['Opp']: continue
         
         # 找出這組串關的所有策略組合，取最高 ROI 者
         best_roi = -999
-        best_combo_name = "一般組合"
+        best_key = None
         
-        for s1 in b1['Strategies']:
-            for s2 in b2['Strategies']:
-                key = tuple(sorted([s1, s2]))
+        for s1 in bits[i]:
+            for s2 in bits[j]:
+                key = pair_key(s1, s2)
                 roi = roi_map.get(key, -999)
                 if roi > best_roi:
                     best_roi = roi
-                    best_combo_name = f"{key[0]} + {key[1]}"
+                    best_key = key
+        best_combo_name = " + ".join(pair_names(best_key)) if best_key is not None else "一般組合"
         
         # 若完全沒對應到歷史策略，或 ROI < 0，則不推薦 (或給低分)
         if best_roi > 0:
@@ -431,10 +606,10 @@ def generate_parlay_ranking(bets, roi_map):
         return df_rank.sort_values('Max_ROI', ascending=False)
     return pd.DataFrame()
 
-def main():
+def main(rebuild=False, rank_by=RANK_BY):
     # 1. 訓練與匯出策略報表
     df_hist = load_and_process_history()
-    roi_map = train_and_export_model(df_hist)
+    roi_map = train_and_export_model(df_hist, rebuild=rebuild, rank_by=rank_by)
     
     if not roi_map:
         print("⚠️ 無法建立模型，請檢查歷史資料。")
@@ -471,8 +646,14 @@ def main():
         output_file = "Daily_Parlay_Recommendations.csv"
         df_save = df_rank.head(10).copy()
         df_save = df_save.rename(columns={'Grade': 'Type'})
+        df_save['Max_ROI'] = [round(v, 2) for v in df_save['Max_ROI']]   # 與策略組合報表的 ROI 相同精度
         df_save[['Type', 'Team_1', 'Team_2', 'Combined_Odds', 'Combined_EV', 'Strategy_Combo', 'Max_ROI']].to_csv(output_file, index=False, encoding='utf-8-sig')
         print(f"\n✅ 今日推薦已寫入 {output_file}")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="串關策略排名 (歷史策略組合 ROI + 今日推薦)")
+    parser.add_argument('--rebuild', action='store_true', help="完整重算策略組合 store，並與既有結果比對 (一致性檢查)")
+    parser.add_argument('--rank-by', choices=['roi', 'lower'], default=RANK_BY,
+                        help="組合排名依據：roi = 歷史 ROI；lower = bootstrap ROI 信賴區間下界 (今日推薦的 Max_ROI 也改用下界)")
+    args = parser.parse_args()
+    main(rebuild=args.rebuild, rank_by=args.rank_by)
@@ -2,16 +2,30 @@ import pandas as pd
 import numpy as np
 import os
 import glob
-from itertools import combinations
+import math
+import argparse
 import re
 import datetime
+import time
+from concurrent.futures import ProcessPoolExecutor
+from parlay_search import search_parlays, game_keys
 
 # ==========================================
 # 設定區
 # ==========================================
 PROB_GRID = [0.55, 0.60, 0.65]
 EV_GRID = [0.0, 0.05, 0.10]
+# 細格點 (100 x 100)：--grid fine
+FINE_PROB_GRID = [round(0.50 + 0.003 * i, 3) for i in range(100)]
+FINE_EV_GRID = [round(-0.05 + 0.003 * i, 3) for i in range(100)]
 MIN_TRAIN_GAMES = 50 
+MIN_GRID_BETS = 10     # 格點至少要有幾注才列入比較
+WALK_FORWARD_FILE = "v970_walk_forward_params.csv"
+GRIDS = {'coarse': (PROB_GRID, EV_GRID), 'fine': (FINE_PROB_GRID, FINE_EV_GRID)}
+BACKTEST_DAILY_FILE = "v970_backtest_daily.csv"
+BACKTEST_SUMMARY_FILE = "v970_backtest_summary.csv"
+N_JOBS = os.cpu_count() or 1
+PARLAY_LEGS = 2        # 幾串 1
 
 TEAM_MAP = {
     'PHO': 'PHO', 'PHX': 'PHO', 'BOS': 'BOS', 'MIL': 'MIL', 'DEN': 'DEN',
@@ -38,88 +52,179 @@ def load_data(hist_pred, hist_odds):
     df_p['Date'] = pd.to_datetime(df_p['date']).dt.strftime('%Y-%m-%d')
     df_o['Date'] = pd.to_datetime(df_o['Date']).dt.strftime('%Y-%m-%d')
 
-    odds_map = {}
+    # 主客場以賠率檔的 Home_Abbr / Away_Abbr 為準 (歷史預測檔沒有 Home 欄位)
+    odds_map, home_map = {}, {}
     for _, row in df_o.iterrows():
         d = row['Date']
         h = normalize_team(row['Home_Abbr'])
         a = normalize_team(row['Away_Abbr'])
         odds_map[f"{d}_{h}"] = row['Odds_Home']
         odds_map[f"{d}_{a}"] = row['Odds_Away']
+        home_map[f"{d}_{h}"] = True
+        home_map[f"{d}_{a}"] = False
 
-    merged = []
+    # 每場比賽展開成主客兩邊 (與 v980 load_merged_bets、當日 generate_today_ranking 相同)
+    merged, seen = [], set()
     for _, row in df_p.iterrows():
         d = row['Date']
         team = normalize_team(row['Team_Abbr']) if 'Team_Abbr' in row else normalize_team(row['Home'])
         opp = normalize_team(row['Opp_Abbr']) if 'Opp_Abbr' in row else normalize_team(row['Away'])
-        
-        is_home = False
-        if 'Home' in row and team == normalize_team(row['Home']): is_home = True
-        
         prob = row['Win_Prob'] if 'Win_Prob' in row else row['Home_Win_Prob']
-        if not is_home and 'Home_Win_Prob' in row: prob = 1.0 - row['Home_Win_Prob']
-        
-        odds = odds_map.get(f"{d}_{team}", 0.0)
-        
-        if odds > 1.0:
-            ev = (prob * odds) - 1
-            win = row['Win'] if 'Win' in row else 0
+        win = row['Win'] if 'Win' in row else 0
+        opp_win = 1 - win if 'Win' in row else 0
+
+        for side, other, p, w in [(team, opp, prob, win), (opp, team, 1.0 - prob, opp_win)]:
+            key = f"{d}_{side}"
+            odds = odds_map.get(key, 0.0)
+            if key in seen or not odds > 1.0: continue
+            seen.add(key)
             merged.append({
-                'Date': d, 'Team': team, 'Opp': opp, 'Prob': prob, 'Odds': odds, 'EV': ev, 'Win': win, 'Is_Home': is_home
+                'Date': d, 'Team': side, 'Opp': other, 'Prob': p, 'Odds': odds, 'EV': (p * odds) - 1, 'Win': w,
+                'Is_Home': home_map[key]
             })
-            
-    print(f"✅ 歷史數據配對成功: {len(merged)} 場")
+
+    print(f"✅ 歷史數據配對成功: {len(merged)} 注 (主客兩邊)")
     return pd.DataFrame(merged).sort_values('Date')
 
-def find_best_params_on_history(df_train):
-    if len(df_train) < MIN_TRAIN_GAMES: return (0.55, 0.0) 
+def threshold_histogram(df, prob_grid=PROB_GRID, ev_grid=EV_GRID):
+    """
+    (勝率格點 x EV 格點) 的注數 / 獲利直方圖
+    每注放在「不超過其勝率、EV 的最大格點」，低於最小格點的注單不計
+    """
+    prob = df['Prob'].to_numpy(dtype=float)
+    ev = df['EV'].to_numpy(dtype=float)
+    win = df['Win'].to_numpy(dtype=float)
+    profit = (df['Odds'].to_numpy(dtype=float) - 1) * win - (1 - win)
+
+    pi = np.searchsorted(prob_grid, prob, side='right') - 1
+    ei = np.searchsorted(ev_grid, ev, side='right') - 1
+    keep = (pi >= 0) & (ei >= 0)
+    cell = pi[keep] * len(ev_grid) + ei[keep]
+    shape = (len(prob_grid), len(ev_grid))
+    count = np.bincount(cell, minlength=shape[0] * shape[1]).reshape(shape)
+    total = np.bincount(cell, weights=profit[keep], minlength=shape[0] * shape[1]).reshape(shape)
+    return count, total
 
-    best_roi = -999
-    best_params = (0.55, 0.0)
+def best_params_from_histogram(count, total, prob_grid=PROB_GRID, ev_grid=EV_GRID):
+    """
+    兩軸反向累加 => 每個 (p, e) 格點上 Prob >= p 且 EV >= e 的注數與總獲利
+    回傳 ROI 最高的 (p, e, roi, 注數)；同 ROI 取格點順序較前者 (與逐格搜尋相同)
+    """
+    n = count[::-1, ::-1].cumsum(axis=0).cumsum(axis=1)[::-1, ::-1]
+    profit = total[::-1, ::-1].cumsum(axis=0).cumsum(axis=1)[::-1, ::-1]
+    roi = np.where(n >= MIN_GRID_BETS, profit / np.maximum(n, 1) * 100, -np.inf)
+    if not np.isfinite(roi).any():
+        return prob_grid[0], ev_grid[0], None, 0
+    i, j = np.unravel_index(np.argmax(roi), roi.shape)
+    return prob_grid[i], ev_grid[j], float(roi[i, j]), int(n[i, j])
 
-    for p in PROB_GRID:
-        for e in EV_GRID:
-            candidates = df_train[(df_train['Prob'] >= p) & (df_train['EV'] >= e)]
-            if len(candidates) < 10: continue
+def find_best_params_on_history(df_train, prob_grid=PROB_GRID, ev_grid=EV_GRID):
+    if len(df_train) < MIN_TRAIN_GAMES: return (0.55, 0.0) 
+
+    count, total = threshold_histogram(df_train, prob_grid, ev_grid)
+    p, e, roi, _ = best_params_from_histogram(count, total, prob_grid, ev_grid)
+    if roi is None: return (0.55, 0.0)
+    return (p, e)
 
-            profit = (candidates['Odds'] - 1) * candidates['Win'] - (1 - candidates['Win'])
-            roi = profit.mean() * 100
+def walk_forward_params(df_history, prob_grid=PROB_GRID, ev_grid=EV_GRID):
+    """
+    真正的 walk-forward：每個比賽日只用該日之前的歷史選參數
+    直方圖逐日累加，每日只需一次 (格點數) 的反向累加
+    """
+    shape = (len(prob_grid), len(ev_grid))
+    count, total = np.zeros(shape, dtype=np.int64), np.zeros(shape)
+    n_seen = 0
+    rows = []
+    for date, day in df_history.groupby('Date', sort=True):
+        p, e, roi, n = (0.55, 0.0, None, 0)
+        if n_seen >= MIN_TRAIN_GAMES:
+            p, e, roi, n = best_params_from_histogram(count, total, prob_grid, ev_grid)
+            if roi is None: p, e = (0.55, 0.0)
+        rows.append({'Date': date, 'Opt_Prob': p, 'Opt_EV': e, 'Train_ROI': roi, 'Train_Bets': n, 'Train_Games': n_seen})
 
-            if roi > best_roi:
-                best_roi = roi
-                best_params = (p, e)
-    return best_params
+        day_count, day_total = threshold_histogram(day, prob_grid, ev_grid)
+        count += day_count
+        total += day_total
+        n_seen += len(day)
+    return pd.DataFrame(rows)
 
-def get_parlay_combinations(candidates, strategy_name, top_n=1):
-    if len(candidates) < 2: return []
+def get_parlay_combinations(candidates, strategy_name, top_n=1, n_legs=PARLAY_LEGS):
+    if len(candidates) < n_legs: return []
     
-    combs = list(combinations(pd.DataFrame(candidates).iterrows(), 2))
+    # N 串 1 搜尋 (同場比賽不能串)，依串關 EV 取前 top_n 名
+    games = game_keys([c['Team'] for c in candidates], [c['Opp'] for c in candidates])
+    best = search_parlays([c['Prob'] for c in candidates], [c['Odds'] for c in candidates], games,
+                          n_legs=n_legs, top_k=top_n)
     parlays = []
     
-    for _, (i, r1), (j, r2) in [(0, *c) for c in combs]:
-        if r1['Team'] == r2['Opp']: continue 
-        
-        comb_odds = r1['Odds'] * r2['Odds']
-        comb_prob = r1['Prob'] * r2['Prob']
+    for score, combo in best:
+        legs = [candidates[i] for i in combo]
+        comb_odds = math.prod(r['Odds'] for r in legs)
+        comb_prob = math.prod(r['Prob'] for r in legs)
         comb_ev = (comb_prob * comb_odds) - 1
         
-        parlays.append({
-            'Type': strategy_name,
-            'Team_1': r1['Team'], 
-            'Team_2': r2['Team'],
+        parlay = {'Type': strategy_name}
+        for k, r in enumerate(legs, 1):
+            parlay[f'Team_{k}'] = r['Team']
+        parlay.update({
             'Combined_Odds': round(comb_odds, 2),
             'Combined_EV': round(comb_ev, 2),
-            'Score': comb_ev 
+            'Score': score
         })
+        parlays.append(parlay)
         
-    parlays.sort(key=lambda x: x['Score'], reverse=True)
-    return parlays[:top_n]
+    return parlays
+
+def strategy_parlays(today_games, opt_prob, opt_ev, n_legs=PARLAY_LEGS):
+    """10 大策略：依各自條件篩選當日注單，再各取分數最高的串關 (AI 動態黃金使用 opt_prob / opt_ev)"""
+    # 1. 👑 AI 動態黃金
+    cand_ai = [g for g in today_games if g['Prob'] >= opt_prob and g['EV'] >= opt_ev]
+    
+    # 2. 🟢 基礎
+    cand_base = [g for g in today_games if g['EV'] > 0]
+    
+    # 3. 🛡️ 穩健保本
+    cand_safe = [g for g in today_games if g['Prob'] > 0.65]
+    
+    # 4. 🛡️ 穩健過濾
+    cand_smart = [g for g in today_games if g['Prob'] > 0.60 and g['Odds'] > 1.3]
+    
+    # 5. 🏹 狙擊冷門
+    cand_underdog = [g for g in today_games if g['Odds'] >= 1.75 and g['EV'] >= 0.05]
+    
+    # 6. ⚖️ 平衡型
+    cand_balance = [g for g in today_games if g['Prob'] > 0.55 and g['Odds'] > 1.6]
+    
+    # 7. 🏠 主場優勢
+    cand_home = [g for g in today_games if g['Is_Home'] and g['Prob'] > 0.60]
+    
+    # 8. 🛣️ 客場殺手
+    cand_road = [g for g in today_games if not g['Is_Home'] and g['EV'] > 0.05]
+    
+    # 9. 💎 極高價值
+    cand_value = [g for g in today_games if g['EV'] > 0.15]
+    
+    # 10. 🎯 精準打擊
+    cand_precise = [g for g in today_games if g['Prob'] > 0.65 and g['EV'] > 0.05]
+
+    # 組合所有策略的結果 (每個策略取 Top 1-2)
+    all_recs = []
+    all_recs.extend(get_parlay_combinations(cand_ai, "👑 AI動態黃金", 2, n_legs))
+    all_recs.extend(get_parlay_combinations(cand_balance, "⚖️ 平衡型", 2, n_legs)) # 冠軍多取一點
+    all_recs.extend(get_parlay_combinations(cand_smart, "🛡️ 穩健過濾", 1, n_legs))
+    all_recs.extend(get_parlay_combinations(cand_precise, "🎯 精準打擊", 1, n_legs))
+    all_recs.extend(get_parlay_combinations(cand_home, "🏠 主場優勢", 1, n_legs))
+    all_recs.extend(get_parlay_combinations(cand_underdog, "🏹 狙擊冷門", 1, n_legs))
+    all_recs.extend(get_parlay_combinations(cand_road, "🛣️ 客場殺手", 1, n_legs))
+    # 其他策略 (基礎、極高價值、保本) 通常會被上面涵蓋，如果不夠再加
+    return all_recs
 
-def save_empty_result():
+def save_empty_result(n_legs=PARLAY_LEGS):
     """當無推薦時，儲存一個帶有標題的空檔，避免 Dashboard 報錯"""
-    pd.DataFrame(columns=['Type', 'Team_1', 'Team_2', 'Combined_Odds', 'Combined_EV']).to_csv("Daily_Parlay_Recommendations.csv", index=False, encoding='utf-8-sig')
+    pd.DataFrame(columns=['Type'] + [f'Team_{k}' for k in range(1, n_legs + 1)] + ['Combined_Odds', 'Combined_EV']).to_csv("Daily_Parlay_Recommendations.csv", index=False, encoding='utf-8-sig')
     print("⚠️ 已生成空的推薦檔 (今日無符合條件的比賽)")
 
-def generate_today_ranking(target_date, pred_file, master_odds_file, df_history):
+def generate_today_ranking(target_date, pred_file, master_odds_file, df_history, n_legs=PARLAY_LEGS, grid='coarse'):
     print(f"\n🚀 正在生成今日 ({target_date}) 的全策略推薦...")
     
     df_p = pd.read_csv(pred_file)
@@ -129,7 +234,7 @@ def generate_today_ranking(target_date, pred_file, master_odds_file, df_history)
     df_today_odds = df_o[df_o['Date'] == target_date]
     if df_today_odds.empty:
         print(f"⚠️ 在主賠率檔中找不到今日 ({target_date}) 的賠率。")
-        save_empty_result()
+        save_empty_result(n_legs)
         return
 
     today_games = []
@@ -151,60 +256,22 @@ def generate_today_ranking(target_date, pred_file, master_odds_file, df_history)
         today_games.append({'Team': h, 'Opp': a, 'Prob': ph, 'Odds': oh, 'EV': (ph*oh)-1, 'Is_Home': True})
         today_games.append({'Team': a, 'Opp': h, 'Prob': pa, 'Odds': oa, 'EV': (pa*oa)-1, 'Is_Home': False})
     
-    if len(today_games) < 2:
+    if len(today_games) < n_legs:
         print("⚠️ 今日有效場次不足，無法串關。")
-        save_empty_result()
+        save_empty_result(n_legs)
         return
 
     # === 10大策略執行區 ===
     valid_history = df_history[df_history['Date'] < target_date]
-    opt_prob, opt_ev = find_best_params_on_history(valid_history)
+    opt_prob, opt_ev = find_best_params_on_history(valid_history, *GRIDS[grid])
     print(f"   🎯 AI 建議參數: 勝率 > {opt_prob:.2f}, EV > {opt_ev:.2f}")
     
-    # 1. 👑 AI 動態黃金
-    cand_ai = [g for g in today_games if g['Prob'] >= opt_prob and g['EV'] >= opt_ev]
-    
-    # 2. 🟢 基礎
-    cand_base = [g for g in today_games if g['EV'] > 0]
-    
-    # 3. 🛡️ 穩健保本
-    cand_safe = [g for g in today_games if g['Prob'] > 0.65]
-    
-    # 4. 🛡️ 穩健過濾
-    cand_smart = [g for g in today_games if g['Prob'] > 0.60 and g['Odds'] > 1.3]
-    
-    # 5. 🏹 狙擊冷門
-    cand_underdog = [g for g in today_games if g['Odds'] >= 1.75 and g['EV'] >= 0.05]
-    
-    # 6. ⚖️ 平衡型
-    cand_balance = [g for g in today_games if g['Prob'] > 0.55 and g['Odds'] > 1.6]
-    
-    # 7. 🏠 主場優勢
-    cand_home = [g for g in today_games if g['Is_Home'] and g['Prob'] > 0.60]
-    
-    # 8. 🛣️ 客場殺手
-    cand_road = [g for g in today_games if not g['Is_Home'] and g['EV'] > 0.05]
-    
-    # 9. 💎 極高價值
-    cand_value = [g for g in today_games if g['EV'] > 0.15]
-    
-    # 10. 🎯 精準打擊
-    cand_precise = [g for g in today_games if g['Prob'] > 0.65 and g['EV'] > 0.05]
-
     # 組合所有策略的結果 (每個策略取 Top 1-2)
-    all_recs = []
-    all_recs.extend(get_parlay_combinations(cand_ai, "👑 AI動態黃金", 2))
-    all_recs.extend(get_parlay_combinations(cand_balance, "⚖️ 平衡型", 2)) # 冠軍多取一點
-    all_recs.extend(get_parlay_combinations(cand_smart, "🛡️ 穩健過濾", 1))
-    all_recs.extend(get_parlay_combinations(cand_precise, "🎯 精準打擊", 1))
-    all_recs.extend(get_parlay_combinations(cand_home, "🏠 主場優勢", 1))
-    all_recs.extend(get_parlay_combinations(cand_underdog, "🏹 狙擊冷門", 1))
-    all_recs.extend(get_parlay_combinations(cand_road, "🛣️ 客場殺手", 1))
-    # 其他策略 (基礎、極高價值、保本) 通常會被上面涵蓋，如果不夠再加
+    all_recs = strategy_parlays(today_games, opt_prob, opt_ev, n_legs)
 
     if not all_recs:
         print("⚠️ 經過策略篩選後，今日無推薦組合。")
-        save_empty_result()
+        save_empty_result(n_legs)
         return
 
     # 去重：如果重複，保留優先級最高的標籤
@@ -218,7 +285,7 @@ def generate_today_ranking(target_date, pred_file, master_odds_file, df_history)
     
     unique_recs = {}
     for rec in all_recs:
-        teams = tuple(sorted([rec['Team_1'], rec['Team_2']]))
+        teams = tuple(sorted(rec[f'Team_{k}'] for k in range(1, n_legs + 1)))
         current_prio = priority.get(rec['Type'], 0)
         
         if teams not in unique_recs:
@@ -239,18 +306,112 @@ def generate_today_ranking(target_date, pred_file, master_odds_file, df_history)
     print("-" * 75)
     
     for _, r in df_rank.iterrows():
-        print(f"{r['Type']:<15} | {r['Team_1']}+{r['Team_2']:<10} | {r['Combined_Odds']:.2f}   | {r['Combined_EV']:+.2f}")
+        combo = "+".join(r[f'Team_{k}'] for k in range(1, n_legs + 1))
+        print(f"{r['Type']:<15} | {combo:<14} | {r['Combined_Odds']:.2f}   | {r['Combined_EV']:+.2f}")
         
     df_rank.to_csv("Daily_Parlay_Recommendations.csv", index=False, encoding='utf-8-sig')
     print("\n✅ 結果已儲存: Daily_Parlay_Recommendations.csv")
 
-def main():
+# ==========================================
+# 回測：逐日重播所有策略 (AI 參數只用當日之前的歷史)
+# ==========================================
+def grade_parlay(parlay, games_by_team, n_legs=PARLAY_LEGS):
+    """以實際賽果結算 1 單位串關：全部過關獲利 賠率 - 1，否則 -1"""
+    legs = [games_by_team[parlay[f'Team_{k}']] for k in range(1, n_legs + 1)]
+    won = all(g['Win'] == 1 for g in legs)
+    return won, (math.prod(g['Odds'] for g in legs) - 1) if won else -1.0
+
+def _backtest_chunk(task):
+    """一段連續日期的回測 (在子進程執行)：days = [(date, 當日注單, opt_prob, opt_ev)]"""
+    days, n_legs = task
+    rows = []
+    for date, today_games, opt_prob, opt_ev in days:
+        by_team = {g['Team']: g for g in today_games}
+        for rec in strategy_parlays(today_games, opt_prob, opt_ev, n_legs):
+            won, profit = grade_parlay(rec, by_team, n_legs)
+            rows.append({'Date': date, 'Strategy': rec['Type'], 'Bets': 1, 'Wins': int(won), 'Profit': profit})
+    return rows
+
+def backtest(df_full, n_legs=PARLAY_LEGS, grid='coarse', n_jobs=N_JOBS):
+    """
+    每個歷史比賽日：以之前的資料選 AI 參數 (walk_forward_params，與逐日呼叫 find_best_params_on_history 相同)，
+    產生當日各策略串關並結算；日期切成多段交給進程池
+    回傳 (每日 x 策略損益, 策略彙總)
+    """
+    params = walk_forward_params(df_full, *GRIDS[grid]).set_index('Date')
+    cols = ['Team', 'Opp', 'Prob', 'Odds', 'EV', 'Is_Home', 'Win']
+    days = [(date, day[cols].to_dict('records'), params.at[date, 'Opt_Prob'], params.at[date, 'Opt_EV'])
+            for date, day in df_full.groupby('Date', sort=True)]
+
+    # 依日期切成連續的幾段 (每個進程約 4 段)
+    n_chunks = min(len(days), max(1, n_jobs) * 4)
+    size = -(-len(days) // n_chunks) if days else 1
+    tasks = [(days[i:i + size], n_legs) for i in range(0, len(days), size)]
+    if n_jobs > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            outputs = list(pool.map(_backtest_chunk, tasks))
+    else:
+        outputs = [_backtest_chunk(t) for t in tasks]
+
+    rows = [r for out in outputs for r in out]
+    if not rows:
+        return pd.DataFrame(columns=['Date', 'Strategy', 'Bets', 'Wins', 'Profit', 'Cum_Profit']), pd.DataFrame()
+
+    # 沒有下注的日子補 0，累積損益才能逐日對齊
+    daily = pd.DataFrame(rows).groupby(['Date', 'Strategy'], sort=True)[['Bets', 'Wins', 'Profit']].sum()
+    full_index = pd.MultiIndex.from_product([[d for d, *_ in days], daily.index.get_level_values('Strategy').unique()],
+                                            names=['Date', 'Strategy'])
+    daily = daily.reindex(full_index, fill_value=0).reset_index().sort_values(['Strategy', 'Date'])
+    daily['Cum_Profit'] = daily.groupby('Strategy')['Profit'].cumsum()
+    drawdown = daily.groupby('Strategy')['Cum_Profit'].cummax().clip(lower=0) - daily['Cum_Profit']
+
+    summary = daily.assign(Drawdown=drawdown).groupby('Strategy').agg(
+        Days_Bet=('Bets', lambda b: int((b > 0).sum())),
+        Bets=('Bets', 'sum'),
+        Wins=('Wins', 'sum'),
+        Profit=('Profit', 'sum'),
+        Max_Drawdown=('Drawdown', 'max'),
+    )
+    summary['Win_Rate'] = summary['Wins'] / summary['Bets'].clip(lower=1) * 100
+    summary['ROI'] = summary['Profit'] / summary['Bets'].clip(lower=1) * 100
+    summary = summary.sort_values('ROI', ascending=False).reset_index()
+    return daily.sort_values(['Date', 'Strategy']).reset_index(drop=True), summary
+
+def run_backtest(df_full, n_legs=PARLAY_LEGS, grid='coarse', n_jobs=N_JOBS):
+    t0 = time.perf_counter()
+    daily, summary = backtest(df_full, n_legs, grid, n_jobs)
+    print(f"\n📈 全季回測 ({daily['Date'].nunique()} 天, {n_legs} 串 1, 格點 {grid}, workers={n_jobs}, {time.perf_counter() - t0:.2f}s)")
+    print("-" * 90)
+    print(f"{'策略':<15} | {'天數':>4} | {'注數':>4} | {'勝率':>6} | {'獲利':>8} | {'ROI':>7} | {'最大回撤':>8}")
+    print("-" * 90)
+    for _, r in summary.iterrows():
+        print(f"{r['Strategy']:<15} | {r['Days_Bet']:>4} | {r['Bets']:>4} | {r['Win_Rate']:>5.1f}% | "
+              f"{r['Profit']:>+8.2f} | {r['ROI']:>+6.1f}% | {r['Max_Drawdown']:>8.2f}")
+    daily.to_csv(BACKTEST_DAILY_FILE, index=False, encoding='utf-8-sig')
+    summary.to_csv(BACKTEST_SUMMARY_FILE, index=False, encoding='utf-8-sig')
+    print(f"✅ 每日損益: {BACKTEST_DAILY_FILE} | 策略彙總: {BACKTEST_SUMMARY_FILE}")
+
+def run_walk_forward(df_full, grid='coarse'):
+    """逐日輸出 walk-forward 參數 (每日只用之前的歷史)"""
+    prob_grid, ev_grid = GRIDS[grid]
+    t0 = time.perf_counter()
+    wf = walk_forward_params(df_full, prob_grid, ev_grid)
+    print(f"🔁 Walk-forward 參數搜尋: {len(wf)} 天 x {len(prob_grid)}x{len(ev_grid)} 格點 ({time.perf_counter() - t0:.2f}s)")
+    print(wf.tail(5).to_string(index=False))
+    wf.to_csv(WALK_FORWARD_FILE, index=False, encoding='utf-8-sig')
+    print(f"✅ 已儲存: {WALK_FORWARD_FILE}")
+
+def main(n_legs=PARLAY_LEGS, grid='coarse', walk_forward=False, run_bt=False, n_jobs=N_JOBS):
     hist_pred = "predictions_2026_full_report.csv"
     hist_odds = "odds_2026_full_season.csv"
     
     if os.path.exists(hist_pred) and os.path.exists(hist_odds):
         df_full = load_data(hist_pred, hist_odds)
-        if df_full is not None and not df_full.empty:
+        if df_full is not None and walk_forward:
+            run_walk_forward(df_full, grid)
+        elif df_full is not None and run_bt:
+            run_backtest(df_full, n_legs, grid, n_jobs)
+        elif df_full is not None and not df_full.empty:
             
             pred_path_pattern = os.path.join("predictions", "predictions_*.csv")
             files = glob.glob(pred_path_pattern)
@@ -262,7 +423,7 @@ def main():
                 match = re.search(r"predictions_(\d{4}-\d{2}-\d{2})\.csv", today_pred)
                 if match:
                     date_str = match.group(1)
-                    generate_today_ranking(date_str, today_pred, hist_odds, df_full)
+                    generate_today_ranking(date_str, today_pred, hist_odds, df_full, n_legs, grid)
                 else:
                     print(f"❌ 無法從檔名解析日期: {today_pred}")
             else:
@@ -271,4 +432,11 @@ def main():
         print("⚠️ 缺少歷史數據檔")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="滾動式串關策略優化器 (全策略推薦)")
+    parser.add_argument('--legs', type=int, default=PARLAY_LEGS, help="幾串 1 (預設 2)")
+    parser.add_argument('--grid', choices=list(GRIDS), default='coarse', help="參數格點 (coarse 3x3 / fine 100x100)")
+    parser.add_argument('--walk-forward', action='store_true', help="對每個歷史比賽日做 walk-forward 參數搜尋並存檔")
+    parser.add_argument('--backtest', action='store_true', help="逐日回測全季所有策略 (輸出每日損益)")
+    parser.add_argument('--jobs', type=int, default=N_JOBS, help="回測平行進程數")
+    args = parser.parse_args()
+    main(n_legs=args.legs, grid=args.grid, walk_forward=args.walk_forward, run_bt=args.backtest, n_jobs=args.jobs)
\ No newline at end of file
@@ -29,6 +29,65 @@ plt.rcParams['font.size'] = 12
 # ==========================================
 # 2. 核心邏輯：載入數據、模擬策略、匯出報告
 # ==========================================
+PRED_FILE = "predictions_2026_full_report.csv"
+ODDS_FILE = "odds_2026_full_season.csv"
+
+def load_merged_bets(pred_file=PRED_FILE, odds_file=ODDS_FILE):
+    """
+    讀取預測與賠率檔案，展開成每隊一列的注單 (含 Prob, Odds, EV, Win)
+    找不到檔案時回傳空的 DataFrame
+    """
+    if not os.path.exists(pred_file) or not os.path.exists(odds_file):
+        print(f"❌ 錯誤：找不到 {pred_file} 或 {odds_file}")
+        return pd.DataFrame()
+
+    df_pred = pd.read_csv(pred_file)
+    df_o = pd.read_csv(odds_file)
+
+    df_pred['date'] = pd.to_datetime(df_pred['date'])
+    
+    if 'date' in df_o.columns and 'Date' not in df_o.columns:
+         df_o = df_o.rename(columns={'date': 'Date'})
+    df_o['Date'] = pd.to_datetime(df_o['Date'])
+
+    # --- 數據整併 ---
+    odds_home = df_o[['Date', 'Home_Abbr', 'Odds_Home']].rename(columns={'Home_Abbr': 'Team', 'Odds_Home': 'Odds'})
+    odds_home['Is_Home'] = True
+    odds_away = df_o[['Date', 'Away_Abbr', 'Odds_Away']].rename(columns={'Away_Abbr': 'Team', 'Odds_Away': 'Odds'})
+    odds_away['Is_Home'] = False
+    odds_long = pd.concat([odds_home, odds_away])
+    
+    df_home = df_pred.copy()
+    df_home['Team'] = df_home['Team_Abbr']
+    df_home['Is_Home'] = True
+    df_home['Prob'] = df_home['Win_Prob']
+    
+    df_away = df_pred.copy()
+    df_away['Team'] = df_away['Opp_Abbr']
+    df_away['Is_Home'] = False
+    df_away['Prob'] = 1.0 - df_away['Win_Prob']
+    df_away['Win'] = 1 - df_away['Win']
+    
+    full_df = pd.concat([df_home, df_away], ignore_index=True)
+    merged = pd.merge(full_df, odds_long, left_on=['date', 'Team', 'Is_Home'], right_on=['Date', 'Team', 'Is_Home'], how='inner')
+    merged['EV'] = (merged['Prob'] * merged['Odds']) - 1
+    return merged
+
+def strategy_frames(merged):
+    """策略名稱 -> 符合該策略的注單 (名稱與 Strategy_Performance_Report.csv 相同)"""
+    return {
+        '🛡️ 穩健過濾 (Prob>60%, Odds>1.3)': merged[(merged['Prob'] > 0.60) & (merged['Odds'] > 1.3)].copy(),
+        '🏰 鐵桶防禦 (Prob>75%)': merged[merged['Prob'] > 0.75].copy(),
+        '🛡️ 穩健保本 (Prob>65%)': merged[merged['Prob'] > 0.65].copy(),
+        '🎯 精準打擊 (Prob>65%, EV>5%)': merged[(merged['Prob'] > 0.65) & (merged['EV'] > 0.05)].copy(),
+        '💎 極高價值 (EV>15%)': merged[merged['EV'] > 0.15].copy(),
+        '⚖️ 平衡型 (Prob>55%, Odds>1.6)': merged[(merged['Prob'] > 0.55) & (merged['Odds'] > 1.6)].copy(),
+        '🏠 主場優勢 (Home, Prob>60%)': merged[(merged['Is_Home'] == True) & (merged['Prob'] > 0.60)].copy(),
+        '🛣️ 客場殺手 (Away, EV>5%)': merged[(merged['Is_Home'] == False) & (merged['EV'] > 0.05)].copy(),
+        '🟢 基礎 (EV>0)': merged[merged['EV'] > 0].copy(),
+        '🏹 狙擊冷門 (Odds>1.75, EV>5%)': merged[(merged['Odds'] >= 1.75) & (merged['EV'] > 0.05)].copy(),
+    }
+
 def load_and_simulate():
     """
     讀取預測與賠率檔案，模擬各策略損益，並匯出 CSV 報告。
@@ -36,58 +95,13 @@ def load_and_simulate():
     print("⏳ 正在讀取數據並進行模擬...")
     
     try:
-        # --- A. 讀取檔案 ---
-        pred_file = "predictions_2026_full_report.csv"
-        odds_file = "odds_2026_full_season.csv"
-        
-        if not os.path.exists(pred_file) or not os.path.exists(odds_file):
-            print(f"❌ 錯誤：找不到 {pred_file} 或 {odds_file}")
+        # --- A/B. 讀取檔案並整併 ---
+        merged = load_merged_bets()
+        if merged.empty:
             return {}
-
-        df_pred = pd.read_csv(pred_file)
-        df_o = pd.read_csv(odds_file)
-
-        df_pred['date'] = pd.to_datetime(df_pred['date'])
-        
-        if 'date' in df_o.columns and 'Date' not in df_o.columns:
-             df_o = df_o.rename(columns={'date': 'Date'})
-        df_o['Date'] = pd.to_datetime(df_o['Date'])
-
-        # --- B. 數據整併 ---
-        odds_home = df_o[['Date', 'Home_Abbr', 'Odds_Home']].rename(columns={'Home_Abbr': 'Team', 'Odds_Home': 'Odds'})
-        odds_home['Is_Home'] = True
-        odds_away = df_o[['Date', 'Away_Abbr', 'Odds_Away']].rename(columns={'Away_Abbr': 'Team', 'Odds_Away': 'Odds'})
-        odds_away['Is_Home'] = False
-        odds_long = pd.concat([odds_home, odds_away])
-        
-        df_home = df_pred.copy()
-        df_home['Team'] = df_home['Team_Abbr']
-        df_home['Is_Home'] = True
-        df_home['Prob'] = df_home['Win_Prob']
-        
-        df_away = df_pred.copy()
-        df_away['Team'] = df_away['Opp_Abbr']
-        df_away['Is_Home'] = False
-        df_away['Prob'] = 1.0 - df_away['Win_Prob']
-        df_away['Win'] = 1 - df_away['Win']
-        
-        full_df = pd.concat([df_home, df_away], ignore_index=True)
-        merged = pd.merge(full_df, odds_long, left_on=['date', 'Team', 'Is_Home'], right_on=['Date', 'Team', 'Is_Home'], how='inner')
-        merged['EV'] = (merged['Prob'] * merged['Odds']) - 1
         
         # --- C. 定義策略 ---
-        strategies = {
-            '🛡️ 穩健過濾 (Prob>60%, Odds>1.3)': merged[(merged['Prob'] > 0.60) & (merged['Odds'] > 1.3)].copy(),
-            '🏰 鐵桶防禦 (Prob>75%)': merged[merged['Prob'] > 0.75].copy(),
-            '🛡️ 穩健保本 (Prob>65%)': merged[merged['Prob'] > 0.65].copy(),
-            '🎯 精準打擊 (Prob>65%, EV>5%)': merged[(merged['Prob'] > 0.65) & (merged['EV'] > 0.05)].copy(),
-            '💎 極高價值 (EV>15%)': merged[merged['EV'] > 0.15].copy(),
-            '⚖️ 平衡型 (Prob>55%, Odds>1.6)': merged[(merged['Prob'] > 0.55) & (merged['Odds'] > 1.6)].copy(),
-            '🏠 主場優勢 (Home, Prob>60%)': merged[(merged['Is_Home'] == True) & (merged['Prob'] > 0.60)].copy(),
-            '🛣️ 客場殺手 (Away, EV>5%)': merged[(merged['Is_Home'] == False) & (merged['EV'] > 0.05)].copy(),
-            '🟢 基礎 (EV>0)': merged[merged['EV'] > 0].copy(),
-            '🏹 狙擊冷門 (Odds>1.75, EV>5%)': merged[(merged['Odds'] >= 1.75) & (merged['EV'] > 0.05)].copy(),
-        }
+        strategies = strategy_frames(merged)
 
         results = {}
         report_data = []
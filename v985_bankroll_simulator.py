@@ -0,0 +1,211 @@
+import pandas as pd
+import numpy as np
+import os
+import time
+import argparse
+from v980_strategy_visualizer import load_merged_bets, strategy_frames
+from v960_parlay_ranking_master import STRATEGY_NAMES, strategy_matrix, daily_bet_pairs
+
+# ==========================================
+# 設定區
+# ==========================================
+STRATEGY_REPORT_FILE = "Strategy_Performance_Report.csv"
+COMBO_REPORT_FILE = "Best_Strategy_Combos_Unique.csv"
+OUTPUT_FILE = "Bankroll_Simulation_Report.csv"
+
+N_PATHS = 100000        # 模擬的賽季路徑數
+CHUNK_PATHS = 5000      # 每批處理的路徑數 (限制記憶體：批次 x 注單數 x 腿數)
+BANKROLL_UNITS = 50.0   # 起始本金 (單位)，每注固定 1 單位；累積虧損達到本金即視為破產
+TOP_COMBOS = 5          # 另外模擬 Best_Strategy_Combos_Unique.csv 前 N 名串關組合
+RANDOM_SEED = 42
+QUANTILES = [0.05, 0.25, 0.50, 0.75, 0.95]
+
+# ==========================================
+# 1. 注單整理：每注由 1~N 腿組成，每腿對應一場比賽的某一邊
+# ==========================================
+def game_sides(df):
+    """
+    每筆注單對應的 (日期, 比賽) key 與是否為「代表隊」(兩隊中名稱較小者)
+    同一場比賽的兩邊共用一個亂數：代表隊贏 = u < p，另一邊贏 = u >= 1 - p
+    """
+    team = df['Team'].to_numpy(dtype=str)
+    opp = np.where(team == df['Team_Abbr'].to_numpy(dtype=str), df['Opp_Abbr'].to_numpy(dtype=str), df['Team_Abbr'].to_numpy(dtype=str))
+    dates = df['date'].dt.strftime('%Y-%m-%d').to_numpy()
+    keys = [f"{d}_{min(t, o)}_{max(t, o)}" for d, t, o in zip(dates, team, opp)]
+    return keys, team < opp
+
+def single_bets(df, game_index, day_index):
+    """單場注單 -> 模擬用陣列 (腿數 = 1)"""
+    keys, canon = game_sides(df)
+    win = df['Win'].to_numpy() == 1
+    odds = df['Odds'].to_numpy(dtype=float)
+    return {
+        'game': np.array([game_index[k] for k in keys], dtype=np.int64)[:, None],
+        'canon': canon[:, None],
+        'prob': df['Prob'].to_numpy(dtype=float)[:, None],
+        'odds': odds,
+        'day': df['date'].map(day_index).to_numpy(dtype=np.int64),
+        'profit': np.where(win, odds - 1, -1.0),
+    }
+
+def parlay_bets(df, a, b, game_index, day_index):
+    """
+    兩串一組合 (策略 a + 策略 b)：當日任兩注 (不同場) 一注符合 a、另一注符合 b
+    每組注單只算一次 (與 v960 的逐策略歸因不同，這裡模擬的是實際下注)
+    """
+    keys, canon = game_sides(df)
+    df = df.reset_index(drop=True).assign(Game_ID=keys)
+    S = strategy_matrix(df)
+    pi, pj = daily_bet_pairs(df)
+    keep = (S[pi, a] & S[pj, b]) | (S[pi, b] & S[pj, a])
+    pi, pj = pi[keep], pj[keep]
+
+    game = np.array([game_index[k] for k in keys], dtype=np.int64)
+    win = df['Win'].to_numpy() == 1
+    prob = df['Prob'].to_numpy(dtype=float)
+    odds = df['Odds'].to_numpy(dtype=float)
+    comb_odds = odds[pi] * odds[pj]
+    return {
+        'game': np.column_stack([game[pi], game[pj]]),
+        'canon': np.column_stack([canon[pi], canon[pj]]),
+        'prob': np.column_stack([prob[pi], prob[pj]]),
+        'odds': comb_odds,
+        'day': df['date'].map(day_index).to_numpy(dtype=np.int64)[pi],
+        'profit': np.where(win[pi] & win[pj], comb_odds - 1, -1.0),
+    }
+
+# ==========================================
+# 2. 路徑模擬 (整批 numpy 運算，依 CHUNK_PATHS 分批)
+# ==========================================
+def path_stats(daily, bankroll):
+    """
+    daily: (路徑數 x 天數) 每日損益
+    回傳 (期末損益, 最大回撤, 是否破產)；回撤以起始本金為第一個高點
+    """
+    cum = np.cumsum(daily, axis=1)
+    peak = np.maximum.accumulate(np.maximum(cum, 0.0), axis=1)
+    return cum[:, -1], (peak - cum).max(axis=1), cum.min(axis=1) <= -bankroll
+
+def simulate_model(bets, n_games, n_days, n_paths=N_PATHS, chunk=CHUNK_PATHS, bankroll=BANKROLL_UNITS, seed=RANDOM_SEED):
+    """
+    依模型機率重抽每場比賽的賽果 (每場一個亂數，同場兩邊完全相反、同場多注一致)
+    相同 seed 下各策略共用同一組賽果 (common random numbers)，策略間可直接比較
+    回傳 (期末損益, 最大回撤, 是否破產, 注單數) 各為長度 n_paths 的陣列
+    """
+    rng = np.random.default_rng(seed)
+    day_matrix = np.zeros((len(bets['odds']), n_days))
+    day_matrix[np.arange(len(bets['odds'])), bets['day']] = 1.0
+    win_profit = bets['odds'] - 1
+
+    final, dd, ruined = np.empty(n_paths), np.empty(n_paths), np.empty(n_paths, dtype=bool)
+    for start in range(0, n_paths, chunk):
+        m = min(chunk, n_paths - start)
+        u = rng.random((m, n_games))[:, bets['game']]                 # (m, 注單, 腿)
+        legs = np.where(bets['canon'], u < bets['prob'], u >= 1 - bets['prob'])
+        profit = np.where(legs.all(axis=2), win_profit, -1.0)        # (m, 注單)
+        final[start:start + m], dd[start:start + m], ruined[start:start + m] = path_stats(profit @ day_matrix, bankroll)
+    return final, dd, ruined, np.full(n_paths, len(bets['odds']))
+
+def simulate_bootstrap(bets, n_days, n_paths=N_PATHS, chunk=CHUNK_PATHS, bankroll=BANKROLL_UNITS, seed=RANDOM_SEED):
+    """
+    以實際結算結果逐日重抽 (有放回，天數 = 歷史天數)，保留同日注單之間的相關性
+    相同 seed 下各策略抽到同一組日期
+    """
+    rng = np.random.default_rng(seed)
+    day_profit = np.bincount(bets['day'], weights=bets['profit'], minlength=n_days)
+    day_count = np.bincount(bets['day'], minlength=n_days)
+
+    final, dd, ruined = np.empty(n_paths), np.empty(n_paths), np.empty(n_paths, dtype=bool)
+    count = np.empty(n_paths, dtype=np.int64)
+    for start in range(0, n_paths, chunk):
+        m = min(chunk, n_paths - start)
+        idx = rng.integers(0, n_days, (m, n_days))
+        final[start:start + m], dd[start:start + m], ruined[start:start + m] = path_stats(day_profit[idx], bankroll)
+        count[start:start + m] = day_count[idx].sum(axis=1)
+    return final, dd, ruined, count
+
+def summarize(name, kind, mode, bets, final, dd, ruined, count):
+    """單一策略的模擬結果摘要：ROI 分位數、最大回撤分位數、破產機率"""
+    roi = np.divide(final, count, out=np.full(len(final), np.nan), where=count > 0) * 100
+    row = {
+        'Strategy': name,
+        'Type': kind,
+        'Mode': mode,
+        'Bets': len(bets['odds']),
+        'Realized_ROI': round(bets['profit'].sum() / len(bets['odds']) * 100, 2),
+        'Exp_Profit': round(float(final.mean()), 2),
+    }
+    for q, v in zip(QUANTILES, np.nanquantile(roi, QUANTILES)):
+        row[f"ROI_P{int(q * 100):02d}"] = round(float(v), 2)
+    row['Loss_Prob'] = round(float((final < 0).mean()), 4)
+    for q, v in zip([0.50, 0.95, 0.99], np.quantile(dd, [0.50, 0.95, 0.99])):
+        row[f"Max_DD_P{int(q * 100):02d}"] = round(float(v), 2)
+    row['Ruin_Prob'] = round(float(ruined.mean()), 4)
+    return row
+
+# ==========================================
+# 3. 主流程
+# ==========================================
+def load_targets(merged, top_combos=TOP_COMBOS):
+    """要模擬的策略：v980 報告中的單場策略 + v960 報告前 N 名串關組合"""
+    frames = strategy_frames(merged)
+    targets = []
+    if os.path.exists(STRATEGY_REPORT_FILE):
+        names = pd.read_csv(STRATEGY_REPORT_FILE)['策略名稱'].tolist()
+    else:
+        print(f"⚠️ 找不到 {STRATEGY_REPORT_FILE}，改為模擬所有單場策略")
+        names = list(frames)
+    targets += [(name, '單場', frames[name]) for name in names if name in frames and not frames[name].empty]
+
+    if top_combos > 0 and os.path.exists(COMBO_REPORT_FILE):
+        combos = pd.read_csv(COMBO_REPORT_FILE).head(top_combos)
+        for s1, s2 in zip(combos['策略_A'], combos['策略_B']):
+            if s1 in STRATEGY_NAMES and s2 in STRATEGY_NAMES:
+                targets.append((f"{s1} + {s2}", '串關', (STRATEGY_NAMES.index(s1), STRATEGY_NAMES.index(s2))))
+    return targets
+
+def run_simulation(mode='model', n_paths=N_PATHS, chunk=CHUNK_PATHS, bankroll=BANKROLL_UNITS, top_combos=TOP_COMBOS, seed=RANDOM_SEED):
+    merged = load_merged_bets()
+    if merged.empty: return pd.DataFrame()
+
+    keys, _ = game_sides(merged)
+    game_index = {k: n for n, k in enumerate(dict.fromkeys(keys))}
+    days = sorted(merged['date'].unique())
+    day_index = {d: n for n, d in enumerate(days)}
+    print(f"📚 歷史資料: {len(days)} 天, {len(game_index)} 場比賽 | 模式: {mode} | 路徑數: {n_paths:,} | 本金: {bankroll:g} 單位")
+
+    rows = []
+    for name, kind, target in load_targets(merged, top_combos):
+        t0 = time.time()
+        bets = single_bets(target, game_index, day_index) if kind == '單場' else parlay_bets(merged, *target, game_index, day_index)
+        if len(bets['odds']) == 0: continue
+        if mode == 'model':
+            result = simulate_model(bets, len(game_index), len(days), n_paths, chunk, bankroll, seed)
+        else:
+            result = simulate_bootstrap(bets, len(days), n_paths, chunk, bankroll, seed)
+        rows.append(summarize(name, kind, mode, bets, *result))
+        print(f"   {name}: {len(bets['odds'])} 注, 耗時 {time.time() - t0:.1f} 秒")
+    return pd.DataFrame(rows)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="蒙地卡羅資金模擬：各策略與串關組合的回撤、破產機率與 ROI 分布")
+    parser.add_argument('--mode', choices=['model', 'bootstrap'], default='model',
+                        help="model: 依模型機率重抽賽果；bootstrap: 以實際結算結果逐日重抽")
+    parser.add_argument('--paths', type=int, default=N_PATHS, help="模擬的賽季路徑數")
+    parser.add_argument('--chunk', type=int, default=CHUNK_PATHS, help="每批處理的路徑數")
+    parser.add_argument('--bankroll', type=float, default=BANKROLL_UNITS, help="起始本金 (單位，每注 1 單位)")
+    parser.add_argument('--top-combos', type=int, default=TOP_COMBOS, help="另外模擬的串關組合數")
+    parser.add_argument('--seed', type=int, default=RANDOM_SEED)
+    args = parser.parse_args()
+
+    report = run_simulation(args.mode, args.paths, args.chunk, args.bankroll, args.top_combos, args.seed)
+    if report.empty:
+        print("⚠️ 沒有可模擬的策略")
+        raise SystemExit(1)
+
+    report = report.sort_values('ROI_P50', ascending=False)
+    report.to_csv(OUTPUT_FILE, index=False, encoding='utf-8-sig')
+    print("\n" + "=" * 60)
+    print(report[['Strategy', 'Bets', 'ROI_P05', 'ROI_P50', 'ROI_P95', 'Max_DD_P95', 'Ruin_Prob']].to_string(index=False))
+    print("=" * 60)
+    print(f"✅ 模擬結果已匯出: {OUTPUT_FILE}")
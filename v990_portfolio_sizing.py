@@ -0,0 +1,264 @@
+import pandas as pd
+import numpy as np
+import os
+import glob
+import re
+import time
+import argparse
+from scipy.optimize import minimize
+from parlay_search import search_parlays
+from v970_rolling_parlay_optimizer import normalize_team
+
+# ==========================================
+# 設定區
+# ==========================================
+PLAN_DIR = "betting_plan"
+PREDICTION_DIR = "predictions"
+ODDS_DIR = "odds"
+PARLAY_FILE = "Daily_Parlay_Recommendations.csv"
+
+BANKROLL = 1000.0          # 本金 (輸出金額用)
+KELLY_FRACTION = 0.25      # 分數凱利：實際下注 = 此比例 x 凱利最佳解
+MAX_STAKE_PCT = 0.05       # 單注上限 (占本金比例)
+MAX_EXPOSURE_PCT = 0.25    # 當日總下注上限 (占本金比例)
+FULL_KELLY_MAX_TOTAL = 0.95   # 償付上限：完整凱利解的總下注 (確保全部落空時本金 > 0，log 有定義)
+                              # 與使用者的總下注上限分開限制；分數凱利的總下注因此最多 fraction x 此值
+
+EXACT_MAX_GAMES = 12       # 比賽數 <= N 時精確列舉 2^N 種賽果，否則用蒙地卡羅
+N_SIMULATIONS = 20000
+RANDOM_SEED = 42
+SOLVER_ITERS = 200
+
+# ==========================================
+# 1. 讀取當日比賽、單場與串關候選
+# ==========================================
+def valid_odds(*values):
+    """賠率必須是有限值且 > 1 (空白儲存格讀入為 NaN)"""
+    values = pd.to_numeric(pd.Series(values), errors='coerce').to_numpy(dtype=float)
+    return bool(np.all(np.isfinite(values) & (values > 1.0)))
+
+def load_games(date_str):
+    """當日每場比賽的主隊勝率與雙方賠率 (預測檔 x 賠率檔)"""
+    df_p = pd.read_csv(os.path.join(PREDICTION_DIR, f"predictions_{date_str}.csv"))
+    df_o = pd.read_csv(os.path.join(ODDS_DIR, f"odds_for_{date_str}.csv"))
+    odds = {}
+    for _, row in df_o.iterrows():
+        h, a = normalize_team(row['Home_Abbr']), normalize_team(row['Away_Abbr'])
+        if not valid_odds(row['Odds_Home'], row['Odds_Away']):
+            print(f"⚠️ 略過 {a} @ {h}：賠率缺漏或無效")
+            continue
+        odds[(h, a)] = (float(row['Odds_Home']), float(row['Odds_Away']))
+        odds[(a, h)] = (float(row['Odds_Away']), float(row['Odds_Home']))
+
+    games = []
+    for _, row in df_p.iterrows():
+        h, a = normalize_team(row['Home']), normalize_team(row['Away'])
+        if (h, a) not in odds: continue
+        odd_h, odd_a = odds[(h, a)]
+        games.append({'Home': h, 'Away': a, 'Home_Win_Prob': float(row['Home_Win_Prob']), 'Odds_Home': odd_h, 'Odds_Away': odd_a})
+    return pd.DataFrame(games, columns=['Home', 'Away', 'Home_Win_Prob', 'Odds_Home', 'Odds_Away'])
+
+def team_sides(games):
+    """隊伍 -> (比賽編號, 是否主隊, 勝率, 賠率)"""
+    sides = {}
+    for g, row in enumerate(games.itertuples(index=False)):
+        sides[row.Home] = (g, True, row.Home_Win_Prob, row.Odds_Home)
+        sides[row.Away] = (g, False, 1.0 - row.Home_Win_Prob, row.Odds_Away)
+    return sides
+
+def load_candidates(date_str, games, search_top=0, n_legs=2):
+    """
+    候選注單：Betting_Plan 的單場 + 串關推薦檔 (+ 可選：search_parlays 以 EV 搜出的前 N 組)
+    賠率與勝率一律由各腿相乘 (不用四捨五入過的 Combined_Odds)
+    """
+    sides = team_sides(games)
+    bets = []
+
+    plan_file = os.path.join(PLAN_DIR, f"Betting_Plan_{date_str}.csv")
+    if os.path.exists(plan_file):
+        for team in pd.read_csv(plan_file)['Team']:
+            bets.append(('Single', [normalize_team(team)]))
+
+    if os.path.exists(PARLAY_FILE):
+        df_parlay = pd.read_csv(PARLAY_FILE)
+        team_cols = sorted([c for c in df_parlay.columns if re.fullmatch(r'Team_\d+', c)], key=lambda c: int(c[5:]))
+        if 'Date' in df_parlay.columns:
+            df_parlay = df_parlay[df_parlay['Date'].astype(str) == date_str]
+        for _, row in df_parlay.iterrows():
+            # generate_parlays 的格式為 "BOS (1.45)"，只取隊名
+            legs = [normalize_team(str(row[c]).split(' ')[0]) for c in team_cols if pd.notna(row[c])]
+            bets.append(('Parlay', legs))
+
+    if search_top > 0:
+        teams = list(sides)
+        prob = [sides[t][2] for t in teams]
+        odds = [sides[t][3] for t in teams]
+        keys = [sides[t][0] for t in teams]
+        for _, combo in search_parlays(prob, odds, keys, n_legs=n_legs, top_k=search_top):
+            bets.append(('Parlay', [teams[i] for i in combo]))
+
+    # 去除重複與對不到當日比賽的注單
+    rows, seen = [], set()
+    for bet_type, legs in bets:
+        key = tuple(sorted(legs))
+        if key in seen: continue
+        seen.add(key)
+        if any(t not in sides for t in legs):
+            print(f"⚠️ 略過 {' + '.join(legs)}：找不到當日比賽或賠率")
+            continue
+        odds = float(np.prod([sides[t][3] for t in legs]))
+        prob = float(np.prod([sides[t][2] for t in legs]))
+        if not (np.isfinite(odds) and np.isfinite(prob) and odds > 1.0):
+            print(f"⚠️ 略過 {' + '.join(legs)}：賠率或勝率無效")
+            continue
+        rows.append({'Type': bet_type, 'Bet': " + ".join(legs), 'Odds': odds, 'Prob': prob,
+                     'Games': [sides[t][0] for t in legs], 'Home_Side': [sides[t][1] for t in legs]})
+    return pd.DataFrame(rows, columns=['Type', 'Bet', 'Odds', 'Prob', 'Games', 'Home_Side'])
+
+# ==========================================
+# 2. 賽果分布 (精確列舉或蒙地卡羅) 與報酬矩陣
+# ==========================================
+def outcome_scenarios(home_probs, n_sims=N_SIMULATIONS, seed=RANDOM_SEED):
+    """
+    各場比賽獨立，回傳 (H, w)：H 為 (情境數 x 比賽數) 的主隊是否獲勝，w 為各情境機率
+    比賽數 <= EXACT_MAX_GAMES 時列舉全部 2^G 種賽果，否則抽樣 n_sims 次 (等權重)
+    """
+    p = np.asarray(home_probs, dtype=np.float64)
+    G = len(p)
+    if G <= EXACT_MAX_GAMES:
+        H = ((np.arange(2 ** G)[:, None] >> np.arange(G)) & 1).astype(bool)
+        w = np.where(H, p, 1.0 - p).prod(axis=1)
+        return H, w
+    H = np.random.default_rng(seed).random((n_sims, G)) < p
+    return H, np.full(n_sims, 1.0 / n_sims)
+
+def return_matrix(bets, H):
+    """R[s, b]：情境 s 下注單 b 每 1 單位本金的淨報酬 (全部過關 = 賠率 - 1，否則 -1)"""
+    n_legs = max(len(g) for g in bets['Games'])
+    win = np.ones((len(H), len(bets)), dtype=bool)
+    for k in range(n_legs):
+        # 腿數不足的注單用第 0 場補齊，並視為必過
+        game = np.array([g[k] if k < len(g) else 0 for g in bets['Games']])
+        home = np.array([s[k] if k < len(s) else True for s in bets['Home_Side']])
+        pad = np.array([k >= len(g) for g in bets['Games']])
+        win &= (H[:, game] == home) | pad
+    return np.where(win, bets['Odds'].to_numpy() - 1.0, -1.0)
+
+# ==========================================
+# 3. 凱利求解：最大化 E[log(1 + R f)]
+# ==========================================
+def kelly_weights(R, w, cap_bet=1.0, cap_total=1.0, solvency=FULL_KELLY_MAX_TOTAL, iters=SOLVER_ITERS):
+    """
+    聯合凱利 (所有注單一起考慮共同比賽的相關性)，限制 0 <= f <= cap_bet
+    兩個總下注限制分開：sum(f) <= cap_total (使用者的上限)、sum(f) <= solvency (償付上限)
+    求解失敗時丟出 RuntimeError (不輸出全為 0 的下注配置)
+    """
+    n = R.shape[1]
+    def objective(f):
+        wealth = 1.0 + R @ f
+        return -(w @ np.log(wealth)), -(R.T @ (w / wealth))
+    total_cap = lambda cap: {'type': 'ineq', 'fun': lambda f: cap - f.sum(), 'jac': lambda f: -np.ones(n)}
+    res = minimize(objective, np.zeros(n), jac=True, method='SLSQP', bounds=[(0.0, cap_bet)] * n,
+                   constraints=[total_cap(cap_total), total_cap(solvency)],
+                   options={'maxiter': iters, 'ftol': 1e-12})
+    if not res.success:
+        raise RuntimeError(f"凱利求解失敗: {res.message}")
+    return np.clip(res.x, 0.0, cap_bet)
+
+def size_portfolio(bets, games, fraction=KELLY_FRACTION, max_stake=MAX_STAKE_PCT, max_exposure=MAX_EXPOSURE_PCT,
+                   n_sims=N_SIMULATIONS):
+    """
+    分數凱利 + 風險上限：在 (上限 / fraction) 的限制下求凱利最佳解再乘上 fraction
+    (相當於對分數凱利直接加上單注與總下注上限)
+    只模擬有下注的比賽；回傳 (bets 加上 EV / 下注比例欄位, 各情境的當日損益比例, 情境權重)
+    """
+    used = sorted({g for legs in bets['Games'] for g in legs})
+    remap = {g: k for k, g in enumerate(used)}
+    bets = bets.assign(Games=[[remap[g] for g in legs] for legs in bets['Games']])
+    H, w = outcome_scenarios(games['Home_Win_Prob'].to_numpy()[used], n_sims)
+    R = return_matrix(bets, H)
+    stakes = fraction * kelly_weights(R, w, cap_bet=max_stake / fraction, cap_total=max_exposure / fraction)
+
+    out = bets.copy()
+    out['EV'] = out['Prob'] * out['Odds'] - 1
+    # 單獨看這一注的凱利比例 (不考慮其他注單)，方便對照相關性造成的差異
+    out['Kelly_Single'] = np.clip(out['EV'] / (out['Odds'] - 1), 0.0, None)
+    out['Stake_Pct'] = stakes
+    return out, R @ stakes, w
+
+def effective_exposure_cap(fraction=KELLY_FRACTION, max_exposure=MAX_EXPOSURE_PCT):
+    """實際生效的總下注上限 (占本金)：使用者上限與償付上限 (fraction x FULL_KELLY_MAX_TOTAL) 取小者"""
+    return min(max_exposure, fraction * FULL_KELLY_MAX_TOTAL)
+
+def portfolio_summary(pnl, w):
+    """當日損益分布：期望值、虧損機率、5% 最差情況"""
+    w = w / w.sum()
+    order = np.argsort(pnl, kind='stable')
+    cdf = np.cumsum(w[order])
+    return {
+        'Expected': float(w @ pnl),
+        'Prob_Loss': float(w[pnl < 0].sum()),
+        'Worst_5pct': float(pnl[order][np.searchsorted(cdf, 0.05)]),
+        'Worst': float(pnl.min()),
+        'Best': float(pnl.max()),
+    }
+
+def latest_plan_date(plan_dir=PLAN_DIR):
+    files = sorted(glob.glob(os.path.join(plan_dir, "Betting_Plan_*.csv")))
+    if not files: return None
+    return re.search(r"Betting_Plan_(\d{4}-\d{2}-\d{2})\.csv", files[-1]).group(1)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="單場 + 串關投注組合資金配置 (聯合分數凱利)")
+    parser.add_argument('--date', help="日期 (YYYY-MM-DD)，預設為 betting_plan/ 中最新的一天")
+    parser.add_argument('--bankroll', type=float, default=BANKROLL)
+    parser.add_argument('--fraction', type=float, default=KELLY_FRACTION, help="分數凱利比例")
+    parser.add_argument('--max-stake', type=float, default=MAX_STAKE_PCT, help="單注上限 (占本金比例)")
+    parser.add_argument('--max-exposure', type=float, default=MAX_EXPOSURE_PCT, help="總下注上限 (占本金比例)")
+    parser.add_argument('--search', type=int, default=0, help="另外加入 EV 最高的前 N 組串關當候選")
+    parser.add_argument('--legs', type=int, default=2, help="--search 的串關腿數")
+    parser.add_argument('--sims', type=int, default=N_SIMULATIONS, help="蒙地卡羅模擬次數 (比賽數過多時)")
+    args = parser.parse_args()
+
+    date_str = args.date or latest_plan_date()
+    if not date_str:
+        print("❌ 找不到 Betting_Plan，請先執行 v900_daily_strategy_output.py")
+        raise SystemExit(1)
+
+    games = load_games(date_str)
+    bets = load_candidates(date_str, games, args.search, args.legs)
+    if bets.empty:
+        print(f"⚠️ {date_str} 沒有可配置的注單")
+        raise SystemExit(0)
+
+    t0 = time.perf_counter()
+    try:
+        result, pnl, w = size_portfolio(bets, games, args.fraction, args.max_stake, args.max_exposure, args.sims)
+    except RuntimeError as e:
+        print(f"❌ {date_str}: {e}，未輸出下注配置")
+        raise SystemExit(1)
+    n_used = len({g for legs in bets['Games'] for g in legs})
+    method = "精確列舉" if n_used <= EXACT_MAX_GAMES else f"蒙地卡羅 {args.sims} 次"
+    print(f"📅 {date_str}: {n_used} 場有下注的比賽, {len(bets)} 筆候選 ({method}, {time.perf_counter() - t0:.2f}s)")
+
+    result['Date'] = date_str
+    result['Stake'] = (result['Stake_Pct'] * args.bankroll).round(2)
+    result = result.sort_values('Stake_Pct', ascending=False)
+    print("\n" + "=" * 80)
+    print(f"{'類型':<7} | {'注單':<22} | {'賠率':>6} | {'勝率':>6} | {'EV':>6} | {'比例':>6} | {'金額':>8}")
+    print("-" * 80)
+    for _, r in result[result['Stake_Pct'] > 1e-4].iterrows():
+        print(f"{r['Type']:<7} | {r['Bet']:<22} | {r['Odds']:>6.2f} | {r['Prob']:>6.1%} | {r['EV']:>+6.2f} | {r['Stake_Pct']:>6.2%} | {r['Stake']:>8.2f}")
+
+    s = portfolio_summary(pnl, w)
+    cap = effective_exposure_cap(args.fraction, args.max_exposure)
+    print("-" * 80)
+    if cap < args.max_exposure:
+        print(f"⚠️ 總下注上限 {args.max_exposure:.2%} 高於償付上限 ({args.fraction:g} x {FULL_KELLY_MAX_TOTAL:g} = {cap:.2%})，實際上限為 {cap:.2%}")
+    print(f"總下注 {result['Stake_Pct'].sum():.2%} (上限 {cap:.2%}) | 期望報酬 {s['Expected']:+.2%} | 虧損機率 {s['Prob_Loss']:.1%} | "
+          f"5% 最差 {s['Worst_5pct']:+.2%} | 最差 {s['Worst']:+.2%}")
+
+    output_csv = os.path.join(PLAN_DIR, f"Stake_Plan_{date_str}.csv")
+    cols = ['Date', 'Type', 'Bet', 'Odds', 'Prob', 'EV', 'Kelly_Single', 'Stake_Pct', 'Stake']
+    result[cols].round({'Prob': 4, 'EV': 4, 'Kelly_Single': 4, 'Stake_Pct': 4}).to_csv(output_csv, index=False, encoding='utf-8-sig')
+    print(f"\n✅ 下注配置已匯出: {output_csv}")